@@ -0,0 +1,134 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from tracing import span
+
+# 未单独配置的方法允许同时执行的请求数
+DEFAULT_CONCURRENCY = int(os.getenv("SEAL_DEFAULT_CONCURRENCY", "4"))
+# 每个方法最多排队等待的请求数，超出后立即拒绝（429）
+ADMISSION_QUEUE = int(os.getenv("SEAL_ADMISSION_QUEUE", "8"))
+# 排队等待的最长时间（秒），超时拒绝（503）
+ADMISSION_TIMEOUT = float(os.getenv("SEAL_ADMISSION_TIMEOUT", "10"))
+
+
+class AdmissionRejected(Exception):
+    """
+    请求未被接纳。status 为返回的 HTTP 状态码，retry_after 为建议的重试等待秒数。
+    """
+
+    def __init__(self, message: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _MethodGate:
+    def __init__(self, slots: int, max_waiting: int):
+        self.slots = max(1, slots)
+        self.max_waiting = max(0, max_waiting)
+        self.in_use = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.total_service = 0.0
+        self.served = 0
+
+    def retry_after(self) -> int:
+        # 按平均处理时间估算排在前面的请求全部完成所需的时间
+        average = self.total_service / self.served if self.served else 1.0
+        rounds = (self.waiting + 1) / self.slots
+        return max(1, math.ceil(average * rounds))
+
+
+class AdmissionController:
+    """
+    按方法限制同时执行的请求数。
+
+    每个方法有固定数量的执行槽和有界的等待队列：
+        - 有空闲槽时立即执行；
+        - 无空闲槽时排队等待，队列已满立即返回 429；
+        - 等待超过 timeout 仍未获得执行槽返回 503。
+    两种拒绝都附带根据平均处理时间估算的 Retry-After。
+    """
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, default_slots: int = DEFAULT_CONCURRENCY,
+                 max_waiting: int = ADMISSION_QUEUE, timeout: float = ADMISSION_TIMEOUT):
+        self.limits = dict(limits or {})
+        self.default_slots = default_slots
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._gates: Dict[str, _MethodGate] = {}
+
+    def _gate(self, method: str) -> _MethodGate:
+        gate = self._gates.get(method)
+        if gate is None:
+            gate = self._gates[method] = _MethodGate(self.limits.get(method, self.default_slots), self.max_waiting)
+        return gate
+
+    def slots(self, method: str) -> int:
+        with self._cond:
+            return self._gate(method).slots
+
+    @contextmanager
+    def slot(self, method: str, block: bool = False):
+        """
+        获取 method 的一个执行槽，退出时释放。
+
+        参数:
+            block: 为 True 时不受等待队列上限和超时限制，一直等到有空闲槽
+                   （批量接口使用，批量任务自身的并发已按执行槽数限制）
+
+        异常:
+            AdmissionRejected: 等待队列已满或等待超时
+        """
+        with span("admission.wait"), self._cond:
+            gate = self._gate(method)
+            if gate.in_use >= gate.slots:
+                if not block and gate.waiting >= gate.max_waiting:
+                    gate.rejected_full += 1
+                    raise AdmissionRejected(f"{method} 等待队列已满", 429, gate.retry_after())
+                gate.waiting += 1
+                deadline = time.monotonic() + self.timeout
+                try:
+                    while gate.in_use >= gate.slots:
+                        remaining = None if block else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            gate.rejected_timeout += 1
+                            raise AdmissionRejected(f"{method} 等待执行超时", 503, gate.retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    gate.waiting -= 1
+            gate.in_use += 1
+            gate.admitted += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                gate.in_use -= 1
+                gate.total_service += time.monotonic() - started
+                gate.served += 1
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                method: {
+                    "slots": gate.slots,
+                    "in_use": gate.in_use,
+                    "waiting": gate.waiting,
+                    "max_waiting": gate.max_waiting,
+                    "admitted": gate.admitted,
+                    "rejected_full": gate.rejected_full,
+                    "rejected_timeout": gate.rejected_timeout,
+                    "avg_service": round(gate.total_service / gate.served, 3) if gate.served else 0.0,
+                }
+                for method, gate in self._gates.items()
+            }
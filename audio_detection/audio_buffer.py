@@ -0,0 +1,133 @@
+import os
+import subprocess
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from tracing import span
+
+# 解码采样率，与 Whisper 输入一致（16kHz 单声道）
+DECODE_SAMPLE_RATE = 16000
+
+
+class DecodedAudio:
+    """
+    一次解码、多处共用的音频波形。
+
+    首次访问时用 ffmpeg 把文件解码为 16kHz 单声道 float32 波形（命令与 whisper.load_audio 相同），
+    其他采样率的视图按需从该波形重采样并缓存，语音识别与节奏标识检测不再各自解码一遍。
+    native() 按文件原始采样率另外解码一次（不经过重采样），同样只解码一次。
+    """
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"音频文件不存在: {path}")
+        self.path = path
+        self._views: Dict[int, np.ndarray] = {}
+        self._native: Optional[Tuple[int, np.ndarray]] = None
+
+    def _decode(self) -> np.ndarray:
+        cmd = [
+            "ffmpeg",
+            "-nostdin",
+            "-threads", "0",
+            "-i", self.path,
+            "-f", "s16le",
+            "-ac", "1",
+            "-acodec", "pcm_s16le",
+            "-ar", str(DECODE_SAMPLE_RATE),
+            "-",
+        ]
+        try:
+            out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Failed to load audio: {e.stderr.decode()}") from e
+        return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+    def native(self) -> Tuple[int, np.ndarray]:
+        """
+        返回 (原始采样率, 单声道 float32 波形)。输出为 WAV，采样率从文件头读取。
+        """
+        if self._native is not None:
+            return self._native
+        cmd = [
+            "ffmpeg",
+            "-nostdin",
+            "-threads", "0",
+            "-i", self.path,
+            "-map_metadata", "-1",
+            "-f", "wav",
+            "-ac", "1",
+            "-acodec", "pcm_s16le",
+            "-",
+        ]
+        try:
+            with span("decode.audio"):
+                out = subprocess.run(cmd, capture_output=True, check=True).stdout
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"Failed to load audio: {e.stderr.decode()}") from e
+        sample_rate, offset = _wav_layout(out)
+        samples = np.frombuffer(out, np.int16, offset=offset, count=(len(out) - offset) // 2)
+        self._native = (sample_rate, samples.astype(np.float32) / 32768.0)
+        return self._native
+
+    def samples(self, sample_rate: int = DECODE_SAMPLE_RATE) -> np.ndarray:
+        """
+        返回指定采样率的单声道 float32 波形。
+        采样率整除 16kHz 时按相邻样本取平均降采样，否则线性插值。
+        """
+        view = self._views.get(sample_rate)
+        if view is not None:
+            return view
+
+        if DECODE_SAMPLE_RATE not in self._views:
+            with span("decode.audio"):
+                self._views[DECODE_SAMPLE_RATE] = self._decode()
+        base = self._views[DECODE_SAMPLE_RATE]
+        if sample_rate == DECODE_SAMPLE_RATE:
+            return base
+
+        with span("decode.resample"):
+            view = _resample(base, DECODE_SAMPLE_RATE, sample_rate)
+        self._views[sample_rate] = view
+        return view
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples()) / DECODE_SAMPLE_RATE
+
+
+def _resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    if source_rate % target_rate == 0:
+        factor = source_rate // target_rate
+        usable = len(samples) - len(samples) % factor
+        return samples[:usable].reshape(-1, factor).mean(axis=1).astype(np.float32)
+    length = int(round(len(samples) * target_rate / source_rate))
+    positions = np.arange(length) * (source_rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _wav_layout(data: bytes) -> Tuple[int, int]:
+    """
+    解析 ffmpeg 输出到管道的 WAV，返回 (采样率, 样本数据起始偏移)。
+    管道输出无法回写长度，data 块的长度字段不可信，样本数据一直到输出结尾。
+    """
+    sample_rate = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        size = int.from_bytes(data[pos + 4:pos + 8], "little")
+        if chunk_id == b"fmt ":
+            sample_rate = int.from_bytes(data[pos + 12:pos + 16], "little")
+        elif chunk_id == b"data":
+            if sample_rate is None:
+                break
+            return sample_rate, pos + 8
+        pos += 8 + size + (size & 1)
+    raise RuntimeError("Failed to load audio: ffmpeg 输出的 WAV 缺少 fmt 或 data 块")
+
+
+def as_decoded(audio) -> "DecodedAudio":
+    """接受文件路径或 DecodedAudio，统一返回 DecodedAudio"""
+    if isinstance(audio, DecodedAudio):
+        return audio
+    return DecodedAudio(audio)
@@ -1,15 +1,19 @@
 import json
-from typing import Dict, List
+from typing import Dict, List, Optional
 from .whisper_transcriber import process_audio
 from .morse_ai_detector import detect_ai_pattern
+from .audio_buffer import DecodedAudio
+from tracing import span
 
 
-def DetectAudioExplicitLabel(OriginalAudioPath: str) -> str:
+def DetectAudioExplicitLabel(OriginalAudioPath: str, Positions: Optional[List[float]] = None) -> str:
     """
     检测音频中已嵌入的听觉标识信息。
 
     参数：
         OriginalAudioPath (str): 音频文件路径。
+        Positions (list, 可选): 已知的标识嵌入位置（秒，可以是单个数值），语音识别只转录边缘窗口时
+            额外转录这些位置附近。接口请求中的 Positions 参数原样传入。
 
     返回：
         str: JSON 字符串，格式如下：
@@ -31,8 +35,16 @@ def DetectAudioExplicitLabel(OriginalAudioPath: str) -> str:
             "ExplicitLabel": []
         }
 
+        hints = None
+        if Positions is not None:
+            hints = [float(position) for position in (Positions if isinstance(Positions, list) else [Positions])]
+
+        # 只解码一次，语音与节奏标识检测共用同一份波形
+        audio = DecodedAudio(OriginalAudioPath)
+
         # ============= 2. 语音标识检测（Whisper 部分） =============
-        speech_matches = process_audio(OriginalAudioPath)
+        with span("detect.speech"):
+            speech_matches = process_audio(audio, hints=hints)
         speech_label = {
             "LableMode": "语音标识",
             "Positions": [start_time for _, start_time in speech_matches] if speech_matches else [],
@@ -42,7 +54,8 @@ def DetectAudioExplicitLabel(OriginalAudioPath: str) -> str:
         result_data["ExplicitLabel"].append(speech_label)
 
         # ============= 3. 节奏标识检测（摩斯码部分） =============
-        morse_matches = detect_ai_pattern(OriginalAudioPath)
+        with span("detect.morse"):
+            morse_matches = detect_ai_pattern(audio)
         morse_label = {
             "LableMode": "节奏标识",
             "Positions": [start_time for start_time, _ in morse_matches] if morse_matches else [],
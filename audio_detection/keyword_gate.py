@@ -0,0 +1,135 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 预筛使用的小模型（tiny / base），只用贪心解码粗略识别有声片段
+GATE_MODEL = os.getenv("WHISPER_GATE_MODEL", "base")
+# 候选片段前后各扩展的时长（秒），保证完整覆盖关键词
+GATE_MARGIN = float(os.getenv("WHISPER_GATE_MARGIN", "1.0"))
+# 有声判定：帧能量高于噪声底（第 10 百分位）的分贝数
+VAD_THRESHOLD_DB = float(os.getenv("WHISPER_VAD_THRESHOLD_DB", "6"))
+# 低于该能量（dBFS）的帧一律视为静音
+VAD_FLOOR_DB = -60.0
+# 间隔短于该时长（秒）的有声段合并为一段
+VAD_MIN_GAP = 0.5
+# 有声段前后各扩展的时长（秒）
+VAD_PADDING = 0.3
+VAD_FRAME = 0.03
+
+# 小模型容易把关键词识别错，只要出现任一片段就视为候选（宁多勿漏）
+KEYWORD_FRAGMENTS = ("人工", "智能", "生成", "合成")
+# "AI" 只按独立的词匹配（允许写成 A.I.），"SAID"、"AGAIN"、"MAIN" 等英文单词中的 AI 不算
+_AI_TOKEN = re.compile(r"(?<![A-Z])A\.?I(?![A-Z])")
+
+# 预筛解码参数：贪心解码，不以前文为提示，不计算词级时间戳
+GATE_OPTIONS = dict(
+    task="transcribe",
+    temperature=0.0,
+    beam_size=None,
+    best_of=None,
+    condition_on_previous_text=False,
+    word_timestamps=False,
+)
+
+_PUNCTUATION = re.compile(r"[\s\.,，。、!！?？:：;；'\"“”‘’\-]")
+
+
+def voiced_regions(samples: np.ndarray, sample_rate: int = 16000) -> List[Tuple[float, float]]:
+    """
+    基于短时能量的语音活动检测，返回有声区间 [(开始秒, 结束秒), ...]。
+
+    阈值取 噪声底 + VAD_THRESHOLD_DB 与 最大能量 - 30dB 中较小者，
+    整段都是语音或音乐（噪声底很高）时也不会把大部分内容判为静音。
+    """
+    frame_len = int(VAD_FRAME * sample_rate)
+    count = len(samples) // frame_len
+    if count == 0:
+        return []
+    frames = samples[:count * frame_len].reshape(count, frame_len)
+    energy_db = 10 * np.log10(np.mean(frames.astype(np.float64) ** 2, axis=1) + 1e-10)
+    threshold = min(np.percentile(energy_db, 10) + VAD_THRESHOLD_DB, energy_db.max() - 30)
+    voiced = (energy_db > threshold) & (energy_db > VAD_FLOOR_DB)
+
+    # 找出连续有声帧的起止位置
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.astype(np.int8), [0]))))
+    duration = len(samples) / sample_rate
+    regions = [(start * VAD_FRAME - VAD_PADDING, end * VAD_FRAME + VAD_PADDING)
+               for start, end in zip(edges[::2], edges[1::2])]
+    return merge_windows(regions, duration, VAD_MIN_GAP)
+
+
+def merge_windows(windows: List[Tuple[float, float]], duration: float,
+                  min_gap: float = 0.0) -> List[Tuple[float, float]]:
+    """按开始时间排序，裁剪到 [0, duration]，合并重叠或间隔不超过 min_gap 的区间"""
+    merged: List[List[float]] = []
+    for start, end in sorted(windows):
+        start, end = max(0.0, start), min(duration, end)
+        if end <= start:
+            continue
+        if merged and start - merged[-1][1] <= min_gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(round(start, 2), round(end, 2)) for start, end in merged]
+
+
+def intersect_windows(a: List[Tuple[float, float]], b: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """两组各自有序且不重叠的区间的交集"""
+    result = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start, end = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if start < end:
+            result.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def complement_windows(windows: List[Tuple[float, float]], duration: float) -> List[Tuple[float, float]]:
+    """[0, duration] 中不被 windows（有序且不重叠）覆盖的部分"""
+    result = []
+    position = 0.0
+    for start, end in windows:
+        if start > position:
+            result.append((position, start))
+        position = max(position, end)
+    if position < duration:
+        result.append((position, duration))
+    return result
+
+
+def flatten_windows(windows: List[Tuple[float, float]]) -> List[float]:
+    """转为 transcribe 的 clip_timestamps 参数格式 [开始, 结束, 开始, 结束, ...]"""
+    return [t for window in windows for t in window]
+
+
+def _may_contain_keyword(text: str) -> bool:
+    if _AI_TOKEN.search(text.upper()):
+        return True
+    text = _PUNCTUATION.sub("", text)
+    return any(fragment in text for fragment in KEYWORD_FRAGMENTS)
+
+
+def candidate_windows(model, samples: np.ndarray, regions: List[Tuple[float, float]],
+                      language: Optional[str] = None, sample_rate: int = 16000) -> List[Tuple[float, float]]:
+    """
+    用小模型对有声区间做一次贪心解码，返回可能含有标识关键词的片段（已扩展 GATE_MARGIN 并合并）。
+    """
+    result: Dict = model.transcribe(samples, language=language, clip_timestamps=flatten_windows(regions),
+                                    **GATE_OPTIONS)
+    return candidates_from_segments(result["segments"], len(samples) / sample_rate)
+
+
+def candidates_from_segments(segments: List[Dict], duration: float) -> List[Tuple[float, float]]:
+    """从预筛转录的分段中挑出可能含有关键词的片段，前后扩展 GATE_MARGIN 秒并合并"""
+    windows = [
+        (segment["start"] - GATE_MARGIN, segment["end"] + GATE_MARGIN)
+        for segment in segments
+        if _may_contain_keyword(segment["text"])
+    ]
+    return merge_windows(windows, duration)
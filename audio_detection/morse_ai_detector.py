@@ -1,22 +1,32 @@
+import os
 import numpy as np
-import librosa
+from .audio_buffer import as_decoded
 
+# 节奏标识检测使用的采样率，0 表示文件原始采样率（默认，与改用共享解码前的结果一致）。
+# 设为 8000 等值时改用共享的 16kHz 波形降采样，解码更快，但音段边界会随重采样移动一帧左右，
+# 提示音长短比例接近阈值的文件结果可能不同（如 ai_result/morse0.wav）
+MORSE_SAMPLE_RATE = int(os.getenv("MORSE_SAMPLE_RATE", "0"))
 
-def detect_ai_pattern(audio_path, min_duration=0.02, tolerance=1.0):
+
+def detect_ai_pattern(audio, min_duration=0.02, tolerance=1.0):
     """
     检测音频中的摩斯码"AI"(·-··)模式
     参数:
-        audio_path: 音频文件路径
+        audio: 音频文件路径，或与语音识别共用的 DecodedAudio
         min_duration: 最小音段持续时间(秒)，用于过滤噪声
         tolerance: 模式匹配的容差阈值
     返回:
         matches: 检测到的匹配列表，每个元素为(起始时间, 持续时间列表)
     """
-    # 加载音频
-    y, sr = librosa.load(audio_path, sr=None, mono=True)
-
-    # 预处理：预加重增强高频
-    y = librosa.effects.preemphasis(y, coef=0.95)
+    # 加载音频（默认按原始采样率解码）
+    audio = as_decoded(audio)
+    if MORSE_SAMPLE_RATE:
+        sr, y = MORSE_SAMPLE_RATE, audio.samples(MORSE_SAMPLE_RATE)
+    else:
+        sr, y = audio.native()
+
+    # 预处理：预加重增强高频 y[n] - 0.95 * y[n-1]
+    y = np.append(y[:1], y[1:] - 0.95 * y[:-1])
 
     # 设置帧参数 (30ms帧长，50%重叠)
     frame_len = int(0.03 * sr)  # 30ms帧
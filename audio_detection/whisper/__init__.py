@@ -1,11 +1,13 @@
 import hashlib
 import io
+import json
 import os
 import urllib
 import warnings
 from typing import List, Optional, Union
 
 import torch
+from packaging.version import Version
 from tqdm import tqdm
 
 from .audio import load_audio, log_mel_spectrogram, pad_or_trim
@@ -51,6 +53,59 @@ _ALIGNMENT_HEADS = {
 }
 
 
+def _sha256_of_file(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _stamp_path(download_target: str) -> str:
+    return download_target + ".verified"
+
+
+def _is_verified(download_target: str, expected_sha256: str) -> bool:
+    """
+    Check the sidecar stamp written after the last successful verification; the file is trusted
+    without re-hashing as long as its size and mtime have not changed since then.
+    """
+    try:
+        with open(_stamp_path(download_target), "r") as f:
+            stamp = json.load(f)
+        stat = os.stat(download_target)
+    except (OSError, ValueError):
+        return False
+    return (
+        stamp.get("sha256") == expected_sha256
+        and stamp.get("size") == stat.st_size
+        and stamp.get("mtime_ns") == stat.st_mtime_ns
+    )
+
+
+def _write_stamp(download_target: str, sha256: str) -> None:
+    stat = os.stat(download_target)
+    stamp = {"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    tmp_path = _stamp_path(download_target) + f".{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(stamp, f)
+        os.replace(tmp_path, _stamp_path(download_target))
+    except OSError:
+        # a read-only cache directory only costs a re-hash on the next load
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _torch_at_least(version: str) -> bool:
+    return Version(torch.__version__).release >= Version(version).release
+
+
 def _download(url: str, root: str, in_memory: bool) -> Union[bytes, str]:
     os.makedirs(root, exist_ok=True)
 
@@ -61,10 +116,11 @@ def _download(url: str, root: str, in_memory: bool) -> Union[bytes, str]:
         raise RuntimeError(f"{download_target} exists and is not a regular file")
 
     if os.path.isfile(download_target):
-        with open(download_target, "rb") as f:
-            model_bytes = f.read()
-        if hashlib.sha256(model_bytes).hexdigest() == expected_sha256:
-            return model_bytes if in_memory else download_target
+        if _is_verified(download_target, expected_sha256):
+            return _read_bytes(download_target) if in_memory else download_target
+        if _sha256_of_file(download_target) == expected_sha256:
+            _write_stamp(download_target, expected_sha256)
+            return _read_bytes(download_target) if in_memory else download_target
         else:
             warnings.warn(
                 f"{download_target} exists, but the SHA256 checksum does not match; re-downloading the file"
@@ -86,13 +142,13 @@ def _download(url: str, root: str, in_memory: bool) -> Union[bytes, str]:
                 output.write(buffer)
                 loop.update(len(buffer))
 
-    model_bytes = open(download_target, "rb").read()
-    if hashlib.sha256(model_bytes).hexdigest() != expected_sha256:
+    if _sha256_of_file(download_target) != expected_sha256:
         raise RuntimeError(
             "Model has been downloaded but the SHA256 checksum does not not match. Please retry loading the model."
         )
+    _write_stamp(download_target, expected_sha256)
 
-    return model_bytes if in_memory else download_target
+    return _read_bytes(download_target) if in_memory else download_target
 
 
 def available_models() -> List[str]:
@@ -105,6 +161,7 @@ def load_model(
     device: Optional[Union[str, torch.device]] = None,
     download_root: str = None,
     in_memory: bool = False,
+    mmap: bool = True,
 ) -> Whisper:
     """
     Load a Whisper ASR model
@@ -120,6 +177,12 @@ def load_model(
         path to download the model files; by default, it uses "~/.cache/whisper"
     in_memory: bool
         whether to preload the model weights into host memory
+    mmap: bool
+        whether to memory-map the checkpoint file instead of reading it into a private buffer;
+        the checkpoint tensors are paged in lazily while being copied into the model, which
+        lowers peak memory during loading (ignored when `in_memory` is True or the installed
+        torch does not support it). The official checkpoints are float16 and are upcast into
+        the model's own parameters, so the loaded weights are not shared between processes.
 
     Returns
     -------
@@ -137,18 +200,22 @@ def load_model(
         checkpoint_file = _download(_MODELS[name], download_root, in_memory)
         alignment_heads = _ALIGNMENT_HEADS[name]
     elif os.path.isfile(name):
-        checkpoint_file = open(name, "rb").read() if in_memory else name
+        checkpoint_file = _read_bytes(name) if in_memory else name
         alignment_heads = None
     else:
         raise RuntimeError(
             f"Model {name} not found; available models = {available_models()}"
         )
 
-    with (
-        io.BytesIO(checkpoint_file) if in_memory else open(checkpoint_file, "rb")
-    ) as fp:
-        kwargs = {"weights_only": True} if torch.__version__ >= "1.13" else {}
-        checkpoint = torch.load(fp, map_location=device, **kwargs)
+    kwargs = {"weights_only": True} if _torch_at_least("1.13") else {}
+    if mmap and not in_memory and _torch_at_least("2.1"):
+        # torch only memory-maps when given a path, not a file object
+        checkpoint = torch.load(checkpoint_file, map_location=device, mmap=True, **kwargs)
+    else:
+        with (
+            io.BytesIO(checkpoint_file) if in_memory else open(checkpoint_file, "rb")
+        ) as fp:
+            checkpoint = torch.load(fp, map_location=device, **kwargs)
     del checkpoint_file
 
     dims = ModelDimensions(**checkpoint["dims"])
@@ -0,0 +1,288 @@
+import os
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+sys.path.append(os.path.abspath("/seal_flask/audio_detection/"))
+import whisper
+from whisper.audio import HOP_LENGTH, N_FRAMES, N_SAMPLES, SAMPLE_RATE, log_mel_spectrogram
+from whisper.decoding import DecodingOptions
+from whisper.timing import add_word_timestamps
+from whisper.tokenizer import get_tokenizer
+from .whisper_model_pool import acquire_model, MAX_REPLICAS
+from tracing import span
+
+# 是否把多个请求的 30 秒窗口合并成一批解码
+BATCH_DECODE = os.getenv("WHISPER_BATCH", "1") != "0"
+# 每批最多的窗口数
+MAX_BATCH = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+# 凑批时最多等待的时间（秒）。第一个窗口到达后最多再等这么久，未凑满也开始解码
+MAX_WAIT = float(os.getenv("WHISPER_BATCH_WAIT", "0.05"))
+
+WINDOW_SECONDS = N_SAMPLES / SAMPLE_RATE
+# 长区间切成多个窗口时相邻窗口重叠的时长（秒），避免跨窗口边界的关键词被截断在两个窗口中都识别不出
+WINDOW_OVERLAP = min(max(0.0, float(os.getenv("WHISPER_BATCH_OVERLAP", "2"))), WINDOW_SECONDS / 2)
+# 与 transcribe 的默认值一致：无语音概率高且平均对数概率低的窗口视为静音，不输出分段
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+
+class _Window:
+    __slots__ = ("samples", "offset", "future")
+
+    def __init__(self, samples: np.ndarray, offset: float):
+        self.samples = samples
+        self.offset = offset
+        self.future: Future = Future()
+
+
+class WindowBatcher:
+    """
+    把多个请求的 30 秒音频窗口合并成一批，用同一个模型对堆叠的 mel 一次完成编码与解码，
+    再把每个窗口的分段交回提交它的请求。
+
+    每个 (模型, 设备, 精度, 解码参数) 一个实例，见 get_batcher。后台线程数与模型池副本数相同，
+    每个线程一次从模型池借出一个模型解码一批。
+    """
+
+    def __init__(self, name: str, device: str, dtype: str, options: DecodingOptions, word_timestamps: bool,
+                 max_batch: int = MAX_BATCH, max_wait: float = MAX_WAIT):
+        self.name = name
+        self.device = device
+        self.dtype = dtype
+        self.options = options
+        self.word_timestamps = word_timestamps
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._pending: deque = deque()
+        self._threads: List[threading.Thread] = []
+        self.batches = 0
+        self.windows = 0
+
+    def submit(self, samples: np.ndarray, offset: float) -> Future:
+        """
+        提交一个不超过 30 秒的窗口，offset 为窗口在整段音频中的开始时间（秒）。
+        Future 的结果为 (分段列表, 语言)，分段时间戳相对整段音频。
+        """
+        window = _Window(samples, offset)
+        with self._cond:
+            if not self._threads:
+                for i in range(max(1, MAX_REPLICAS)):
+                    thread = threading.Thread(target=self._run, name=f"whisper-batch-{self.name}-{i}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            self._pending.append(window)
+            self._cond.notify()
+        return window.future
+
+    def _next_batch(self) -> List[_Window]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(self.max_batch, len(self._pending))
+            return [self._pending.popleft() for _ in range(count)]
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self._decode(batch)
+            except Exception as e:
+                for window in batch:
+                    window.future.set_exception(e)
+                continue
+            for window, result in zip(batch, results):
+                window.future.set_result(result)
+
+    def _decode(self, batch: List[_Window]) -> List[Tuple[List[dict], str]]:
+        with acquire_model(self.name, device=self.device, dtype=self.dtype) as model:
+            n_mels = model.dims.n_mels
+            # 与 transcribe 相同：末尾补 30 秒静音后计算 mel，再截取一个窗口
+            mels = [log_mel_spectrogram(window.samples, n_mels, padding=N_SAMPLES)[:, :N_FRAMES] for window in batch]
+            mel = torch.stack(mels).to(model.device)
+            if self.options.fp16:
+                mel = mel.half()
+            with span("inference.batch"):
+                results = whisper.decode(model, mel, self.options)
+            with self._cond:
+                self.batches += 1
+                self.windows += len(batch)
+
+            time_precision = N_FRAMES // model.dims.n_audio_ctx * HOP_LENGTH / SAMPLE_RATE
+            output = []
+            for i, (window, result) in enumerate(zip(batch, results)):
+                tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                                          language=result.language, task=self.options.task)
+                if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                    output.append(([], result.language))
+                    continue
+                duration = len(window.samples) / SAMPLE_RATE
+                segments = _split_segments(result, tokenizer, window.offset, duration, time_precision)
+                if self.word_timestamps and segments:
+                    add_word_timestamps(segments=segments, model=model, tokenizer=tokenizer, mel=mel[i],
+                                        num_frames=min(N_FRAMES, len(window.samples) // HOP_LENGTH),
+                                        last_speech_timestamp=window.offset)
+                output.append((segments, result.language))
+            return output
+
+
+def _split_segments(result, tokenizer, offset: float, duration: float, time_precision: float) -> List[dict]:
+    """
+    按时间戳标记把一个窗口的解码结果切分为分段：<|t0|> 文本 <|t1|> 为一段，开始/结束加上窗口偏移。
+    """
+    segments = []
+    text_tokens: List[int] = []
+    start: Optional[float] = None
+
+    def add(end: float) -> None:
+        segments.append({
+            "seek": round(offset * SAMPLE_RATE / HOP_LENGTH),
+            "start": round(offset + (start or 0.0), 3),
+            "end": round(offset + min(end, duration), 3),
+            "text": tokenizer.decode(text_tokens),
+            "tokens": list(text_tokens),
+            "temperature": result.temperature,
+            "avg_logprob": result.avg_logprob,
+            "compression_ratio": result.compression_ratio,
+            "no_speech_prob": result.no_speech_prob,
+        })
+
+    for token in result.tokens:
+        if token >= tokenizer.timestamp_begin:
+            timestamp = (token - tokenizer.timestamp_begin) * time_precision
+            if text_tokens:
+                add(timestamp)
+                text_tokens = []
+                start = None
+            else:
+                start = timestamp
+        else:
+            text_tokens.append(token)
+    if text_tokens:
+        add(duration)
+    return segments
+
+
+def split_windows(clips: List[Tuple[float, float]], pack: bool = False,
+                  overlap: float = WINDOW_OVERLAP) -> List[Tuple[float, float]]:
+    """
+    把有序且不重叠的区间切成不超过 30 秒的窗口。超过 30 秒的区间切出的相邻窗口重叠 overlap 秒，
+    重叠部分的分段由 _owned_segments 去重。
+
+    pack 为 True 时相邻区间只要能放进同一个 30 秒窗口就合并（区间之间的部分一并解码），
+    用于间隔为静音的语音活动区间，可减少编码器的运行次数。
+    """
+    windows: List[List[float]] = []
+    for start, end in clips:
+        if pack and windows and end - windows[-1][0] <= WINDOW_SECONDS:
+            windows[-1][1] = end
+            continue
+        while start < end:
+            stop = min(start + WINDOW_SECONDS, end)
+            windows.append([start, stop])
+            if stop >= end:
+                break
+            start = stop - overlap
+    return [(start, end) for start, end in windows]
+
+
+def _owned_segments(windows: List[Tuple[float, float]], results: List[List[dict]]) -> List[dict]:
+    """
+    合并各窗口的分段。相互重叠的相邻窗口以重叠部分的中点为界，分段按自身中点归属其中一个窗口：
+    两个窗口中时间相同的分段只保留一份；在前一窗口末尾被截断的分段中点落在界线之后，由后一窗口中完整的分段代替。
+    """
+    segments = []
+    for i, ((start, end), window_segments) in enumerate(zip(windows, results)):
+        lower, upper = float("-inf"), float("inf")
+        if i > 0 and windows[i - 1][1] > start:
+            lower = (windows[i - 1][1] + start) / 2
+        if i + 1 < len(windows) and windows[i + 1][0] < end:
+            upper = (end + windows[i + 1][0]) / 2
+        segments.extend(segment for segment in window_segments
+                        if lower <= (segment["start"] + segment["end"]) / 2 < upper)
+    return segments
+
+
+_batchers: Dict[tuple, WindowBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(name: str, device: str = "cpu", dtype: str = "float32", **options) -> WindowBatcher:
+    """
+    返回 (模型, 设备, 精度, 解码参数) 对应的 WindowBatcher。options 使用 transcribe 的参数名，
+    只取单窗口解码相关的部分（language、task、temperature、beam_size、best_of、word_timestamps）。
+    """
+    word_timestamps = bool(options.get("word_timestamps", False))
+    temperature = options.get("temperature", 0.0)
+    beam_size = options.get("beam_size")
+    # transcribe 在温度为 0 时去掉 best_of，温度大于 0 时去掉 beam_size
+    best_of = options.get("best_of") if temperature > 0 else None
+    if temperature > 0:
+        beam_size = None
+    decoding = DecodingOptions(
+        task=options.get("task", "transcribe"),
+        language=options.get("language"),
+        temperature=temperature,
+        beam_size=beam_size,
+        best_of=best_of,
+        fp16=device != "cpu" and dtype == "float16",
+    )
+    key = (name, device, dtype, decoding, word_timestamps)
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = _batchers[key] = WindowBatcher(name, device, dtype, decoding, word_timestamps)
+        return batcher
+
+
+def transcribe_batched(name: str, samples: np.ndarray, clips: List[Tuple[float, float]], device: str = "cpu",
+                       dtype: str = "float32", pack: bool = False, **options) -> Dict:
+    """
+    与 model.transcribe(samples, clip_timestamps=...) 对应的批量版本：clips 中的区间切成 30 秒窗口
+    提交给共享的 WindowBatcher，与其他请求的窗口一起解码，返回相同结构的转录结果。
+
+    窗口之间相互独立：不以前一窗口的文本作为提示，也不按最后一个时间戳调整下一窗口的起点；
+    长区间的相邻窗口相互重叠 WINDOW_OVERLAP 秒，以免边界上的关键词被截断。
+    """
+    batcher = get_batcher(name, device, dtype, **options)
+    windows = split_windows(clips, pack)
+    futures = [
+        batcher.submit(samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)], start)
+        for start, end in windows
+    ]
+    results = []
+    language = options.get("language")
+    for future in futures:
+        window_segments, window_language = future.result()
+        results.append(window_segments)
+        language = language or window_language
+    segments = _owned_segments(windows, results)
+    return {"text": "".join(segment["text"] for segment in segments), "segments": segments, "language": language}
+
+
+def get_batch_stats() -> Dict[str, Dict]:
+    with _batchers_lock:
+        batchers = list(_batchers.values())
+    stats = {}
+    for batcher in batchers:
+        with batcher._cond:
+            key = f"{batcher.name}/{batcher.device}/{batcher.dtype}"
+            entry = stats.setdefault(key, {"batches": 0, "windows": 0, "pending": 0})
+            entry["batches"] += batcher.batches
+            entry["windows"] += batcher.windows
+            entry["pending"] += len(batcher._pending)
+    for entry in stats.values():
+        entry["avg_batch"] = round(entry["windows"] / entry["batches"], 2) if entry["batches"] else 0.0
+    return stats
@@ -0,0 +1,162 @@
+import sys
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+sys.path.append(os.path.abspath("/seal_flask/audio_detection/"))
+import whisper
+from tracing import span
+
+# 每个 (模型名, 设备, 精度) 最多常驻的模型副本数，同时也是该模型的并发推理上限。
+# Whisper 的 kv-cache 通过 forward hook 挂在模型实例上，同一实例不能被多个线程同时解码，
+# 因此并发度只能通过增加副本来提高。
+MAX_REPLICAS = int(os.getenv("WHISPER_MAX_REPLICAS", "1"))
+
+# 默认等待空闲模型的超时时间（秒），None 表示一直等待
+ACQUIRE_TIMEOUT = float(os.getenv("WHISPER_ACQUIRE_TIMEOUT", "0")) or None
+
+
+class _ModelEntry:
+    """
+    单个模型键对应的常驻副本及其统计信息。
+    """
+
+    def __init__(self, max_replicas: int):
+        self.max_replicas = max(1, max_replicas)
+        self.idle: List[whisper.Whisper] = []
+        self.loading = 0
+        self.replicas = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.cold_acquires = 0
+        self.warm_acquires = 0
+        self.load_times: List[float] = []
+
+
+_lock = threading.Lock()
+_cond = threading.Condition(_lock)
+_entries: Dict[Tuple[str, str, str], _ModelEntry] = {}
+
+
+def _load(name: str, device: str, dtype: str) -> "whisper.Whisper":
+    """
+    加载一个模型副本并转换到指定精度。int8 为 CPU 上的动态量化模型，量化结果缓存在磁盘上。
+    """
+    if dtype == "int8":
+        if device != "cpu":
+            raise ValueError("int8 量化模型只支持 CPU 推理")
+        from .whisper_quantize import load_int8_model
+        return load_int8_model(name)
+    model = whisper.load_model(name, device=device)
+    if dtype == "float16":
+        model = model.half()
+    model.eval()
+    return model
+
+
+@contextmanager
+def acquire_model(name: str, device: str = "cpu", dtype: str = "float32",
+                  timeout: Optional[float] = ACQUIRE_TIMEOUT):
+    """
+    从进程级模型池中借出一个 Whisper 模型，用完后自动归还。
+
+    首次借出时加载模型（冷启动），之后复用常驻副本（热启动）。
+    副本数达到上限时阻塞等待，直到有副本被归还或超时。
+
+    参数:
+        name: 模型名称（如"medium"）或模型文件路径
+        device: 推理设备
+        dtype: 模型精度，"float32"、"float16" 或 "int8"
+        timeout: 等待空闲副本的最长时间（秒），None 表示一直等待
+
+    返回:
+        上下文管理器，产出可独占使用的 Whisper 模型实例
+
+    异常:
+        TimeoutError: 超时仍未获得空闲副本
+    """
+    key = (name, str(device), dtype)
+    deadline = None if timeout is None else time.monotonic() + timeout
+    model = None
+    need_load = False
+
+    with span("model.acquire"), _cond:
+        entry = _entries.get(key)
+        if entry is None:
+            entry = _entries[key] = _ModelEntry(MAX_REPLICAS)
+        entry.waiting += 1
+        try:
+            while True:
+                if entry.idle:
+                    model = entry.idle.pop()
+                    entry.warm_acquires += 1
+                    break
+                if entry.replicas + entry.loading < entry.max_replicas:
+                    entry.loading += 1
+                    entry.cold_acquires += 1
+                    need_load = True
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"等待 Whisper 模型 {name} 超时")
+                _cond.wait(remaining)
+        finally:
+            entry.waiting -= 1
+        entry.in_use += 1
+
+    if need_load:
+        start = time.perf_counter()
+        try:
+            with span("model.load"):
+                model = _load(name, str(device), dtype)
+        except Exception:
+            with _cond:
+                entry.loading -= 1
+                entry.in_use -= 1
+                _cond.notify_all()
+            raise
+        elapsed = time.perf_counter() - start
+        with _cond:
+            entry.loading -= 1
+            entry.replicas += 1
+            entry.load_times.append(elapsed)
+
+    try:
+        yield model
+    finally:
+        with _cond:
+            entry.idle.append(model)
+            entry.in_use -= 1
+            _cond.notify_all()
+
+
+def preload_model(name: str, device: str = "cpu", dtype: str = "float32") -> None:
+    """
+    预先加载一个模型副本，使后续请求直接命中热模型。
+    """
+    with acquire_model(name, device=device, dtype=dtype, timeout=None):
+        pass
+
+
+def get_pool_stats() -> Dict[str, Dict]:
+    """
+    返回模型池的统计信息，键为 "模型名/设备/精度"。
+
+    每项包含常驻副本数、正在使用数、等待数、冷/热借出次数以及加载耗时（秒）。
+    """
+    with _lock:
+        stats = {}
+        for (name, device, dtype), entry in _entries.items():
+            stats[f"{name}/{device}/{dtype}"] = {
+                "replicas": entry.replicas,
+                "max_replicas": entry.max_replicas,
+                "in_use": entry.in_use,
+                "waiting": entry.waiting,
+                "cold_acquires": entry.cold_acquires,
+                "warm_acquires": entry.warm_acquires,
+                "load_count": len(entry.load_times),
+                "load_time_total": round(sum(entry.load_times), 3),
+                "load_time_last": round(entry.load_times[-1], 3) if entry.load_times else None,
+            }
+        return stats
@@ -0,0 +1,143 @@
+import os
+import sys
+import glob
+import time
+import tempfile
+import warnings
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+import torch
+from torch import nn
+sys.path.append(os.path.abspath("/seal_flask/audio_detection/"))
+import whisper
+from whisper.model import Linear as WhisperLinear, ModelDimensions
+
+# int8 量化模型的磁盘缓存目录，启动时直接加载，不必每次重新量化
+_default_cache = os.path.join(os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "whisper")
+INT8_CACHE_DIR = os.getenv("WHISPER_INT8_CACHE", os.path.join(_default_cache, "int8"))
+
+# 关键词召回检查中，两个模型检测到的同一关键词开始时间允许的误差（秒）
+RECALL_TOLERANCE = 1.0
+
+
+def quantize_model(model: "whisper.Whisper") -> "whisper.Whisper":
+    """
+    对编码器与解码器中的全部 Linear 层做 int8 动态量化（权重 int8，激活在推理时动态量化），原地修改并返回模型。
+    只能在 CPU 上推理；卷积、嵌入与 LayerNorm 保持 float32。
+    """
+    # whisper 的 Linear 子类只是在 forward 中把权重转换为输入精度，float32 推理时与 nn.Linear 等价；
+    # quantize_dynamic 按精确类型匹配，因此先还原为 nn.Linear
+    for module in model.modules():
+        if type(module) is WhisperLinear:
+            module.__class__ = nn.Linear
+    model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
+    model.eval()
+    return model
+
+
+def _checkpoint_sha256(name: str) -> str:
+    if name in whisper._MODELS:
+        # 官方模型的下载地址中包含文件的 sha256
+        return whisper._MODELS[name].split("/")[-2]
+    return whisper._sha256_of_file(name)
+
+
+def _cache_path(name: str) -> str:
+    base = name if name in whisper._MODELS else os.path.splitext(os.path.basename(name))[0]
+    # 文件名带上原始模型文件的 sha256（模型文件更新后缓存随之失效）与 torch 版本（量化权重的序列化格式与之相关）
+    return os.path.join(INT8_CACHE_DIR, f"{base}-{_checkpoint_sha256(name)[:16]}-int8-torch{torch.__version__}.pt")
+
+
+def _restore(name: str, checkpoint: Dict) -> "whisper.Whisper":
+    """按缓存中的模型尺寸构建模型并量化出相同结构，再载入 int8 权重"""
+    model = quantize_model(whisper.Whisper(ModelDimensions(**checkpoint["dims"])))
+    model.load_state_dict(checkpoint["model_state_dict"])
+    # alignment_heads 不在 state_dict 中，与 whisper.load_model 一样按模型名重新设置
+    if name in whisper._MODELS:
+        model.set_alignment_heads(whisper._ALIGNMENT_HEADS[name])
+    return model
+
+
+def load_int8_model(name: str) -> "whisper.Whisper":
+    """
+    加载 int8 量化模型：优先读取磁盘缓存，没有缓存时加载 float32 模型、量化并写入缓存。
+    缓存中只保存模型尺寸与量化后的 state_dict，可以用 weights_only 安全加载。
+    """
+    path = _cache_path(name)
+    if os.path.exists(path):
+        try:
+            kwargs = {"weights_only": True} if whisper._torch_at_least("1.13") else {}
+            return _restore(name, torch.load(path, map_location="cpu", **kwargs))
+        except Exception as e:
+            # 缓存损坏或与当前代码不兼容，重新量化并覆盖
+            warnings.warn(f"int8 模型缓存 {path} 无法加载，重新量化：{e}")
+
+    model = quantize_model(whisper.load_model(name, device="cpu"))
+    tmp_path = None
+    try:
+        os.makedirs(INT8_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=INT8_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            torch.save({"dims": asdict(model.dims), "model_state_dict": model.state_dict()}, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        # 缓存目录不可写时只是每次启动都重新量化
+        warnings.warn(f"int8 模型缓存 {path} 写入失败：{e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return model
+
+
+def _match_count(reference: List, candidate: List) -> int:
+    remaining = list(candidate)
+    matched = 0
+    for label, start in reference:
+        for i, (other_label, other_start) in enumerate(remaining):
+            if other_label == label and abs(other_start - start) <= RECALL_TOLERANCE:
+                matched += 1
+                del remaining[i]
+                break
+    return matched
+
+
+def keyword_recall(audio_paths: List[str], name: str = "medium", language: Optional[str] = None) -> Dict:
+    """
+    以 float32 模型的检测结果为基准，计算 int8 模型的关键词召回率，并统计两者的转录耗时。
+
+    两个模型使用与线上相同的转录参数对每个文件整段转录，再用 detect_ai_labels_with_timestamps 提取关键词；
+    同一关键词开始时间相差不超过 RECALL_TOLERANCE 秒视为召回。
+    """
+    from .whisper_transcriber import detect_ai_labels_with_timestamps
+
+    options = dict(language=language, task="transcribe", beam_size=5, best_of=5, temperature=0.0,
+                   word_timestamps=True)
+    models = {"float32": whisper.load_model(name, device="cpu"), "int8": load_int8_model(name)}
+    files = []
+    totals = {"expected": 0, "recalled": 0, "extra": 0, "float32_seconds": 0.0, "int8_seconds": 0.0}
+    for path in audio_paths:
+        audio = whisper.load_audio(path)
+        matches = {}
+        for dtype, model in models.items():
+            started = time.perf_counter()
+            matches[dtype] = detect_ai_labels_with_timestamps(model.transcribe(audio, **options))
+            totals[f"{dtype}_seconds"] += time.perf_counter() - started
+        recalled = _match_count(matches["float32"], matches["int8"])
+        totals["expected"] += len(matches["float32"])
+        totals["recalled"] += recalled
+        totals["extra"] += len(matches["int8"]) - recalled
+        files.append({"path": path, "float32": matches["float32"], "int8": matches["int8"], "recalled": recalled})
+
+    totals["recall"] = totals["recalled"] / totals["expected"] if totals["expected"] else 1.0
+    totals["speedup"] = totals["float32_seconds"] / totals["int8_seconds"] if totals["int8_seconds"] else None
+    return {"summary": totals, "files": files}
+
+
+# 测试示例：python -m audio_detection.whisper_quantize [模型名] [音频文件...]
+if __name__ == "__main__":
+    model_name = sys.argv[1] if len(sys.argv) > 1 else "medium"
+    paths = sys.argv[2:] or sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai_result", "*")))
+    report = keyword_recall(paths, model_name)
+    for item in report["files"]:
+        print(f"{item['path']}: float32={item['float32']} int8={item['int8']}")
+    print(report["summary"])
@@ -4,32 +4,105 @@ import torch
 sys.path.append(os.path.abspath("/seal_flask/audio_detection/"))
 import whisper
 from typing import Optional, List, Tuple, Dict
+from .whisper_model_pool import acquire_model
+from .audio_buffer import as_decoded
+from .keyword_gate import (GATE_MODEL, GATE_OPTIONS, voiced_regions, candidate_windows, candidates_from_segments,
+                           merge_windows, intersect_windows, complement_windows, flatten_windows)
+from .whisper_batcher import BATCH_DECODE, transcribe_batched
+from tracing import span
 
 # 选择模型大小（根据需求和硬件选择）
 # 可选：tiny, base, small, medium, large
 MODEL_SIZE = "medium"  # 中等大小，平衡速度和准确率
+# 模型精度："float32"，或 "int8"（CPU 动态量化，推理更快、内存约为四分之一）
+MODEL_DTYPE = os.getenv("WHISPER_DTYPE", "float32")
+
+# 关键词预筛：先做语音活动检测，再用小模型贪心解码有声片段，
+# 只有可能含有标识关键词的片段才交给大模型做束搜索解码。设为 0 时对整段音频直接用大模型转录
+SPEECH_GATE = os.getenv("WHISPER_GATE", "1") != "0"
+
+# 转录范围："edge" 只转录开头、结尾（及提示位置附近）的窗口；"full" 转录整段音频
+WINDOW_MODE = os.getenv("WHISPER_WINDOW_MODE", "edge")
+# 开头 / 结尾窗口时长（秒）
+EDGE_HEAD = float(os.getenv("WHISPER_EDGE_HEAD", "30"))
+EDGE_TAIL = float(os.getenv("WHISPER_EDGE_TAIL", "30"))
+# 提示位置前后各转录的时长（秒）
+EDGE_HINT_RADIUS = float(os.getenv("WHISPER_EDGE_HINT_RADIUS", "10"))
+# 边缘窗口未找到标识时是否转录其余部分：
+# "unhinted" 仅在未给出 hints 时转录其余部分（给出 hints 时信任提示位置，只转录边缘窗口）；
+# "miss" 总是转录其余部分；"never" 不转录
+EDGE_ESCALATE = os.getenv("WHISPER_EDGE_ESCALATE", "unhinted")
+
+# device = "cuda" if torch.cuda.is_available() else "cpu"
+DEVICE = "cpu"
+
+
+def edge_windows(duration: float, hints: Optional[List[float]] = None) -> List[Tuple[float, float]]:
+    """
+    边缘转录窗口：开头 EDGE_HEAD 秒、结尾 EDGE_TAIL 秒，以及每个提示位置前后 EDGE_HINT_RADIUS 秒，合并重叠部分。
+    """
+    windows = [(0.0, EDGE_HEAD), (duration - EDGE_TAIL, duration)]
+    windows += [(hint - EDGE_HINT_RADIUS, hint + EDGE_HINT_RADIUS) for hint in hints or ()]
+    return merge_windows(windows, duration)
 
 
-def transcribe_audio(audio_path: str, language: Optional[str] = None) -> Dict:
+def transcribe_audio(audio, language: Optional[str] = None, hints: Optional[List[float]] = None) -> Dict:
     """
     使用 Whisper 模型转录音频文件，返回详细的转录结果（包含时间戳）
 
+    WINDOW_MODE 为 "edge" 时先只转录边缘窗口，窗口内未检测到标识时是否再转录其余部分由 EDGE_ESCALATE 决定，
+    两次的分段按时间顺序合并。默认 "unhinted" 下给出 hints 的请求只转录边缘窗口（不含标识的文件也不再转录整段，
+    位于其他位置且不在 hints 中的标识会漏检）；未给出 hints 时窗口内未检测到标识仍转录其余部分。
+
     参数:
-        audio_path: 输入音频文件路径
+        audio: 输入音频文件路径，或与节奏标识检测共用的 DecodedAudio
         language: 音频语言（如"zh"、"en"等，可选，模型会自动检测）
+        hints: 标识可能所在的位置（秒），edge 模式下额外转录这些位置附近
 
     返回:
         包含完整转录信息的字典，包括文本和分段时间戳
     """
-    # 检查文件是否存在
-    if not os.path.exists(audio_path):
-        raise FileNotFoundError(f"音频文件不存在: {audio_path}")
+    # 文件不存在时抛出 FileNotFoundError
+    audio = as_decoded(audio)
+    samples = audio.samples(whisper.audio.SAMPLE_RATE)
+    duration = len(samples) / whisper.audio.SAMPLE_RATE
+    whole = [(0.0, duration)]
+
+    if WINDOW_MODE != "edge":
+        return _transcribe_windows(samples, whole, language)
+
+    windows = edge_windows(duration, hints)
+    with span("transcribe.edge"):
+        result = _transcribe_windows(samples, windows, language)
+    remaining = complement_windows(windows, duration)
+    if not remaining or not _should_escalate(hints) or detect_ai_labels_with_timestamps(result):
+        return result
+
+    with span("transcribe.rest"):
+        rest = _transcribe_windows(samples, remaining, language)
+    segments = sorted(result["segments"] + rest["segments"], key=lambda segment: segment["start"])
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": result["language"] or rest["language"],
+    }
+
+
+def _should_escalate(hints: Optional[List[float]]) -> bool:
+    """
+    边缘窗口未检测到标识时是否转录其余部分
+    """
+    if EDGE_ESCALATE == "never":
+        return False
+    if EDGE_ESCALATE == "unhinted":
+        return not hints
+    return True
 
-    # 加载模型
-    # device = "cuda" if torch.cuda.is_available() else "cpu"
-    device = "cpu"
-    model = whisper.load_model(MODEL_SIZE, device=device)
 
+def _transcribe_windows(samples, windows: List[Tuple[float, float]], language: Optional[str]) -> Dict:
+    """
+    转录 samples 中 windows 覆盖的部分，分段时间戳相对整段音频。
+    """
     # 设置转录参数
     options = {
         "language": language,
@@ -40,8 +113,36 @@ def transcribe_audio(audio_path: str, language: Optional[str] = None) -> Dict:
         "word_timestamps": True  # 启用词级时间戳
     }
 
-    # 执行转录
-    result = model.transcribe(audio_path, **options)
+    # 执行转录（输入为 16kHz 单声道波形）
+    duration = len(samples) / whisper.audio.SAMPLE_RATE
+    if SPEECH_GATE:
+        with span("gate.vad"):
+            regions = intersect_windows(voiced_regions(samples, whisper.audio.SAMPLE_RATE), windows)
+        windows = []
+        if regions and BATCH_DECODE:
+            # 有声区间之间是静音，可以合并进同一个 30 秒窗口
+            with span("gate.screen"):
+                screened = transcribe_batched(GATE_MODEL, samples, regions, device=DEVICE, dtype=MODEL_DTYPE,
+                                              pack=True, language=language, **GATE_OPTIONS)
+            windows = candidates_from_segments(screened["segments"], duration)
+        elif regions:
+            with acquire_model(GATE_MODEL, device=DEVICE, dtype=MODEL_DTYPE) as gate_model, span("gate.screen"):
+                windows = candidate_windows(gate_model, samples, regions, language, whisper.audio.SAMPLE_RATE)
+    if not windows:
+        # 没有语音或小模型未发现疑似关键词，跳过大模型
+        return {"text": "", "segments": [], "language": language}
+
+    if BATCH_DECODE:
+        # 各窗口与其他并发请求的窗口合并成批解码
+        with span("inference.whisper"):
+            return transcribe_batched(MODEL_SIZE, samples, windows, device=DEVICE, dtype=MODEL_DTYPE, **options)
+
+    # 只解码所选片段（clip_timestamps 为空时 transcribe 会转录整段，因此上面提前返回）
+    options["clip_timestamps"] = flatten_windows(windows)
+
+    # 从常驻模型池借出模型（首次调用时加载，之后复用）
+    with acquire_model(MODEL_SIZE, device=DEVICE, dtype=MODEL_DTYPE) as model, span("inference.whisper"):
+        result = model.transcribe(samples, **options)
     return result
 
 
@@ -97,16 +198,17 @@ def detect_ai_labels_with_timestamps(transcription_result: Dict) -> List[Tuple[s
     return matches
 
 
-def process_audio(audio_path: str, language: Optional[str] = None) -> List[Tuple[str, float]]:
+def process_audio(audio, language: Optional[str] = None, hints: Optional[List[float]] = None) -> List[Tuple[str, float]]:
     """
     处理音频文件：先转录为文本，再检测是否包含 AI 生成/合成标识，并返回匹配结果及其时间戳
 
     参数:
-        audio_path: 输入音频文件路径
+        audio: 输入音频文件路径或 DecodedAudio
         language: 音频语言（可选，模型会自动检测）
+        hints: 标识可能所在的位置（秒）
 
     返回:
         列表，每个元素是一个元组(匹配的文本, 开始时间)
     """
-    result = transcribe_audio(audio_path, language)
+    result = transcribe_audio(audio, language, hints)
     return detect_ai_labels_with_timestamps(result)
\ No newline at end of file
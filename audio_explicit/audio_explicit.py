@@ -2,6 +2,8 @@ import json
 import os
 from pydub import AudioSegment
 
+from tracing import span
+
 
 def EmbedAudioExplicitLabel(OriginalAudioPath: str, ResultFilePath: str, ExplicitLabel: dict) -> str:
     """
@@ -37,8 +39,9 @@ def EmbedAudioExplicitLabel(OriginalAudioPath: str, ResultFilePath: str, Explici
             return json.dumps({"status": -1, "result": f"标识音文件不存在: {ExplicitLabel['LableAudioPath']}"}, ensure_ascii=False)
 
         # 加载音频
-        audio = AudioSegment.from_file(OriginalAudioPath)
-        label = AudioSegment.from_file(os.path.join(label_audio_dir, f"{ExplicitLabel['LableAudioPath']}.wav"))
+        with span("decode.audio"):
+            audio = AudioSegment.from_file(OriginalAudioPath)
+            label = AudioSegment.from_file(os.path.join(label_audio_dir, f"{ExplicitLabel['LableAudioPath']}.wav"))
 
         # 音量调整
         if 'Volume' in ExplicitLabel:
@@ -65,26 +68,29 @@ def EmbedAudioExplicitLabel(OriginalAudioPath: str, ResultFilePath: str, Explici
 
         output = audio
         # 逆序插入，避免位置偏移
-        for pos in sorted(positions, reverse=True):
-            ms = int(pos * 1000)
-            before = output[:ms]
-            after = output[ms:]
-            output = before + label + after
+        with span("render.label"):
+            for pos in sorted(positions, reverse=True):
+                ms = int(pos * 1000)
+                before = output[:ms]
+                after = output[ms:]
+                output = before + label + after
 
-        output.export(ResultFilePath, format="mp3")
+        with span("encode.audio"):
+            output.export(ResultFilePath, format="mp3")
         return json.dumps({"status": 1, "result": f"嵌入成功，输出文件: {ResultFilePath}"},ensure_ascii=False)
     except Exception as e:
         return json.dumps({"status": -2, "result": f"执行错误: {str(e)}"}, ensure_ascii=False)
 
 
-result = EmbedAudioExplicitLabel(
-    OriginalAudioPath="ai/real_original.wav",
-    ResultFilePath="ai_result/real_ai.mp3",
-    ExplicitLabel={
-        "LableAudioPath": "ai_label/voice1.wav",
-        "Positions": [0],  # 在0秒和10秒插入
-        "Volume": -1,
-        "Speed": 0.8
-    }
-)
-print(result)
\ No newline at end of file
+if __name__ == '__main__':
+    result = EmbedAudioExplicitLabel(
+        OriginalAudioPath="ai/real_original.wav",
+        ResultFilePath="ai_result/real_ai.mp3",
+        ExplicitLabel={
+            "LableAudioPath": "ai_label/voice1.wav",
+            "Positions": [0],  # 在0秒和10秒插入
+            "Volume": -1,
+            "Speed": 0.8
+        }
+    )
+    print(result)
\ No newline at end of file
@@ -11,6 +11,8 @@ from mutagen.oggvorbis import OggVorbis
 from mutagen.flac import FLAC
 from mutagen.mp4 import MP4, MP4FreeForm
 
+from tracing import span
+
 # --- 常量定义 ---
 # 遵循《网络安全标准实践指南》的规定，用于在不同格式中唯一标识AIGC数据
 
@@ -23,99 +25,166 @@ VORBIS_AIGC_KEY = 'AIGC'
 M4A_AIGC_KEY = '----:com.apple.iTunes:AIGC'
 # WAV格式：使用自定义的RIFF块，其块ID固定为'AIGC'
 WAV_AIGC_CHUNK_ID = b'AIGC'
+# WAV音频数据无法内核态复制时，每次读写的块大小
+WAV_COPY_CHUNK_SIZE = 1 << 20
 
 
 # --- WAV文件处理核心函数 ---
 
-def _embed_wav_label(filepath: str, label: str) -> None:
+def _scan_wav_chunks(f, file_size: int) -> List[Tuple[bytes, int, int]]:
     """
-    【内部函数】为WAV文件嵌入AIGC元数据块。
-
-    本函数采用“精确解析-安全重组”模式，以确保生成的WAV文件结构100%合规，
-    能够被所有标准播放器和编辑器正确识别。
-
-    工作流程:
-    1. 精确解析: 将WAV文件按块(chunk)分解，分离出每个块的ID和其实际数据（不含填充）。
-    2. 验证: 确保强制性的 'fmt ' 块存在，否则文件无效。
-    3. 修改: 从块列表中移除任何已存在的旧 'AIGC' 块，以支持重复嵌入。
-    4. 插入: 将新的 'AIGC' 块精确地插入到 'fmt ' 块之后，符合WAV规范。
-    5. 安全重组: 按照标准顺序和对齐规则，将所有块重新写入文件，并更新文件头部的总大小。
+    【内部函数】只读取块头部，逐块跳转扫描WAV文件结构，不读取音频数据。
 
-    Args:
-        filepath (str): 目标WAV文件路径。
-        label (str): 要嵌入的JSON格式字符串。
+    Returns:
+        List[Tuple[bytes, int, int]]: (块ID, 块起始偏移, 有效数据大小)。块头记录的大小超出文件末尾时
+        （如录制中断的文件），按文件实际剩余长度截断。
     """
-    try:
-        with open(filepath, 'rb') as f:
-            buffer = f.read()
-    except FileNotFoundError:
-        # 如果文件不存在，直接抛出异常，由上层函数处理
-        raise
-
-    # 步骤 1: 精确解析
-    # 验证文件是否以 'RIFF' 开始，并包含 'WAVE' 标识
-    if buffer[0:4] != b'RIFF' or buffer[8:12] != b'WAVE':
+    f.seek(0)
+    header = f.read(12)
+    if header[0:4] != b'RIFF' or header[8:12] != b'WAVE':
         raise ValueError("文件不是一个有效的WAV格式文件。")
 
-    chunks: List[Tuple[bytes, bytes]] = []  # 用于存储 (块ID, 块的有效数据)
-    offset = 12  # 从 'WAVE' 标识后开始解析
-    while offset < len(buffer):
-        chunk_id = buffer[offset:offset + 4]
-        if len(chunk_id) < 4: break  # 文件末尾，不足以构成一个块ID
-
-        chunk_size_bytes = buffer[offset + 4:offset + 8]
-        if len(chunk_size_bytes) < 4: break  # 文件末尾，不足以构成一个块大小
-
-        # 读取块头部记录的原始数据大小
-        chunk_size = struct.unpack('<I', chunk_size_bytes)[0]
-
-        # 读取未填充的有效载荷(payload)
-        payload = buffer[offset + 8: offset + 8 + chunk_size]
-        chunks.append((chunk_id, payload))
-
-        # 计算偏移量，移动到下一个块的起始位置，正确处理奇数长度块的填充字节
+    chunks: List[Tuple[bytes, int, int]] = []
+    offset = 12
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        chunk_id = f.read(4)
+        chunk_size = struct.unpack('<I', f.read(4))[0]
+        chunk_size = min(chunk_size, file_size - offset - 8)
+        chunks.append((chunk_id, offset, chunk_size))
         offset += 8 + chunk_size + (chunk_size % 2)
 
-    # 步骤 2: 验证 'fmt ' 块是否存在
-    if not any(cid == b'fmt ' for cid, payload in chunks):
+    if not any(cid == b'fmt ' for cid, _, _ in chunks):
         raise ValueError("WAV文件已损坏：未找到必需的 'fmt ' 块。")
+    return chunks
 
-    # 步骤 3: 修改块列表，移除任何已存在的旧 'AIGC' 块
-    chunks = [(cid, payload) for cid, payload in chunks if cid != WAV_AIGC_CHUNK_ID]
-
-    # 步骤 4: 创建并准备插入新的 'AIGC' 块
-    new_payload = label.encode('utf-8')
-    new_aigc_chunk = (WAV_AIGC_CHUNK_ID, new_payload)
 
-    # 找到 'fmt ' 块的索引，以便在其后插入
-    fmt_index = -1
-    for i, (cid, payload) in enumerate(chunks):
-        if cid == b'fmt ':
-            fmt_index = i
+def _copy_file_range(src, dst, offset: int, length: int) -> None:
+    """
+    【内部函数】把 src 中 [offset, offset + length) 的数据写到 dst 当前位置。
+    依次尝试 os.copy_file_range、os.sendfile（内核态复制，不经过用户态内存），都不可用时分块读写。
+    """
+    dst.flush()
+    for copy in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+        if copy is None:
+            continue
+        try:
+            while length > 0:
+                if copy is os.sendfile:
+                    copied = copy(dst.fileno(), src.fileno(), offset, length)
+                else:
+                    copied = copy(src.fileno(), dst.fileno(), length, offset)
+                if copied == 0:
+                    break
+                offset += copied
+                length -= copied
+        except OSError:
+            continue
+        if length == 0:
+            break
+    src.seek(offset)
+    while length > 0:
+        block = src.read(min(length, WAV_COPY_CHUNK_SIZE))
+        if not block:
             break
+        dst.write(block)
+        length -= len(block)
+    # 内核态复制移动了文件描述符的位置，同步缓冲文件对象的位置
+    dst.seek(0, os.SEEK_END)
 
-    # 将新块插入到 'fmt ' 块的后面一个位置
-    chunks.insert(fmt_index + 1, new_aigc_chunk)
 
-    # 步骤 5: 安全重组文件内容
-    wave_content = bytearray()
-    for cid, payload in chunks:
-        wave_content += cid  # 写入块ID
-        wave_content += struct.pack('<I', len(payload))  # 写入块的原始数据大小
-        wave_content += payload  # 写入块的有效数据
-        if len(payload) % 2 != 0:
-            wave_content += b'\x00'  # 如果数据长度为奇数，添加一个填充字节
+def _embed_wav_label(filepath: str, label: str, output_path: Optional[str] = None) -> None:
+    """
+    【内部函数】为WAV文件嵌入AIGC元数据块。
+
+    只读取块头部解析文件结构，音频数据不读入内存。
 
-    # 步骤 6: 构建最终文件并更新RIFF头
-    final_buffer = bytearray(b'RIFF')
-    # 计算新的文件总大小 = 'WAVE'标识(4字节) + 所有块的总内容长度
-    final_buffer += struct.pack('<I', 4 + len(wave_content))
-    final_buffer += b'WAVE'
-    final_buffer += wave_content
+    工作流程:
+    1. 扫描块头: 逐块跳转获得每个块的ID、偏移和大小，并确保强制性的 'fmt ' 块存在。
+    2. 写出:
+       - 输出到新文件时，按原顺序写出各块，跳过已存在的旧 'AIGC' 块，新 'AIGC' 块紧跟在 'fmt ' 块之后；
+         'data' 等大块由内核直接复制，整个过程只读写一遍文件。
+       - 原地修改（output_path 为空或与 filepath 相同）时，旧 'AIGC' 块放得下新内容则直接覆盖
+         （剩余部分以空字节填充，检测时会被移除）；放不下则把旧块改为 'JUNK' 块，
+         新 'AIGC' 块追加到文件末尾，只更新 RIFF 头部的总大小。
 
-    # 将重组后的内容完整写回文件
-    with open(filepath, 'wb') as f:
-        f.write(final_buffer)
+    Args:
+        filepath (str): 原始WAV文件路径。
+        label (str): 要嵌入的JSON格式字符串。
+        output_path (Optional[str]): 输出文件路径，为空时原地修改 filepath。
+    """
+    new_payload = label.encode('utf-8')
+    if output_path is None or (os.path.exists(output_path) and os.path.samefile(filepath, output_path)):
+        _append_wav_label(filepath, new_payload)
+        return
+
+    file_size = os.path.getsize(filepath)
+    with open(filepath, 'rb') as src:
+        chunks = _scan_wav_chunks(src, file_size)
+        chunks = [chunk for chunk in chunks if chunk[0] != WAV_AIGC_CHUNK_ID]
+
+        total = 4
+        for _, _, size in chunks:
+            total += 8 + size + (size % 2)
+        total += 8 + len(new_payload) + (len(new_payload) % 2)
+        if total > 0xFFFFFFFF:
+            raise ValueError("嵌入后的WAV文件超过4GB上限。")
+
+        with open(output_path, 'wb') as dst:
+            dst.write(b'RIFF' + struct.pack('<I', total) + b'WAVE')
+            for cid, offset, size in chunks:
+                dst.write(cid + struct.pack('<I', size))
+                _copy_file_range(src, dst, offset + 8, size)
+                if size % 2:
+                    dst.write(b'\x00')
+                if cid == b'fmt ':
+                    dst.write(_make_wav_chunk(WAV_AIGC_CHUNK_ID, new_payload))
+
+
+def _make_wav_chunk(chunk_id: bytes, payload: bytes) -> bytes:
+    return chunk_id + struct.pack('<I', len(payload)) + payload + (b'\x00' if len(payload) % 2 else b'')
+
+
+def _append_wav_label(filepath: str, new_payload: bytes) -> None:
+    """
+    【内部函数】原地修改WAV文件的AIGC块，只写入块头部和标签数据，不移动音频数据。
+    """
+    file_size = os.path.getsize(filepath)
+    with open(filepath, 'r+b') as f:
+        chunks = _scan_wav_chunks(f, file_size)
+        existing = [chunk for chunk in chunks if chunk[0] == WAV_AIGC_CHUNK_ID]
+
+        # 旧块足够大：直接覆盖，块大小不变
+        if existing and existing[0][2] >= len(new_payload):
+            _, offset, size = existing[0]
+            f.seek(offset + 8)
+            f.write(new_payload + b'\x00' * (size - len(new_payload)))
+            for _, other_offset, _ in existing[1:]:
+                f.seek(other_offset)
+                f.write(b'JUNK')
+            return
+
+        # 旧块改为 JUNK 块（播放器会跳过），新块追加到末尾
+        for _, offset, _ in existing:
+            f.seek(offset)
+            f.write(b'JUNK')
+
+        cid, offset, size = chunks[-1]
+        end = offset + 8 + size + (size % 2)
+        new_chunk = _make_wav_chunk(WAV_AIGC_CHUNK_ID, new_payload)
+        if end + len(new_chunk) - 8 > 0xFFFFFFFF:
+            raise ValueError("嵌入后的WAV文件超过4GB上限。")
+
+        # 最后一个块的大小按实际长度修正，并补齐奇数长度的填充字节
+        f.seek(offset + 4)
+        f.write(struct.pack('<I', size))
+        f.seek(offset + 8 + size)
+        if size % 2:
+            f.write(b'\x00')
+        f.write(new_chunk)
+        f.truncate()
+        f.seek(4)
+        f.write(struct.pack('<I', end + len(new_chunk) - 8))
 
 
 def _detect_wav_label(filepath: str) -> Optional[str]:
@@ -185,19 +254,26 @@ def EmbedAudioImplicitLabel(OriginalAudioPath: str, ImplicitLabel: str, ResultFi
     if not os.path.exists(OriginalAudioPath):
         return json.dumps({"status": -1, "result": f"嵌入失败：原始文件未找到于 {OriginalAudioPath}"}, ensure_ascii=False)
 
-    try:
-        # 为保证操作的原子性和原始文件的安全，总是先复制文件再进行修改
-        shutil.copy2(OriginalAudioPath, ResultFilePath)
-    except Exception as e:
-        return json.dumps({"status": -1, "result": f"嵌入失败：复制文件时出错: {e}"}, ensure_ascii=False)
-
     # 获取文件扩展名以判断格式
     ext = os.path.splitext(ResultFilePath)[1].lower()
+    same_file = os.path.exists(ResultFilePath) and os.path.samefile(OriginalAudioPath, ResultFilePath)
+
+    # WAV 在写出新文件的同时嵌入，不需要先复制一遍
+    if ext != '.wav':
+        try:
+            # 为保证操作的原子性和原始文件的安全，总是先复制文件再进行修改
+            with span("io.copy"):
+                shutil.copy2(OriginalAudioPath, ResultFilePath)
+        except Exception as e:
+            return json.dumps({"status": -1, "result": f"嵌入失败：复制文件时出错: {e}"}, ensure_ascii=False)
 
     try:
         # 根据文件格式，调用相应的处理逻辑
         if ext == '.wav':
-            _embed_wav_label(ResultFilePath, ImplicitLabel)
+            with span("wav.write"):
+                _embed_wav_label(OriginalAudioPath, ImplicitLabel, ResultFilePath)
+            if not same_file:
+                shutil.copystat(OriginalAudioPath, ResultFilePath)
 
         elif ext == '.mp3':
             audio = MP3(ResultFilePath, ID3=ID3)
@@ -227,8 +303,8 @@ def EmbedAudioImplicitLabel(OriginalAudioPath: str, ImplicitLabel: str, ResultFi
 
     except Exception as e:
         # 捕获所有可能的异常，如文件损坏、库错误等
-        # 如果出错，删除可能已损坏的目标文件
-        if os.path.exists(ResultFilePath):
+        # 如果出错，删除可能已损坏的目标文件（原地修改时保留原文件）
+        if not same_file and os.path.exists(ResultFilePath):
             try:
                 os.remove(ResultFilePath)
             except OSError:
@@ -262,7 +338,8 @@ def DetectAudioImplicitLabel(OriginalAudioPath: str) -> str:
     try:
         # 根据文件格式，调用相应的检测逻辑
         if ext == '.wav':
-            label = _detect_wav_label(OriginalAudioPath)
+            with span("wav.read"):
+                label = _detect_wav_label(OriginalAudioPath)
 
         elif ext == '.mp3':
             audio = MP3(OriginalAudioPath)
@@ -0,0 +1,85 @@
+import os
+import tarfile
+import tempfile
+import zipfile
+from typing import Iterator, Tuple
+
+# 单个批量请求最多处理的文件数
+BATCH_MAX_ITEMS = int(os.getenv("SEAL_BATCH_MAX_ITEMS", "10000"))
+# 压缩包中单个文件解压后的大小上限（字节）
+BATCH_MAX_MEMBER_BYTES = int(os.getenv("SEAL_BATCH_MAX_MEMBER_BYTES", str(2 << 30)))
+# 单个压缩包全部文件解压后的总大小上限（字节），防止压缩炸弹占满磁盘
+BATCH_MAX_TOTAL_BYTES = int(os.getenv("SEAL_BATCH_MAX_TOTAL_BYTES", str(16 << 30)))
+
+# 解压时每次复制的块大小
+EXTRACT_CHUNK_SIZE = 1 << 20
+
+_TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+class ArchiveTooLarge(ValueError):
+    """压缩包中的文件或解压总大小超过上限"""
+
+
+def is_archive(filename: str) -> bool:
+    name = filename.lower()
+    return name.endswith('.zip') or name.endswith(_TAR_SUFFIXES)
+
+
+class _ExtractBudget:
+    """
+    按单个文件与总大小上限检查解压量。先按包内记录的大小检查，解压时再按实际写入量检查
+    （zip 目录中记录的大小可以伪造）。
+    """
+
+    def __init__(self):
+        self.total = 0
+
+    def check(self, member_name: str, size: int) -> None:
+        if size > BATCH_MAX_MEMBER_BYTES:
+            raise ArchiveTooLarge(f"{member_name} 解压后超过单个文件上限 {BATCH_MAX_MEMBER_BYTES} 字节，其余文件未处理")
+        if self.total + size > BATCH_MAX_TOTAL_BYTES:
+            raise ArchiveTooLarge(f"压缩包解压后超过总大小上限 {BATCH_MAX_TOTAL_BYTES} 字节，其余文件未处理")
+
+    def extract(self, source, member_name: str) -> str:
+        ext = os.path.splitext(member_name)[-1]
+        written = 0
+        with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
+            try:
+                for block in iter(lambda: source.read(EXTRACT_CHUNK_SIZE), b""):
+                    written += len(block)
+                    self.check(member_name, written)
+                    tmp.write(block)
+            except BaseException:
+                tmp.close()
+                os.remove(tmp.name)
+                raise
+        self.total += written
+        return tmp.name
+
+
+def iter_archive(path: str, filename: str) -> Iterator[Tuple[str, str]]:
+    """
+    逐个解压压缩包中的文件到临时文件，产出 (包内文件名, 临时文件路径)。
+    每次只解压一个成员，调用方处理完后负责删除临时文件；目录、链接与隐藏文件跳过。
+    tar 按流式顺序读取，不需要先读完目录。
+    单个文件或解压总量超过 BATCH_MAX_MEMBER_BYTES / BATCH_MAX_TOTAL_BYTES 时抛出 ArchiveTooLarge。
+    """
+    budget = _ExtractBudget()
+    if filename.lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or os.path.basename(info.filename).startswith('.'):
+                    continue
+                budget.check(info.filename, info.file_size)
+                with archive.open(info) as source:
+                    yield info.filename, budget.extract(source, info.filename)
+        return
+
+    with tarfile.open(path, mode='r|*') as archive:
+        for member in archive:
+            if not member.isfile() or os.path.basename(member.name).startswith('.'):
+                continue
+            budget.check(member.name, member.size)
+            source = archive.extractfile(member)
+            yield member.name, budget.extract(source, member.name)
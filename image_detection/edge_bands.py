@@ -0,0 +1,84 @@
+import math
+import os
+from typing import List, Tuple
+import cv2
+import numpy as np
+from image_explicit.label_spec import CONTENT_OPTIONS, DEFAULT_TEXT_SCALE, LABEL_MARGIN_RATIO
+from .ocr_reader import readtext_with_fallback
+
+# 边缘区域按嵌入端的字号计算（字号 = 最短边 * TextScale）。默认按嵌入端的默认 TextScale，
+# 更大的标识可能被区域截断，此时边缘识别找不到合法标识，回退到全图识别。
+EDGE_TEXT_SCALE = float(os.getenv("IMAGE_EDGE_TEXT_SCALE", str(DEFAULT_TEXT_SCALE)))
+# 标识最多的字数，决定纵排标识的高度与左中/右中横排标识的宽度
+LABEL_MAX_CHARS = max(len(content) for content in CONTENT_OPTIONS.values())
+# 纵排标识每个字占的高度（字号的倍数，含行距）
+LINE_HEIGHT_RATIO = 1.25
+# 区域在标识外额外保留的宽度（字号的倍数），给 OCR 留出上下文
+EDGE_PADDING_RATIO = 0.5
+
+
+def edge_zones(width: int, height: int, text_scale: float = EDGE_TEXT_SCALE) -> List[Tuple[str, int, int, int, int]]:
+    """
+    计算需要识别的边缘区域，覆盖 image_explicit 中八种 PositionMode 的横排与纵排标识。
+    每个标识都完整落在至少一个区域内，不会被区域边界截断。
+
+    返回:
+        [(区域名, x0, y0, x1, y1), ...]
+        - top/bottom: 上下整条边缘带，覆盖四角及上中、下中的横排标识（1, 2, 3, 4, -1, -2）
+        - left/right: 左右整条边缘带，覆盖四角及左中、右中的纵排标识
+        - left_mid/right_mid: 左中、右中的横排标识（-3, -4）
+        - top_mid/bottom_mid: 上中、下中的纵排标识（-1, -2）
+    """
+    font_size = min(width, height) * text_scale
+    # 边缘带深度：边距 + 一行（横排）或一列（纵排）文字 + 余量
+    depth = max(1, math.ceil(font_size * (LABEL_MARGIN_RATIO + LINE_HEIGHT_RATIO + EDGE_PADDING_RATIO)))
+    if depth * 2 >= min(width, height):
+        # 图片过小，边缘带已覆盖全图
+        return [("full", 0, 0, width, height)]
+
+    # 标识沿边缘方向的最大长度：边距 + 最多字数 + 余量
+    reach = math.ceil(font_size * (LABEL_MARGIN_RATIO + LABEL_MAX_CHARS * LINE_HEIGHT_RATIO + EDGE_PADDING_RATIO))
+    reach_x = min(width, reach)
+    reach_y = min(height, reach)
+    cx, cy = width // 2, height // 2
+    return [
+        ("top", 0, 0, width, depth),
+        ("bottom", 0, height - depth, width, height),
+        ("left", 0, 0, depth, height),
+        ("right", width - depth, 0, width, height),
+        ("left_mid", 0, max(0, cy - depth), reach_x, min(height, cy + depth)),
+        ("right_mid", width - reach_x, max(0, cy - depth), width, min(height, cy + depth)),
+        ("top_mid", max(0, cx - depth), 0, min(width, cx + depth), reach_y),
+        ("bottom_mid", max(0, cx - depth), height - reach_y, min(width, cx + depth), height),
+    ]
+
+
+def readtext_edge_bands(image_path: str, text_scale: float = EDGE_TEXT_SCALE) -> List:
+    """
+    只对图片边缘区域做 OCR，并把识别框坐标换算回原图坐标。
+
+    参数:
+        image_path: 图片路径
+        text_scale: 按该 TextScale 的标识尺寸计算边缘区域
+
+    返回:
+        [(bbox, text, confidence), ...]，格式同 easyocr.Reader.readtext；图片无法读取时返回空列表
+    """
+    image = cv2.imread(image_path)
+    if image is None:
+        return []
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    height, width = image.shape[:2]
+
+    results = []
+    for _, x0, y0, x1, y1 in edge_zones(width, height, text_scale):
+        if x1 <= x0 or y1 <= y0:
+            continue
+        crop = np.ascontiguousarray(image[y0:y1, x0:x1])
+        for bbox, text, conf in readtext_with_fallback(crop):
+            bbox = [[int(x) + x0, int(y) + y0] for x, y in bbox]
+            results.append((bbox, text, conf))
+
+    # 相邻区域可能重复识别到同一段文字，按置信度从高到低保留
+    results.sort(key=lambda item: item[2], reverse=True)
+    return results
@@ -22,4 +22,37 @@ def judge_position(image_path: str, region: Tuple[int, int, int, int], edge_rati
     # 只要在任意一条边或角落即可
     if in_left or in_right or in_top or in_bottom:
         return "标识位置正确"
-    return "标识位置错误" 
\ No newline at end of file
+    return "标识位置错误" 
+
+
+def judge_position_mode(image_path: str, region: Tuple[int, int, int, int], edge_ratio: float = 0.05) -> int:
+    """
+    根据标识区域贴靠的边缘，返回与 image_explicit 一致的 PositionMode：
+    1(右下), 2(左下), 3(右上), 4(左上), -1(下中), -2(上中), -3(左中), -4(右中)，不贴边时返回 0。
+    region: (x, y, w, h)
+    """
+    image = cv2.imread(image_path)
+    H, W = image.shape[:2]
+    x, y, w, h = region
+    margin = int(min(H, W) * edge_ratio)
+    in_left = x <= margin
+    in_right = x + w >= W - margin
+    in_top = y <= margin
+    in_bottom = y + h >= H - margin
+    if in_bottom and in_right:
+        return 1
+    if in_bottom and in_left:
+        return 2
+    if in_top and in_right:
+        return 3
+    if in_top and in_left:
+        return 4
+    if in_bottom:
+        return -1
+    if in_top:
+        return -2
+    if in_left:
+        return -3
+    if in_right:
+        return -4
+    return 0
@@ -1,9 +1,14 @@
 import sys
 import os
-import easyocr
+from .ocr_reader import readtext_with_fallback
+from .edge_bands import readtext_edge_bands
 from .judge_content import judge_content
-from .judge_position import judge_position
+from .judge_position import judge_position, judge_position_mode
 import json
+from tracing import span
+
+# OCR 模式："edge" 先只识别图片边缘区域，未找到合法标识时再识别全图；"full" 直接识别全图
+OCR_MODE = os.getenv("IMAGE_OCR_MODE", "edge")
 
 def DetectImageExplicitLabel(OriginalImagePath: str) -> str:
     """
@@ -32,14 +37,18 @@ def DetectImageExplicitLabel(OriginalImagePath: str) -> str:
                 "result": f"执行错误: 文件不存在 '{OriginalImagePath}'"
             })
 
-        # 用中英文模型识别
-        reader_cn = easyocr.Reader(['ch_sim', 'en'], gpu=False)
-        results_cn = reader_cn.readtext(OriginalImagePath)
-        # 用英文模型识别
-        reader_en = easyocr.Reader(['en'], gpu=False)
-        results_en = reader_en.readtext(OriginalImagePath)
+        # 用共享的中英文模型识别，置信度过低时再追加英文模型识别
+        # 合规标识必须贴边，因此先只识别边缘区域，找不到合法标识时再识别全图
+        all_results = []
+        if OCR_MODE == "edge":
+            with span("ocr.edge"):
+                all_results = readtext_edge_bands(OriginalImagePath)
+            if judge_content([item[1] for item in all_results]) == "错误标识":
+                all_results = []
+        if not all_results:
+            with span("ocr.full"):
+                all_results = readtext_with_fallback(OriginalImagePath)
         # 合并所有文本内容（去重）
-        all_results = results_cn + results_en
         texts = []
         bboxes = []
         for item in all_results:
@@ -73,7 +82,9 @@ def DetectImageExplicitLabel(OriginalImagePath: str) -> str:
         x, y, w, h = int(min(x_coords)), int(min(y_coords)), int(max(x_coords)-min(x_coords)), int(max(y_coords)-min(y_coords))
 
         # 判断位置
-        pos_result = judge_position(OriginalImagePath, (x, y, w, h))
+        with span("judge.position"):
+            pos_result = judge_position(OriginalImagePath, (x, y, w, h))
+            position_mode = judge_position_mode(OriginalImagePath, (x, y, w, h))
         print(pos_result)
 
         # 构造返回结果
@@ -82,7 +93,7 @@ def DetectImageExplicitLabel(OriginalImagePath: str) -> str:
             "result": "检测成功",
             "ExplicitLabel": [
                 ["LableContent", result, True],
-                ["PositionMode", pos_result.get('PositionMode', 0), True],
+                ["PositionMode", position_mode, pos_result == "标识位置正确"],
                 ["TextScale", round(h / min(os.path.getsize(OriginalImagePath), 1000), 2), True]
             ]
         }, ensure_ascii=False)
@@ -0,0 +1,53 @@
+import threading
+from typing import Dict, List, Tuple
+import easyocr
+
+# 双语模型已覆盖英文；只有当双语结果的最高置信度低于该阈值时才追加英文模型识别
+LOW_CONFIDENCE = 0.5
+
+_readers: Dict[Tuple[Tuple[str, ...], bool], easyocr.Reader] = {}
+_reader_locks: Dict[Tuple[Tuple[str, ...], bool], threading.Lock] = {}
+_lock = threading.Lock()
+
+
+def get_reader(lang_list=('ch_sim', 'en'), gpu: bool = False) -> easyocr.Reader:
+    """
+    获取进程内共享的 EasyOCR Reader，同一语言组合只加载一次检测/识别模型权重。
+    """
+    key = (tuple(lang_list), gpu)
+    with _lock:
+        reader = _readers.get(key)
+        if reader is None:
+            reader = _readers[key] = easyocr.Reader(list(lang_list), gpu=gpu)
+            _reader_locks[key] = threading.Lock()
+        return reader
+
+
+def readtext(image, lang_list=('ch_sim', 'en'), gpu: bool = False, **kwargs) -> List:
+    """
+    使用共享 Reader 识别图片中的文字，参数与返回值同 easyocr.Reader.readtext。
+    image 可以是文件路径或 numpy 图像。同一 Reader 的调用串行执行。
+    """
+    reader = get_reader(lang_list, gpu)
+    with _reader_locks[(tuple(lang_list), gpu)]:
+        return reader.readtext(image, **kwargs)
+
+
+def readtext_with_fallback(image, low_confidence: float = LOW_CONFIDENCE, gpu: bool = False) -> List:
+    """
+    先用中英双语模型识别一次；若没有结果或最高置信度低于 low_confidence，
+    再用英文模型识别并合并结果（按文本去重，双语结果优先）。
+
+    返回:
+        [(bbox, text, confidence), ...]
+    """
+    results = readtext(image, ('ch_sim', 'en'), gpu)
+    if results and max(item[2] for item in results) >= low_confidence:
+        return results
+
+    seen = {item[1] for item in results}
+    for item in readtext(image, ('en',), gpu):
+        if item[1] not in seen:
+            seen.add(item[1])
+            results.append(item)
+    return results
@@ -1,4 +1,4 @@
-import easyocr
+from .ocr_reader import readtext
 import cv2
 from typing import List, Tuple
 
@@ -9,12 +9,11 @@ def recognize_text(image_path: str, regions: List[Tuple[int, int, int, int]], la
     """
     if lang_list is None:
         lang_list = ['ch_sim', 'en']
-    reader = easyocr.Reader(lang_list, gpu=False)
-    image = cv2.imread(image_path)reader = easyocr.Reader(['ch_sim', 'en'], gpu=True)
+    image = cv2.imread(image_path)
     results = []
     for (x, y, w, h) in regions:
         crop = image[y:y+h, x:x+w]
-        result = reader.readtext(crop)
+        result = readtext(crop, lang_list)
         if result:
             # 取置信度最高的结果
             text = max(result, key=lambda x: x[2])[1]
@@ -8,6 +8,10 @@ import traceback  # 引入traceback模块用于详细的错误报告
 import requests
 from PIL import Image, ImageDraw, ImageFont
 
+from tracing import span
+
+from .label_spec import CONTENT_OPTIONS, DEFAULT_TEXT_SCALE, LABEL_MARGIN_RATIO
+
 # 脚本将首先在'fonts'子目录中查找字体文件。
 # 请将字体文件（如msyh.ttc, simsun.ttc等）放入该目录。
 FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts')
@@ -58,7 +62,7 @@ def get_default_explicit_label():
         'ContentMode': 3,          # 默认内容为 "AI生成"
         'PositionMode': 1,
         'TextDirection': 0,
-        'TextScale': 0.08,
+        'TextScale': DEFAULT_TEXT_SCALE,
         'TextColor': [255, 255, 255],
         'FontName': 1,
         'Opacity': 1.0,
@@ -84,16 +88,9 @@ def EmbedImageExplicitLabel(OriginalImagePath: str, ResultFilePath: str, Explici
         label_config.update(ExplicitLabel)
 
         # 新逻辑：根据 ContentMode 或 LableContent 确定水印文本
-        content_options = {
-            1: "人工智能生成",
-            2: "人工智能合成",
-            3: "AI生成",
-            4: "AI合成",
-        }
-        
         content_mode = label_config.get('ContentMode')
-        if content_mode in content_options:
-            content = content_options[content_mode]
+        if content_mode in CONTENT_OPTIONS:
+            content = CONTENT_OPTIONS[content_mode]
         else:
             # 向后兼容旧的 LableContent 参数，如果ContentMode不存在，则尝试使用LableContent
             content = label_config.get('LableContent', 'AI生成')
@@ -125,9 +122,11 @@ def EmbedImageExplicitLabel(OriginalImagePath: str, ResultFilePath: str, Explici
             except FileNotFoundError:
                 # 添加详细的路径信息以供调试
                 return json.dumps({"status": -2, "result": f"Image.open could not find the image file. Absolute path checked: {os.path.abspath(OriginalImagePath)}"})
-        
-        if img.mode != 'RGBA':
-            img = img.convert('RGBA')
+
+        with span("decode.image"):
+            img.load()
+            if img.mode != 'RGBA':
+                img = img.convert('RGBA')
 
         # --- 3. 准备字体和文本 ---
         font_path = find_font(font_name_key)
@@ -160,7 +159,7 @@ def EmbedImageExplicitLabel(OriginalImagePath: str, ResultFilePath: str, Explici
             # Fallback for older Pillow versions
             text_width, text_height = temp_draw.textsize(content, font=font)
 
-        margin = int(font_size * 0.5) # 边距, 从 0.2 增加到 0.5
+        margin = int(font_size * LABEL_MARGIN_RATIO) # 边距, 从 0.2 增加到 0.5
 
         positions = {
             1: (img_width - text_width - margin, img_height - text_height - margin), # 右下
@@ -182,7 +181,8 @@ def EmbedImageExplicitLabel(OriginalImagePath: str, ResultFilePath: str, Explici
         draw.text((x, y), content, font=font, fill=text_color_with_opacity)
 
         # --- 6. 合成并保存 ---
-        result_img = Image.alpha_composite(img, watermark_layer)
+        with span("render.label"):
+            result_img = Image.alpha_composite(img, watermark_layer)
         
         output_format = ResultFilePath.split('.')[-1].upper()
         if output_format in ['JPG', 'JPEG']:
@@ -192,8 +192,9 @@ def EmbedImageExplicitLabel(OriginalImagePath: str, ResultFilePath: str, Explici
         output_dir = os.path.dirname(ResultFilePath)
         if output_dir:
             os.makedirs(output_dir, exist_ok=True)
-            
-        result_img.save(ResultFilePath)
+
+        with span("encode.image"):
+            result_img.save(ResultFilePath)
 
         return json.dumps({"status": 1, "result": f"Successfully watermarked image and saved to {ResultFilePath}"}, ensure_ascii=False)
 
@@ -0,0 +1,16 @@
+# 显式标识的排版常量，嵌入端（image_explicit）与检测端（image_detection.edge_bands）共用。
+# 本模块不依赖 PIL、requests 等，检测端导入时不会加载嵌入端。
+
+# ContentMode 对应的标识内容
+CONTENT_OPTIONS = {
+    1: "人工智能生成",
+    2: "人工智能合成",
+    3: "AI生成",
+    4: "AI合成",
+}
+
+# 标识与图片边缘的距离占字号的比例（字号 = 图片最短边 * TextScale）
+LABEL_MARGIN_RATIO = 0.5
+
+# 默认字号占图片最短边的比例
+DEFAULT_TEXT_SCALE = 0.08
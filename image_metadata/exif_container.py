@@ -0,0 +1,440 @@
+import os
+import struct
+import zlib
+from typing import List, Optional, Tuple
+
+# piexif.dump 生成的 EXIF 数据以该头开头（JPEG APP1 格式），PNG/WebP 中只存放其后的 TIFF 部分
+EXIF_HEADER = b'Exif\x00\x00'
+
+# 复制像素数据时每次读写的块大小
+COPY_CHUNK_SIZE = 1 << 20
+
+
+class UnsupportedImageFormatError(ValueError):
+    """图片容器格式无法识别，需要回退到 Pillow 重新编码。"""
+
+
+def detect_format(head: bytes) -> Optional[str]:
+    """
+    根据文件头判断容器格式，返回 'jpeg' / 'png' / 'webp' / 'heif'，无法识别时返回 None。
+    """
+    if head[:3] == b'\xff\xd8\xff':
+        return 'jpeg'
+    if head[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'heic', b'heix', b'heim', b'heis', b'mif1', b'msf1', b'avif'):
+        return 'heif'
+    return None
+
+
+def _tiff_payload(exif_bytes: bytes) -> bytes:
+    return exif_bytes[len(EXIF_HEADER):] if exif_bytes.startswith(EXIF_HEADER) else exif_bytes
+
+
+def _copy_rest(src, dst, length: Optional[int] = None) -> None:
+    """把 src 当前位置之后的数据（或指定长度）原样写入 dst。"""
+    while length is None or length > 0:
+        block = src.read(COPY_CHUNK_SIZE if length is None else min(length, COPY_CHUNK_SIZE))
+        if not block:
+            break
+        dst.write(block)
+        if length is not None:
+            length -= len(block)
+
+
+# --- JPEG ---
+
+def _insert_jpeg(src, dst, exif_bytes: bytes) -> None:
+    """
+    在 SOI 及 APP0(JFIF) 之后写入新的 APP1 Exif 段，删除原有 Exif 段，其余段与熵编码数据原样复制。
+    """
+    if not exif_bytes.startswith(EXIF_HEADER):
+        exif_bytes = EXIF_HEADER + exif_bytes
+    if len(exif_bytes) + 2 > 0xFFFF:
+        raise ValueError("EXIF 数据超过 JPEG APP1 段长度上限")
+    app1 = b'\xff\xe1' + struct.pack('>H', len(exif_bytes) + 2) + exif_bytes
+
+    src.seek(2)
+    dst.write(b'\xff\xd8')
+    written = False
+    while True:
+        marker = src.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise UnsupportedImageFormatError("JPEG 段结构异常")
+        # SOS 之后是熵编码数据，直接复制到文件结尾
+        if marker[1] == 0xDA or not 0xE0 <= marker[1] <= 0xEF:
+            if not written:
+                dst.write(app1)
+            dst.write(marker)
+            _copy_rest(src, dst)
+            return
+        length = struct.unpack('>H', src.read(2))[0]
+        body = src.read(length - 2)
+        if marker[1] == 0xE1 and body.startswith(EXIF_HEADER):
+            continue
+        if marker[1] != 0xE0 and not written:
+            dst.write(app1)
+            written = True
+        dst.write(marker + struct.pack('>H', length) + body)
+
+
+# --- PNG ---
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data) & 0xFFFFFFFF)
+
+
+def _insert_png(src, dst, exif_bytes: bytes) -> None:
+    """
+    在 IHDR 之后写入 eXIf 块（规范要求位于 IDAT 之前），删除原有 eXIf 块，其余块原样复制。
+    """
+    src.seek(8)
+    dst.write(b'\x89PNG\r\n\x1a\n')
+    while True:
+        header = src.read(8)
+        if len(header) < 8:
+            raise UnsupportedImageFormatError("PNG 缺少 IEND 块")
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type == b'eXIf':
+            src.seek(length + 4, os.SEEK_CUR)
+            continue
+        dst.write(header)
+        _copy_rest(src, dst, length + 4)
+        if chunk_type == b'IHDR':
+            dst.write(_png_chunk(b'eXIf', _tiff_payload(exif_bytes)))
+        elif chunk_type == b'IEND':
+            return
+
+
+# --- WebP ---
+
+def _riff_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack('<4sI', chunk_type, len(data)) + data + (b'\x00' if len(data) % 2 else b'')
+
+
+def _webp_canvas_size(chunk_type: bytes, data: bytes) -> Tuple[int, int]:
+    """从简单格式（VP8 / VP8L）的位流头读取画布尺寸。"""
+    if chunk_type == b'VP8 ' and data[3:6] == b'\x9d\x01\x2a':
+        width, height = struct.unpack('<HH', data[6:10])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk_type == b'VP8L' and data[:1] == b'\x2f':
+        bits = struct.unpack('<I', data[1:5])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    raise UnsupportedImageFormatError("无法解析 WebP 位流头")
+
+
+def _insert_webp(src, dst, exif_bytes: bytes) -> None:
+    """
+    写入 EXIF 块并在 VP8X 中置位 EXIF 标志；简单格式的 WebP 先补上 VP8X 头转为扩展格式。
+    图像数据块原样复制。
+    """
+    src.seek(12)
+    chunks = []
+    while True:
+        header = src.read(8)
+        if len(header) < 8:
+            break
+        chunk_type, size = struct.unpack('<4sI', header)
+        offset = src.tell()
+        # 只读入小的头部块，图像数据在写出时再按偏移复制
+        data = src.read(min(size, 64)) if chunk_type in (b'VP8X', b'VP8 ', b'VP8L') else None
+        chunks.append((chunk_type, offset, size, data))
+        src.seek(offset + size + (size & 1))
+
+    exif_chunk = _riff_chunk(b'EXIF', _tiff_payload(exif_bytes))
+    out_chunks: List[Tuple[bytes, Optional[bytes], int, int]] = []
+    if chunks and chunks[0][0] == b'VP8X':
+        vp8x = bytearray(chunks[0][3][:10])
+        vp8x[0] |= 0x08
+        out_chunks.append((b'VP8X', bytes(vp8x), 0, 0))
+        rest = chunks[1:]
+    elif len(chunks) == 1 and chunks[0][0] in (b'VP8 ', b'VP8L'):
+        width, height = _webp_canvas_size(chunks[0][0], chunks[0][3])
+        flags = 0x08
+        if chunks[0][0] == b'VP8L' and (struct.unpack('<I', chunks[0][3][1:5])[0] >> 28) & 1:
+            flags |= 0x10
+        vp8x = struct.pack('<I', flags) + struct.pack('<I', width - 1)[:3] + struct.pack('<I', height - 1)[:3]
+        out_chunks.append((b'VP8X', vp8x, 0, 0))
+        rest = chunks
+    else:
+        raise UnsupportedImageFormatError("WebP 块结构异常")
+
+    for chunk_type, offset, size, _ in rest:
+        if chunk_type != b'EXIF':
+            out_chunks.append((chunk_type, None, offset, size))
+
+    body_size = len(exif_chunk)
+    for chunk_type, data, offset, size in out_chunks:
+        length = len(data) if data is not None else size
+        body_size += 8 + length + (length & 1)
+
+    dst.write(struct.pack('<4sI4s', b'RIFF', body_size + 4, b'WEBP'))
+    written = False
+    for chunk_type, data, offset, size in out_chunks:
+        # 规范要求 EXIF 块位于图像数据之后、XMP 块之前
+        if chunk_type == b'XMP ' and not written:
+            dst.write(exif_chunk)
+            written = True
+        if data is not None:
+            dst.write(_riff_chunk(chunk_type, data))
+            continue
+        dst.write(struct.pack('<4sI', chunk_type, size))
+        src.seek(offset)
+        _copy_rest(src, dst, size + (size & 1))
+    if not written:
+        dst.write(exif_chunk)
+
+
+# --- HEIF ---
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack('>I4s', data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise UnsupportedImageFormatError("HEIF box 结构异常")
+        yield box_type, offset, size, header
+        offset += size
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I4s', len(payload) + 8, box_type) + payload
+
+
+def _read_uint(data: bytes, pos: int, size: int) -> Tuple[int, int]:
+    if size == 0:
+        return 0, pos
+    return int.from_bytes(data[pos:pos + size], 'big'), pos + size
+
+
+def _parse_iloc(payload: bytes) -> Tuple[int, Tuple[int, int, int, int], List[dict]]:
+    version = payload[0]
+    offset_size, length_size = payload[4] >> 4, payload[4] & 0x0F
+    base_offset_size = payload[5] >> 4
+    index_size = payload[5] & 0x0F if version in (1, 2) else 0
+    pos = 6
+    count_size = 2 if version < 2 else 4
+    count, pos = _read_uint(payload, pos, count_size)
+    items = []
+    for _ in range(count):
+        item_id, pos = _read_uint(payload, pos, 2 if version < 2 else 4)
+        method = 0
+        if version in (1, 2):
+            method, pos = _read_uint(payload, pos, 2)
+            method &= 0x0F
+        dref, pos = _read_uint(payload, pos, 2)
+        base_offset, pos = _read_uint(payload, pos, base_offset_size)
+        extent_count, pos = _read_uint(payload, pos, 2)
+        extents = []
+        for _ in range(extent_count):
+            index, pos = _read_uint(payload, pos, index_size)
+            extent_offset, pos = _read_uint(payload, pos, offset_size)
+            extent_length, pos = _read_uint(payload, pos, length_size)
+            extents.append([index, extent_offset, extent_length])
+        items.append({'id': item_id, 'method': method, 'dref': dref, 'base': base_offset, 'extents': extents})
+    return version, (offset_size, length_size, base_offset_size, index_size), items
+
+
+def _build_iloc(version: int, sizes: Tuple[int, int, int, int], items: List[dict]) -> bytes:
+    """生成 iloc box 的内容（不含 box 头）。"""
+    offset_size, length_size, base_offset_size, index_size = sizes
+    out = bytearray(bytes([version, 0, 0, 0, (offset_size << 4) | length_size, (base_offset_size << 4) | index_size]))
+    out += len(items).to_bytes(2 if version < 2 else 4, 'big')
+    for item in items:
+        out += item['id'].to_bytes(2 if version < 2 else 4, 'big')
+        if version in (1, 2):
+            out += item['method'].to_bytes(2, 'big')
+        out += item['dref'].to_bytes(2, 'big')
+        out += item['base'].to_bytes(base_offset_size, 'big') if base_offset_size else b''
+        out += len(item['extents']).to_bytes(2, 'big')
+        for index, extent_offset, extent_length in item['extents']:
+            out += index.to_bytes(index_size, 'big') if index_size else b''
+            out += extent_offset.to_bytes(offset_size, 'big')
+            out += extent_length.to_bytes(length_size, 'big')
+    return bytes(out)
+
+
+def _parse_iinf(payload: bytes) -> Tuple[int, List[Tuple[int, bytes, bytes]]]:
+    """返回 (iinf 版本, [(item_ID, item_type, infe box 原始字节), ...])。"""
+    version = payload[0]
+    start = 6 if version == 0 else 8
+    entries = []
+    for box_type, offset, size, header in _iter_boxes(payload, start):
+        if box_type != b'infe':
+            continue
+        body = payload[offset + header:offset + size]
+        infe_version = body[0]
+        if infe_version == 2:
+            item_id, item_type = struct.unpack('>H', body[4:6])[0], body[8:12]
+        elif infe_version == 3:
+            item_id, item_type = struct.unpack('>I', body[4:8])[0], body[10:14]
+        else:
+            item_id, item_type = struct.unpack('>H', body[4:6])[0], b''
+        entries.append((item_id, item_type, payload[offset:offset + size]))
+    return version, entries
+
+
+def _build_iref(payload: Optional[bytes], exif_id: int, primary_id: int, removed: int) -> bytes:
+    """生成 iref box 的内容：加入 Exif 项指向主图像的 cdsc 引用，并去掉已删除项的引用。"""
+    version = payload[0] if payload else 0
+    id_size = 2 if version == 0 else 4
+    refs = b''
+    if payload:
+        for box_type, offset, size, header in _iter_boxes(payload, 4):
+            body = payload[offset + header:offset + size]
+            from_id = int.from_bytes(body[:id_size], 'big')
+            if from_id in (removed, exif_id):
+                continue
+            refs += payload[offset:offset + size]
+    cdsc = exif_id.to_bytes(id_size, 'big') + (1).to_bytes(2, 'big') + primary_id.to_bytes(id_size, 'big')
+    return bytes([version, 0, 0, 0]) + refs + _box(b'cdsc', cdsc)
+
+
+def _insert_heif(src, dst, exif_bytes: bytes) -> None:
+    """
+    在 meta 中加入（或替换）Exif 项：更新 iinf/iloc/iref，Exif 数据放在文件末尾新增的 mdat 中。
+    meta 变长后，位于其后的 construction_method 0 数据块偏移整体修正，图像数据原样复制。
+    """
+    src.seek(0, os.SEEK_END)
+    file_size = src.tell()
+    src.seek(0)
+    meta_offset = meta_size = None
+    offset = 0
+    while offset + 8 <= file_size:
+        src.seek(offset)
+        size, box_type = struct.unpack('>I4s', src.read(8))
+        if size == 1:
+            size = struct.unpack('>Q', src.read(8))[0]
+        elif size == 0:
+            size = file_size - offset
+        if size < 8:
+            raise UnsupportedImageFormatError("HEIF box 结构异常")
+        if box_type == b'meta':
+            meta_offset, meta_size = offset, size
+            break
+        offset += size
+    if meta_offset is None:
+        raise UnsupportedImageFormatError("HEIF 缺少 meta box")
+
+    src.seek(meta_offset)
+    meta = src.read(meta_size)
+    _, _, _, header = next(_iter_boxes(meta))
+    children = {}
+    order = []
+    for box_type, offset, size, child_header in _iter_boxes(meta, header + 4):
+        children[box_type] = meta[offset + child_header:offset + size]
+        order.append(box_type)
+    if b'iinf' not in children or b'iloc' not in children or b'pitm' not in children:
+        raise UnsupportedImageFormatError("HEIF meta 缺少 iinf/iloc/pitm")
+
+    pitm = children[b'pitm']
+    primary_id = struct.unpack('>H', pitm[4:6])[0] if pitm[0] == 0 else struct.unpack('>I', pitm[4:8])[0]
+    iinf_version, infe_entries = _parse_iinf(children[b'iinf'])
+    iloc_version, sizes, items = _parse_iloc(children[b'iloc'])
+
+    # 已有 Exif 项时删除后重新写入
+    removed = next((item_id for item_id, item_type, _ in infe_entries if item_type == b'Exif'), -1)
+    infe_entries = [entry for entry in infe_entries if entry[0] != removed]
+    items = [item for item in items if item['id'] != removed]
+    exif_id = max([entry[0] for entry in infe_entries] + [item['id'] for item in items] + [0]) + 1
+    if exif_id > 0xFFFF:
+        raise UnsupportedImageFormatError("HEIF 项数量超出范围")
+
+    infe = _box(b'infe', bytes([2, 0, 0, 0]) + struct.pack('>HH', exif_id, 0) + b'Exif' + b'\x00')
+    count_bytes = len(infe_entries) + 1
+    iinf_payload = bytes([iinf_version, 0, 0, 0])
+    iinf_payload += count_bytes.to_bytes(2 if iinf_version == 0 else 4, 'big')
+    iinf_payload += b''.join(raw for _, _, raw in infe_entries) + infe
+
+    exif_payload = struct.pack('>I', len(EXIF_HEADER)) + EXIF_HEADER + _tiff_payload(exif_bytes)
+    offset_size, length_size, base_offset_size, index_size = sizes
+    sizes = (max(offset_size, 4), max(length_size, 4), base_offset_size, index_size)
+    items.append({'id': exif_id, 'method': 0, 'dref': 0, 'base': 0, 'extents': [[0, 0, len(exif_payload)]]})
+
+    def build_meta(delta: int, exif_offset: int) -> bytes:
+        shifted = []
+        for item in items:
+            item = dict(item, extents=[list(extent) for extent in item['extents']])
+            if item['id'] == exif_id:
+                item['extents'][0][1] = exif_offset
+            elif item['method'] == 0 and item['dref'] == 0:
+                if item['base']:
+                    if item['base'] >= meta_offset + meta_size:
+                        item['base'] += delta
+                else:
+                    for extent in item['extents']:
+                        if extent[1] >= meta_offset + meta_size:
+                            extent[1] += delta
+            shifted.append(item)
+        new_children = dict(children)
+        new_children[b'iinf'] = iinf_payload
+        new_children[b'iref'] = _build_iref(children.get(b'iref'), exif_id, primary_id, removed)
+        new_children[b'iloc'] = _build_iloc(iloc_version, sizes, shifted)
+        boxes = list(order)
+        if b'iref' not in boxes:
+            boxes.append(b'iref')
+        body = meta[header:header + 4] + b''.join(_box(box_type, new_children[box_type]) for box_type in boxes)
+        return _box(b'meta', body)
+
+    # meta 的长度只取决于各字段宽度，与偏移数值无关，先求出长度再确定偏移
+    new_meta_size = len(build_meta(0, 0))
+    delta = new_meta_size - meta_size
+    exif_offset = file_size + delta + 8
+    if max(exif_offset, file_size + delta) >= 1 << (8 * sizes[0]):
+        raise UnsupportedImageFormatError("iloc 偏移宽度不足")
+    new_meta = build_meta(delta, exif_offset)
+
+    src.seek(0)
+    _copy_rest(src, dst, meta_offset)
+    dst.write(new_meta)
+    src.seek(meta_offset + meta_size)
+    _copy_rest(src, dst)
+    dst.write(_box(b'mdat', exif_payload))
+
+
+_WRITERS = {
+    'jpeg': _insert_jpeg,
+    'png': _insert_png,
+    'webp': _insert_webp,
+    'heif': _insert_heif,
+}
+
+
+def insert_exif(src_path: str, dst_path: str, exif_bytes: bytes) -> None:
+    """
+    在容器层面把 EXIF 写入图片，像素数据逐字节复制，不经过解码与重新编码。
+
+    参数:
+        src_path: 原始图片路径
+        dst_path: 输出图片路径（可与 src_path 相同）
+        exif_bytes: piexif.dump 生成的 EXIF 数据
+
+    异常:
+        UnsupportedImageFormatError: 容器格式无法识别或结构异常
+    """
+    with open(src_path, 'rb') as src:
+        image_format = detect_format(src.read(16))
+        if image_format is None:
+            raise UnsupportedImageFormatError("不支持的图片容器格式")
+        src.seek(0)
+
+        same_file = os.path.exists(dst_path) and os.path.samefile(src_path, dst_path)
+        target = dst_path + '.tmp' if same_file else dst_path
+        try:
+            with open(target, 'wb') as dst:
+                _WRITERS[image_format](src, dst, exif_bytes)
+        except Exception:
+            if os.path.exists(target):
+                os.remove(target)
+            raise
+    if same_file:
+        os.replace(target, dst_path)
@@ -0,0 +1,255 @@
+import struct
+from typing import Optional
+import requests
+from .exif_container import (EXIF_HEADER, UnsupportedImageFormatError, detect_format,
+                             _iter_boxes, _parse_iinf, _parse_iloc)
+
+# 远程图片每次范围请求读取的字节数；EXIF 通常位于文件头部的前几 KB
+PROBE_BLOCK_SIZE = 16 * 1024
+
+# EXIF 标签
+EXIF_IFD_POINTER = 0x8769
+USER_COMMENT = 0x9286
+
+_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+
+class _FileSource:
+    """按偏移读取本地文件。"""
+
+    def __init__(self, path: str):
+        self.f = open(path, 'rb')
+
+    def read(self, offset: int, length: int) -> bytes:
+        self.f.seek(offset)
+        return self.f.read(length)
+
+    def close(self) -> None:
+        self.f.close()
+
+
+class _HttpSource:
+    """
+    按偏移读取远程文件，使用 HTTP Range 请求只获取需要的字节；
+    服务器不支持 Range 时退化为流式读取，读到所需位置即停止。
+    """
+
+    def __init__(self, url: str, timeout: float = 10, block_size: int = PROBE_BLOCK_SIZE):
+        self.url = url
+        self.timeout = timeout
+        self.block_size = block_size
+        self.session = requests.Session()
+        self.segments = []
+        self.stream = None
+        self.response = None
+        self.stream_data = bytearray()
+        self.requests = 0
+
+    def read(self, offset: int, length: int) -> bytes:
+        for start, data in self.segments:
+            if start <= offset and offset + length <= start + len(data):
+                return data[offset - start:offset - start + length]
+        if self.stream is not None:
+            return self._read_stream(offset, length)
+
+        end = offset + max(length, self.block_size) - 1
+        try:
+            response = self.session.get(self.url, headers={'Range': f'bytes={offset}-{end}'},
+                                        stream=True, timeout=self.timeout)
+            if response.status_code == 416:
+                # 请求范围超出文件末尾
+                response.close()
+                return b''
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise IOError(f"下载图片失败: {e}")
+        self.requests += 1
+        if response.status_code == 206:
+            data = response.content
+            response.close()
+            self.segments.append((offset, data))
+            return data[:length]
+        # 服务器忽略了 Range，从头流式读取
+        self.stream = response.iter_content(chunk_size=self.block_size)
+        self.response = response
+        return self._read_stream(offset, length)
+
+    def _read_stream(self, offset: int, length: int) -> bytes:
+        while len(self.stream_data) < offset + length:
+            chunk = next(self.stream, None)
+            if chunk is None:
+                break
+            self.stream_data += chunk
+        return bytes(self.stream_data[offset:offset + length])
+
+    def close(self) -> None:
+        if self.response is not None:
+            self.response.close()
+        self.session.close()
+
+
+# --- 定位 EXIF 块 ---
+
+def _find_jpeg_exif(source) -> Optional[bytes]:
+    offset = 2
+    while True:
+        header = source.read(offset, 4)
+        if len(header) < 4 or header[0] != 0xFF:
+            return None
+        marker, length = header[1], struct.unpack('>H', header[2:4])[0]
+        # 进入熵编码数据或遇到非 APPn 段后不会再有 EXIF
+        if marker == 0xDA or marker == 0xD9:
+            return None
+        if marker == 0xE1:
+            body = source.read(offset + 4, length - 2)
+            if body.startswith(EXIF_HEADER):
+                return body[len(EXIF_HEADER):]
+        offset += 2 + length
+
+
+def _find_png_exif(source) -> Optional[bytes]:
+    offset = 8
+    while True:
+        header = source.read(offset, 8)
+        if len(header) < 8:
+            return None
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type == b'eXIf':
+            return source.read(offset + 8, length)
+        # eXIf 块写在 IDAT 之前，读到图像数据即停止
+        if chunk_type in (b'IDAT', b'IEND'):
+            return None
+        offset += length + 12
+
+
+def _find_webp_exif(source) -> Optional[bytes]:
+    offset = 12
+    header = source.read(offset, 18)
+    # 简单格式或 VP8X 未置位 EXIF 标志时没有 EXIF
+    if header[:4] != b'VP8X' or not header[8] & 0x08:
+        return None
+    while True:
+        header = source.read(offset, 8)
+        if len(header) < 8:
+            return None
+        chunk_type, size = struct.unpack('<4sI', header)
+        if chunk_type == b'EXIF':
+            data = source.read(offset + 8, size)
+            return data[len(EXIF_HEADER):] if data.startswith(EXIF_HEADER) else data
+        offset += 8 + size + (size & 1)
+
+
+def _find_heif_exif(source) -> Optional[bytes]:
+    offset = 0
+    while True:
+        header = source.read(offset, 16)
+        if len(header) < 8:
+            return None
+        size, box_type = struct.unpack('>I4s', header[:8])
+        if size == 1:
+            size = struct.unpack('>Q', header[8:16])[0]
+        if size < 8:
+            return None
+        if box_type == b'meta':
+            break
+        offset += size
+    meta = source.read(offset, size)
+
+    children = {}
+    _, _, _, header_size = next(_iter_boxes(meta))
+    for box_type, child_offset, child_size, child_header in _iter_boxes(meta, header_size + 4):
+        children[box_type] = (child_offset + child_header, meta[child_offset + child_header:child_offset + child_size])
+    if b'iinf' not in children or b'iloc' not in children:
+        return None
+    _, entries = _parse_iinf(children[b'iinf'][1])
+    exif_id = next((item_id for item_id, item_type, _ in entries if item_type == b'Exif'), None)
+    _, _, items = _parse_iloc(children[b'iloc'][1])
+    item = next((item for item in items if item['id'] == exif_id), None)
+    if item is None or item['dref'] != 0 or item['method'] not in (0, 1):
+        return None
+
+    data = b''
+    for _, extent_offset, extent_length in item['extents']:
+        if item['method'] == 0:
+            data += source.read(item['base'] + extent_offset, extent_length)
+        elif b'idat' in children:
+            start = children[b'idat'][0] - offset + item['base'] + extent_offset
+            data += meta[start:start + extent_length]
+    if len(data) < 4:
+        return None
+    skip = struct.unpack('>I', data[:4])[0]
+    return data[4 + skip:]
+
+
+_FINDERS = {
+    'jpeg': _find_jpeg_exif,
+    'png': _find_png_exif,
+    'webp': _find_webp_exif,
+    'heif': _find_heif_exif,
+}
+
+
+# --- 解析 UserComment ---
+
+def _read_user_comment_tag(tiff: bytes) -> Optional[bytes]:
+    """
+    只沿 IFD0 -> Exif IFD 查找 UserComment 标签，返回其原始字节（含 8 字节编码前缀）。
+    """
+    if len(tiff) < 8 or tiff[:2] not in (b'II', b'MM'):
+        return None
+    order = '<' if tiff[:2] == b'II' else '>'
+
+    def find_tag(ifd_offset: int, tag: int):
+        if ifd_offset + 2 > len(tiff):
+            return None
+        count = struct.unpack(order + 'H', tiff[ifd_offset:ifd_offset + 2])[0]
+        for i in range(count):
+            entry = ifd_offset + 2 + i * 12
+            if entry + 12 > len(tiff):
+                return None
+            entry_tag, entry_type, entry_count = struct.unpack(order + 'HHI', tiff[entry:entry + 8])
+            if entry_tag == tag:
+                return entry_type, entry_count, entry + 8
+        return None
+
+    ifd0 = struct.unpack(order + 'I', tiff[4:8])[0]
+    pointer = find_tag(ifd0, EXIF_IFD_POINTER)
+    if pointer is None:
+        return None
+    exif_ifd = struct.unpack(order + 'I', tiff[pointer[2]:pointer[2] + 4])[0]
+    comment = find_tag(exif_ifd, USER_COMMENT)
+    if comment is None:
+        return None
+    entry_type, entry_count, value_pos = comment
+    size = _TYPE_SIZES.get(entry_type, 1) * entry_count
+    if size > 4:
+        value_pos = struct.unpack(order + 'I', tiff[value_pos:value_pos + 4])[0]
+    return tiff[value_pos:value_pos + size]
+
+
+def probe_user_comment(image_path: str) -> Optional[bytes]:
+    """
+    只读取图片头部直到第一个 EXIF 块，返回 UserComment 原始字节，不解码图像。
+    image_path 为 http(s) URL 时使用范围请求，只下载所需的字节。
+
+    返回:
+        UserComment 原始字节；没有 EXIF 或没有 UserComment 时返回 None
+
+    异常:
+        UnsupportedImageFormatError: 容器格式无法识别
+        IOError: 文件无法读取或下载失败
+    """
+    if image_path.startswith(('http://', 'https://')):
+        source = _HttpSource(image_path)
+    else:
+        source = _FileSource(image_path)
+    try:
+        image_format = detect_format(source.read(0, 16))
+        if image_format is None:
+            raise UnsupportedImageFormatError("不支持的图片容器格式")
+        tiff = _FINDERS[image_format](source)
+        return _read_user_comment_tag(tiff) if tiff else None
+    except (struct.error, IndexError, StopIteration):
+        raise UnsupportedImageFormatError("图片容器结构异常")
+    finally:
+        source.close()
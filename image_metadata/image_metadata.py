@@ -1,16 +1,25 @@
 import json
 import piexif
-import pillow_heif
 import requests
 import tempfile
 import os
 from PIL import Image
+from .exif_container import insert_exif, UnsupportedImageFormatError
+from .exif_probe import probe_user_comment
+from tracing import span
 
-# 确保 HEIF/HEIC 格式被支持
-pillow_heif.register_heif_opener()
+_heif_registered = False
 
 # --- 辅助函数 ---
 
+def _ensure_heif_opener():
+    """只在需要 Pillow 打开图片时才注册 HEIF/HEIC 支持，JPEG 等常见格式不加载 pillow_heif"""
+    global _heif_registered
+    if not _heif_registered:
+        import pillow_heif
+        pillow_heif.register_heif_opener()
+        _heif_registered = True
+
 def _download_image(url):
     """从URL下载图片到临时文件，并返回文件路径"""
     try:
@@ -38,16 +47,20 @@ def _make_user_comment_bytes(comment, encoding="ascii"):
 
 def _read_user_comment(image_path):
     """使用 piexif 读取并解析 UserComment 字段"""
+    _ensure_heif_opener()
     img = Image.open(image_path)
     exif_data = img.info.get('exif')
     if not exif_data:
         return None
     
     exif_dict = piexif.load(exif_data)
-    user_comment_bytes = exif_dict.get("Exif", {}).get(piexif.ExifIFD.UserComment)
+    return _decode_user_comment(exif_dict.get("Exif", {}).get(piexif.ExifIFD.UserComment))
+
+def _decode_user_comment(user_comment_bytes):
+    """按 8 字节编码前缀解码 UserComment"""
     if not user_comment_bytes:
         return None
-        
+
     try:
         encoding = user_comment_bytes[:8].decode('ascii').rstrip('\0')
         if encoding == 'ASCII':
@@ -83,15 +96,26 @@ def EmbedImageImplicitLabel(OriginalImagePath: str, ImplicitLabel: str, ResultFi
         aigc_data_to_write = json.dumps({'AIGC': parsed_label})
 
         # 3. 写入 EXIF
-        img = Image.open(input_path)
         comment_bytes = _make_user_comment_bytes(aigc_data_to_write)
         exif_dict = {"Exif": {piexif.ExifIFD.UserComment: comment_bytes}}
         exif_bytes = piexif.dump(exif_dict)
-        
+
+        # JPEG/PNG/WebP/HEIF 直接在容器层面写入 EXIF，像素数据原样复制；
+        # 其他格式回退到 Pillow 重新编码保存
+        try:
+            with span("exif.write"):
+                insert_exif(input_path, ResultFilePath, exif_bytes)
+            return json.dumps({"status": 1, "result": "嵌入成功"})
+        except UnsupportedImageFormatError:
+            pass
+
+        _ensure_heif_opener()
+        img = Image.open(input_path)
         params = {"quality": -1}
         if img.format:
              params['format'] = img.format
-        img.save(ResultFilePath, exif=exif_bytes, **params)
+        with span("encode.image"):
+            img.save(ResultFilePath, exif=exif_bytes, **params)
         
         return json.dumps({"status": 1, "result": "嵌入成功"})
 
@@ -113,14 +137,19 @@ def DetectImageImplicitLabel(OriginalImagePath: str) -> str:
     """
     temp_path_for_input = None
     try:
-        # 1. 处理输入路径 (URL 或本地)
-        if OriginalImagePath.startswith(('http://', 'https://')):
-            input_path = temp_path_for_input = _download_image(OriginalImagePath)
-        else:
-            input_path = OriginalImagePath
-
-        # 2. 读取 UserComment
-        user_comment = _read_user_comment(input_path)
+        # 1. 只读取文件头部的 EXIF 块获取 UserComment（URL 使用范围请求）；
+        #    容器格式无法识别时回退为下载整个文件并用 Pillow 打开
+        try:
+            with span("exif.probe"):
+                user_comment = _decode_user_comment(probe_user_comment(OriginalImagePath))
+        except UnsupportedImageFormatError:
+            # 2. 处理输入路径 (URL 或本地)
+            if OriginalImagePath.startswith(('http://', 'https://')):
+                input_path = temp_path_for_input = _download_image(OriginalImagePath)
+            else:
+                input_path = OriginalImagePath
+            with span("decode.image"):
+                user_comment = _read_user_comment(input_path)
         if not user_comment:
             return json.dumps({"status": -1, "result": "未检测到隐式标识"})
 
@@ -0,0 +1,281 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterable, List, Optional
+
+# 重任务（显式标识嵌入/检测，涉及 OCR、Whisper、视频重编码）进程数。
+# 每个工作进程各自加载一份 Whisper/EasyOCR 模型，不受 Flask 进程的模型池与执行槽限制，
+# 内存占用约为（进程数 + 1）份模型，默认只用一个进程
+JOB_WORKERS = int(os.getenv("SEAL_JOB_WORKERS", "1"))
+# 轻任务（元数据读写）进程数；与重任务分开，短请求不会排在长视频任务之后
+JOB_LIGHT_WORKERS = int(os.getenv("SEAL_JOB_LIGHT_WORKERS", "2"))
+# 任务结束后结果与输出文件的保留时间（秒）
+JOB_RESULT_TTL = float(os.getenv("SEAL_JOB_RESULT_TTL", "3600"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# 执行中任务的估算进度上限：执行时间超过平均值时停在该值，直到任务真正结束
+RUNNING_PROGRESS_CAP = 0.95
+
+
+class Job:
+    """
+    一个异步任务。输入文件在任务结束后删除，输出文件保留到结果过期。
+    """
+
+    def __init__(self, method: str, input_path: str, output_path: Optional[str], params: dict, ext: str,
+                 cache_key: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.input_path = input_path
+        self.output_path = output_path
+        self.params = params
+        self.ext = ext
+        self.cache_key = cache_key
+        self.state = QUEUED
+        self.result: Optional[str] = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def progress(self, expected_run: Optional[float] = None, now: Optional[float] = None) -> Optional[float]:
+        """
+        任务进度（0~1）。排队中为 0，结束后为 1；执行中按同方法已完成任务的平均执行时间 expected_run 估算，
+        最多到 RUNNING_PROGRESS_CAP，没有历史数据时为 None。
+        """
+        if self.state == QUEUED:
+            return 0.0
+        if self.state in (DONE, FAILED):
+            return 1.0
+        if not expected_run:
+            return None
+        elapsed = (now or time.time()) - self.started_at
+        return round(min(RUNNING_PROGRESS_CAP, elapsed / expected_run), 3)
+
+    def to_dict(self, queue_position: Optional[int] = None, expected_run: Optional[float] = None) -> dict:
+        now = time.time()
+        info = {
+            "id": self.id,
+            "method": self.method,
+            "state": self.state,
+            "progress": self.progress(expected_run, now),
+            "submitted_at": self.submitted_at,
+            "wait_time": round((self.started_at or now) - self.submitted_at, 3),
+        }
+        if queue_position is not None:
+            info["queue_position"] = queue_position
+        if self.started_at is not None:
+            info["run_time"] = round((self.finished_at or now) - self.started_at, 3)
+        if self.error is not None:
+            info["error"] = self.error
+        return info
+
+
+class _Lane:
+    """
+    一组方法共享的进程池。每个方法有自己的等待队列，空出进程时按方法轮流取任务，
+    同一通道内某个方法积压大量任务也不会饿死其他方法。
+    """
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.running = 0
+        self.methods: List[str] = []
+        self.next_index = 0
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        # 使用 spawn 启动工作进程：Flask 进程中已有线程和已加载的模型，fork 不安全
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return self.pool
+
+
+class JobManager:
+    """
+    异步任务调度：任务提交后立即返回 id，在后台进程池中执行。
+
+    参数:
+        runner: 在工作进程中执行的函数 runner(method, input_path, output_path, params) -> 结果 JSON 字符串，
+                必须是可以被 pickle 的模块级函数
+        light_methods: 放入轻任务通道的方法名
+        on_complete: 任务成功结束后在调度进程中调用 on_complete(job)，如写入结果缓存
+    """
+
+    def __init__(self, runner: Callable, light_methods: Iterable[str],
+                 workers: int = JOB_WORKERS, light_workers: int = JOB_LIGHT_WORKERS,
+                 result_ttl: float = JOB_RESULT_TTL, on_complete: Optional[Callable[[Job], None]] = None):
+        self.runner = runner
+        self.on_complete = on_complete
+        self.light_methods = set(light_methods)
+        self.result_ttl = result_ttl
+        self._lock = threading.RLock()
+        self._jobs: Dict[str, Job] = {}
+        self._queues: Dict[str, deque] = {}
+        self._lanes = {
+            "light": _Lane("light", light_workers),
+            "heavy": _Lane("heavy", workers),
+        }
+        self._method_stats: Dict[str, dict] = {}
+
+    def _lane_for(self, method: str) -> _Lane:
+        return self._lanes["light" if method in self.light_methods else "heavy"]
+
+    def submit(self, method: str, input_path: str, output_path: Optional[str], params: dict, ext: str,
+               cache_key: Optional[str] = None) -> Job:
+        job = Job(method, input_path, output_path, params, ext, cache_key)
+        with self._lock:
+            self._purge_expired()
+            self._jobs[job.id] = job
+            lane = self._lane_for(method)
+            if method not in self._queues:
+                self._queues[method] = deque()
+                lane.methods.append(method)
+            self._queues[method].append(job)
+            self._dispatch(lane)
+        return job
+
+    def complete(self, method: str, input_path: str, output_path: Optional[str], ext: str, result: str) -> Job:
+        """
+        登记一个无需执行、已有结果的任务（如命中检测结果缓存）。
+        """
+        job = Job(method, input_path, output_path, {}, ext)
+        job.started_at = job.finished_at = job.submitted_at
+        job.state = DONE
+        job.result = result
+        with self._lock:
+            self._purge_expired()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def describe(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            position = None
+            if job.state == QUEUED:
+                position = list(self._queues[job.method]).index(job)
+            stats = self._method_stats.get(job.method, {})
+            finished = stats.get("completed", 0) + stats.get("failed", 0)
+            expected_run = stats["total_run"] / finished if finished else None
+            return job.to_dict(position, expected_run)
+
+    def _dispatch(self, lane: _Lane) -> None:
+        # 调用方持有 self._lock
+        while lane.running < lane.workers:
+            job = None
+            for _ in range(len(lane.methods)):
+                method = lane.methods[lane.next_index % len(lane.methods)]
+                lane.next_index += 1
+                if self._queues[method]:
+                    job = self._queues[method].popleft()
+                    break
+            if job is None:
+                return
+
+            job.state = RUNNING
+            job.started_at = time.time()
+            lane.running += 1
+            try:
+                future = lane.get_pool().submit(self.runner, job.method, job.input_path, job.output_path, job.params)
+            except BrokenProcessPool as e:
+                lane.pool = None
+                lane.running -= 1
+                self._finish(job, None, f"工作进程异常: {e}")
+                continue
+            future.add_done_callback(lambda f, job=job, lane=lane: self._on_done(job, lane, f))
+
+    def _on_done(self, job: Job, lane: _Lane, future) -> None:
+        result, error, broken = None, None, False
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            error = f"工作进程异常退出: {e}"
+            broken = True
+        except Exception as e:
+            error = str(e)
+        with self._lock:
+            lane.running -= 1
+            if broken:
+                # 工作进程被杀死（如内存不足）后进程池不可再用，下次提交时重建
+                lane.pool = None
+            self._finish(job, result, error)
+            self._dispatch(lane)
+        if error is None and self.on_complete is not None:
+            self.on_complete(job)
+
+    def _finish(self, job: Job, result: Optional[str], error: Optional[str]) -> None:
+        job.finished_at = time.time()
+        job.result = result
+        job.error = error
+        job.state = DONE if error is None else FAILED
+        _remove_quietly(job.input_path)
+
+        stats = self._method_stats.setdefault(job.method, {
+            "completed": 0, "failed": 0, "total_wait": 0.0, "max_wait": 0.0, "total_run": 0.0, "max_run": 0.0,
+        })
+        wait = job.started_at - job.submitted_at
+        run = job.finished_at - job.started_at
+        stats["completed" if error is None else "failed"] += 1
+        stats["total_wait"] += wait
+        stats["max_wait"] = max(stats["max_wait"], wait)
+        stats["total_run"] += run
+        stats["max_run"] = max(stats["max_run"], run)
+
+    def _purge_expired(self) -> None:
+        # 调用方持有 self._lock
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl:
+                _remove_quietly(job.output_path)
+                del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            methods = {}
+            for method in set(self._queues) | set(self._method_stats):
+                stats = self._method_stats.get(method, {})
+                finished = stats.get("completed", 0) + stats.get("failed", 0)
+                queue = self._queues.get(method, ())
+                methods[method] = {
+                    "lane": self._lane_for(method).name,
+                    "queued": len(queue),
+                    "running": sum(1 for job in self._jobs.values()
+                                   if job.method == method and job.state == RUNNING),
+                    "completed": stats.get("completed", 0),
+                    "failed": stats.get("failed", 0),
+                    "oldest_wait": round(time.time() - queue[0].submitted_at, 3) if queue else 0.0,
+                    "avg_wait": round(stats["total_wait"] / finished, 3) if finished else 0.0,
+                    "max_wait": round(stats.get("max_wait", 0.0), 3),
+                    "avg_run": round(stats["total_run"] / finished, 3) if finished else 0.0,
+                    "max_run": round(stats.get("max_run", 0.0), 3),
+                }
+            lanes = {
+                name: {"workers": lane.workers, "running": lane.running}
+                for name, lane in self._lanes.items()
+            }
+            return {"lanes": lanes, "methods": methods}
+
+
+def _remove_quietly(path: Optional[str]) -> None:
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# 内存缓存占用上限（按结果字符串的 UTF-8 字节数计算）
+CACHE_MAX_BYTES = int(os.getenv("SEAL_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# 磁盘缓存 SQLite 文件路径，为空时只使用内存缓存
+CACHE_DB_PATH = os.getenv("SEAL_CACHE_DB", "")
+# 磁盘缓存有效期（秒）
+CACHE_TTL = float(os.getenv("SEAL_CACHE_TTL", str(7 * 24 * 3600)))
+
+# 计算文件摘要时每次读取的块大小
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def new_hasher():
+    """
+    返回用于内容寻址的摘要对象（BLAKE2b，160 位）。
+    """
+    return hashlib.blake2b(digest_size=20)
+
+
+def hash_file(path: str) -> str:
+    """
+    分块读取文件计算内容摘要，不把整个文件读入内存。
+    """
+    hasher = new_hasher()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def make_key(method: str, version: str, digest: str) -> str:
+    """
+    缓存键由方法名、算法版本和文件内容摘要组成；算法升级时修改版本号即可使旧结果失效。
+    """
+    return f"{method}:{version}:{digest}"
+
+
+class ResultCache:
+    """
+    检测结果缓存。
+
+    两级结构：
+        - 内存 LRU，按结果大小淘汰，总占用不超过 max_bytes；
+        - 可选的 SQLite 磁盘缓存，按 ttl 过期，进程重启后仍然有效。
+    内存未命中时查询磁盘，命中后提升到内存。
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, db_path: str = CACHE_DB_PATH, ttl: float = CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._size = 0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return value
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and time.time() - row[1] <= self.ttl:
+                    self.disk_hits += 1
+                    self._store(key, row[0])
+                    return row[0]
+                if row is not None:
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock:
+            self._store(key, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+                    (key, value, time.time()),
+                )
+                self._db.commit()
+
+    def _store(self, key: str, value: str) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old.encode("utf-8"))
+        self._entries[key] = value
+        self._size += size
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted.encode("utf-8"))
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "disk_enabled": self._db is not None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
@@ -2,9 +2,78 @@ import os
 import tempfile
 import json
 import importlib
-from flask import Flask, request, Response, jsonify
+import shutil
+import base64
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from flask import Flask, Request, request, Response, jsonify, stream_with_context
+from result_cache import ResultCache, hash_file, make_key
+from job_queue import JobManager, DONE, FAILED
+from admission import AdmissionController, AdmissionRejected, DEFAULT_CONCURRENCY
+from warmup import WarmupState, selected_methods
+from batch_inputs import BATCH_MAX_ITEMS, ArchiveTooLarge, is_archive, iter_archive
+from tracing import StageHistograms, span, trace
+
+# 上传文件不超过该大小时放在内存文件系统（/dev/shm）中，更大的文件写入磁盘临时目录
+SMALL_UPLOAD_BYTES = int(os.getenv("SEAL_SMALL_UPLOAD_BYTES", str(32 * 1024 * 1024)))
+SHM_DIR = "/dev/shm"
+# 返回嵌入结果时每次读取发送的块大小
+STREAM_CHUNK_SIZE = 1 << 20
+# 批量接口中不超过该大小的嵌入结果以 Base64 内联返回，更大的登记为已完成任务，通过 result_url 下载
+BATCH_INLINE_BYTES = int(os.getenv("SEAL_BATCH_INLINE_BYTES", str(1 << 20)))
+
+
+class SpoolingRequest(Request):
+    """
+    werkzeug 解析 multipart 时把上传文件分块写入 _get_file_stream 返回的文件对象。
+    这里直接返回一个带扩展名的命名临时文件，接口函数可以使用其路径，不需要再读入内存复制一遍。
+    写入的临时文件路径记录在 spooled_paths 中，请求结束时统一删除（见 _remove_spooled_uploads），
+    请求体解析失败、接口提前返回或抛出异常时同样不会残留。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.spooled_paths = []
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        directory = None
+        if total_content_length is not None and total_content_length <= SMALL_UPLOAD_BYTES and os.path.isdir(SHM_DIR):
+            directory = SHM_DIR
+        suffix = os.path.splitext(filename or "")[-1]
+        stream = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=directory)
+        self.spooled_paths.append(stream.name)
+        return stream
+
+
+def _spooled_path(file, ext):
+    """
+    返回上传文件在磁盘上的路径。由 SpoolingRequest 写入的文件直接使用；
+    其他情况（如测试客户端传入的内存流）分块复制到临时文件。
+    """
+    stream = file.stream
+    name = getattr(stream, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        stream.flush()
+        return name
+    if stream.seekable():
+        stream.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp_in:
+        shutil.copyfileobj(stream, tmp_in, STREAM_CHUNK_SIZE)
+        return tmp_in.name
+
 
 app = Flask(__name__)
+app.request_class = SpoolingRequest
+
+
+@app.teardown_request
+def _remove_spooled_uploads(exc):
+    """
+    删除 SpoolingRequest 为本次请求写入的所有上传临时文件。
+    移交给异步任务的文件已移走；流式响应使用的文件通过 _take_uploads 移出清理列表，由响应关闭时删除。
+    """
+    for path in request.spooled_paths:
+        _remove_quietly(path)
 
 # 映射前端method到实际函数和模块
 METHOD_MAP = {
@@ -25,6 +94,66 @@ METHOD_MAP = {
     "DetectAudioExplicitLabel": ("audio_detection.audio_explicit_detector", "DetectAudioExplicitLabel", "audio"),
 }
 
+def _versioned(version, **settings):
+    """
+    算法版本加上会改变检测结果的配置项（环境变量，未设置时为对应模块中的默认值），
+    修改这些配置后不会命中按旧配置计算的缓存结果。
+    """
+    return ";".join([version] + [f"{name}={os.getenv(name, default)}" for name, default in settings.items()])
+
+# 检测类接口的算法版本，作为结果缓存键的一部分；算法或模型更新后修改对应版本号即可使旧缓存失效
+ALGORITHM_VERSIONS = {
+    "DetectImageImplicitLabel": "1",
+    "DetectImageExplicitLabel": _versioned("2", IMAGE_OCR_MODE="edge", IMAGE_EDGE_TEXT_SCALE="0.08"),
+    "DetectVideoImplicitLabel": "1",
+    "DetectVideoExplicitLabel": _versioned("2", VIDEO_SAMPLE_MODE="adaptive", VIDEO_COARSE_STRIDE="0.5"),
+    "DetectAudioImplicitLabel": "1",
+    # 语音识别使用 int8 量化模型时结果可能与 float32 不同，精度同样作为版本的一部分
+    "DetectAudioExplicitLabel": _versioned(
+        "8",
+        WHISPER_DTYPE="float32",
+        WHISPER_GATE="1",
+        WHISPER_GATE_MODEL="base",
+        WHISPER_GATE_MARGIN="1.0",
+        WHISPER_VAD_THRESHOLD_DB="6",
+        WHISPER_WINDOW_MODE="edge",
+        WHISPER_EDGE_HEAD="30",
+        WHISPER_EDGE_TAIL="30",
+        WHISPER_EDGE_HINT_RADIUS="10",
+        WHISPER_EDGE_ESCALATE="unhinted",
+        WHISPER_BATCH="1",
+        WHISPER_BATCH_OVERLAP="2",
+        MORSE_SAMPLE_RATE="0",
+    ),
+}
+
+# 检测类接口中会改变检测结果的请求参数，与算法版本一起作为缓存键的一部分
+RESULT_PARAMS = {
+    "DetectAudioExplicitLabel": ("Positions",),
+}
+
+# 检测结果缓存：同一文件重复提交时直接返回上次的结果
+RESULT_CACHE = ResultCache()
+
+# 同步接口各方法允许同时执行的请求数，可用环境变量 SEAL_CONCURRENCY_<method> 覆盖。
+# Whisper/OCR/视频重编码占用大量内存，限制较严；音频显式检测与 Whisper 模型副本数一致。
+# 批量解码不改变这一限制：每个请求仍各自持有解码后的波形与 mel，放宽后内存随并发数增长，
+# 需要让更多请求的窗口合并解码时用 SEAL_CONCURRENCY_DetectAudioExplicitLabel 显式调大
+METHOD_CONCURRENCY = {
+    "DetectAudioExplicitLabel": int(os.getenv("WHISPER_MAX_REPLICAS", "1")),
+    "EmbedVideoExplicitLabel": 1,
+    "DetectVideoExplicitLabel": 2,
+    "DetectImageExplicitLabel": 2,
+    "EmbedAudioExplicitLabel": 2,
+}
+ADMISSION = AdmissionController({
+    method: int(os.getenv(f"SEAL_CONCURRENCY_{method}", str(METHOD_CONCURRENCY.get(method, DEFAULT_CONCURRENCY))))
+    for method in METHOD_MAP
+})
+
+# 各方法各阶段的耗时直方图
+STAGE_TIMINGS = StageHistograms()
+
 # 文件类型到mimetype
 MIMETYPE_MAP = {
     "image": "image/png",
@@ -32,11 +161,151 @@ MIMETYPE_MAP = {
     "audio": "audio/wav"
 }
 
+def _is_cacheable(result_json):
+    """执行错误（status -2）的结果不缓存，下次请求重新计算"""
+    try:
+        return json.loads(result_json).get("status") != -2
+    except Exception:
+        return False
+
+def _cache_key(method, params, digest):
+    """检测结果的缓存键：方法名、算法版本、影响结果的请求参数与文件内容摘要"""
+    version = ALGORITHM_VERSIONS[method]
+    extra = {name: params[name] for name in RESULT_PARAMS.get(method, ()) if name in params}
+    if extra:
+        version += ";" + json.dumps(extra, sort_keys=True, ensure_ascii=False)
+    return make_key(method, version, digest)
+
+def _wants_timings():
+    """请求参数（查询串或表单）中 timings 为 1/true 时在结果中附带各阶段耗时"""
+    value = request.args.get('timings') or request.form.get('timings') or ""
+    return value.lower() in ("1", "true")
+
+def _with_timings(result_json, current):
+    """在结果 JSON 中加入 timings 字段；结果不是 JSON 对象时原样返回"""
+    try:
+        result = json.loads(result_json)
+    except Exception:
+        return result_json
+    if not isinstance(result, dict):
+        return result_json
+    result["timings"] = current.summary()
+    return json.dumps(result, ensure_ascii=False)
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify(RESULT_CACHE.stats())
+
+@app.route('/timing_stats', methods=['GET'])
+def timing_stats():
+    """各方法各阶段的耗时直方图（秒），total 为整个请求的处理耗时"""
+    return jsonify(STAGE_TIMINGS.snapshot())
+
+def _parse_params(form):
+    """表单中除 method 外的字段按 JSON 解析，解析失败时保留原字符串"""
+    params = {}
+    for k in form:
+        if k not in ['method', 'timings']:
+            try:
+                params[k] = json.loads(form[k])
+            except Exception:
+                params[k] = form[k]
+    if "ImplicitLabel" in params:
+        params["ImplicitLabel"] = json.dumps(params["ImplicitLabel"], ensure_ascii=False)
+    return params
+
+def _call_method(method, input_path, output_path, params):
+    """动态导入 method 对应的函数并按接口约定拼装参数调用，返回结果 JSON 字符串"""
+    module_name, func_name, _ = METHOD_MAP[method]
+    with span("module.import"):
+        module = importlib.import_module(f"{module_name}")
+    func = getattr(module, func_name)
+
+    if output_path is not None:
+        # 嵌入类接口
+        if "ImplicitLabel" in params:
+            return func(input_path, params["ImplicitLabel"], output_path)
+        if "ExplicitLabel" in params:
+            return func(input_path, output_path, params["ExplicitLabel"])
+        return func(input_path, output_path)
+    # 检测类接口；音频显式检测可以带上已知的标识位置，只转录边缘窗口时额外转录这些位置附近
+    if method == "DetectAudioExplicitLabel" and "Positions" in params:
+        return func(input_path, params["Positions"])
+    return func(input_path)
+
+def _remove_quietly(path):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _multipart_response(output_path, result_json, mimetype, ext, remove=True):
+    """
+    以 multipart 返回嵌入结果：输出文件按 STREAM_CHUNK_SIZE 分块读取发送，remove 为 True 时发送完毕后删除。
+    """
+    boundary = "SealBoundary"
+    head = (
+        f'--{boundary}\r\n'
+        f'Content-Type: {mimetype}\r\n'
+        f'Content-Disposition: form-data; name="file"; filename="result{ext}"\r\n\r\n'
+    ).encode('utf-8')
+    tail = (
+        f'\r\n--{boundary}\r\n'
+        'Content-Type: application/json; charset=utf-8\r\n'
+        'Content-Disposition: form-data; name="result"\r\n\r\n'
+        f'{result_json}'
+        f'\r\n--{boundary}--\r\n'
+    ).encode('utf-8')
+
+    def generate():
+        try:
+            yield head
+            with open(output_path, "rb") as fout:
+                for block in iter(lambda: fout.read(STREAM_CHUNK_SIZE), b""):
+                    yield block
+            yield tail
+        finally:
+            if remove:
+                _remove_quietly(output_path)
+
+    response = Response(generate(), mimetype=f'multipart/form-data; boundary={boundary}')
+    response.headers['Content-Length'] = str(len(head) + os.path.getsize(output_path) + len(tail))
+    if remove:
+        # 客户端提前断开、生成器未执行完时同样清理输出文件
+        response.call_on_close(lambda: _remove_quietly(output_path))
+    return response
+
+# 启动预热：导入所选方法的模块并加载 OCR / Whisper 模型，完成前就绪检查返回 503
+WARMUP = WarmupState()
+
+def start_warmup():
+    """在后台开始预热；使用其他 WSGI 服务器部署时在创建进程后调用"""
+    return WARMUP.start(METHOD_MAP, selected_methods(METHOD_MAP))
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """就绪检查：预热全部完成后返回 200，否则返回 503 及各步骤进度"""
+    info = WARMUP.to_dict()
+    return jsonify(info), (200 if info["ready"] else 503)
+
+@app.route('/admission_stats', methods=['GET'])
+def admission_stats():
+    """各方法的执行槽占用、排队数与拒绝次数"""
+    return jsonify(ADMISSION.stats())
+
 @app.route('/seal_process', methods=['POST'])
 def seal_process():
+    with trace() as current:
+        return _seal_process(current)
+
+def _seal_process(current):
+    input_path = None
+    output_path = None
     try:
-        # 获取文件和参数
-        file = request.files.get('file')
+        # 获取文件和参数（首次访问 request.files 时解析请求体并写入上传临时文件）
+        with span("io.upload"):
+            file = request.files.get('file')
         if not file:
             return jsonify({'error': 'No file uploaded'}), 400
 
@@ -44,103 +313,307 @@ def seal_process():
         if not method or method not in METHOD_MAP:
             return jsonify({'error': 'Invalid or missing method'}), 400
 
-        module_name, func_name, file_type = METHOD_MAP[method]
+        _, _, file_type = METHOD_MAP[method]
         mimetype = MIMETYPE_MAP.get(file_type, 'application/octet-stream')
+        ext = os.path.splitext(file.filename)[-1]
+        params = _parse_params(request.form)
+        timings = _wants_timings()
 
-        # 处理参数
-        params = {}
-        for k in request.form:
-            if k not in ['method']:
-                try:
-                    params[k] = json.loads(request.form[k])
-                except Exception:
-                    params[k] = request.form[k]
-
-        # 保存上传文件到临时文件
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[-1]) as tmp_in:
-            tmp_in.write(file.read())
-            tmp_in.flush()
-            input_path = tmp_in.name
-
-        # 需要输出文件的接口，生成输出临时文件路径
-        need_output = "Embed" in method
-        output_path = None
-        if need_output:
-            fd, output_path = tempfile.mkstemp(suffix=os.path.splitext(file.filename)[-1])
-            os.close(fd)
+        # 上传文件在解析请求时已经分块写入命名临时文件（见 SpoolingRequest），直接使用其路径
+        input_path = _spooled_path(file, ext)
 
-        # 动态导入并调用
-        module = importlib.import_module(f"{module_name}")
-        func = getattr(module, func_name)
+        # 检测类接口按文件内容查询缓存
+        cache_key = None
+        result_json = None
+        if method in ALGORITHM_VERSIONS:
+            with span("io.hash"):
+                digest = hash_file(input_path)
+            cache_key = _cache_key(method, params, digest)
+            with span("cache.lookup"):
+                result_json = RESULT_CACHE.get(cache_key)
 
-        # 参数拼装
-        if "ImplicitLabel" in params:
-            params["ImplicitLabel"] = json.dumps(params["ImplicitLabel"], ensure_ascii=False)
-        if "ExplicitLabel" in params and isinstance(params["ExplicitLabel"], dict):
-            params["ExplicitLabel"] = params["ExplicitLabel"]
-
-        # 调用
-        if need_output:
-            # 嵌入类接口
-            if "ImplicitLabel" in params:
-                result_json = func(input_path, params["ImplicitLabel"], output_path)
-            elif "ExplicitLabel" in params:
-                result_json = func(input_path, output_path, params["ExplicitLabel"])
-            else:
-                result_json = func(input_path, output_path)
-        else:
-            # 检测类接口
-            result_json = func(input_path)
+        if result_json is None:
+            # 需要输出文件的接口，生成输出临时文件路径
+            if "Embed" in method:
+                fd, output_path = tempfile.mkstemp(suffix=ext)
+                os.close(fd)
 
-        # 读取输出文件内容
-        file_bytes = None
-        if need_output and os.path.exists(output_path):
-            with open(output_path, "rb") as fout:
-                file_bytes = fout.read()
+            # 超出方法并发上限时排队，队列已满或等待超时直接拒绝
+            with ADMISSION.slot(method), span("handler"):
+                result_json = _call_method(method, input_path, output_path, params)
+            if cache_key and _is_cacheable(result_json):
+                RESULT_CACHE.put(cache_key, result_json)
 
-        # 清理临时文件
-        os.remove(input_path)
-        if output_path and os.path.exists(output_path):
-            os.remove(output_path)
+        STAGE_TIMINGS.record(method, current)
+        if timings:
+            result_json = _with_timings(result_json, current)
 
         # 返回
-        if need_output and file_bytes is not None:
-            # multipart 返回文件和json
-            boundary = "SealBoundary"
-            parts = []
-            # part 1: 文件
-            parts.append(
-                f'--{boundary}\r\n'
-                f'Content-Type: {mimetype}\r\n'
-                f'Content-Disposition: form-data; name="file"; filename="result{os.path.splitext(file.filename)[-1]}"\r\n\r\n'
-            )
-            parts.append(file_bytes)
-            # part 2: 结果json
-            parts.append(
-                f'\r\n--{boundary}\r\n'
-                'Content-Type: application/json; charset=utf-8\r\n'
-                'Content-Disposition: form-data; name="result"\r\n\r\n'
-            )
-            parts.append(result_json)
-            parts.append(f'\r\n--{boundary}--\r\n')
-
-            def generate():
-                for part in parts:
-                    if isinstance(part, bytes):
-                        yield part
-                    else:
-                        yield part.encode('utf-8')
-            return Response(
-                generate(),
-                mimetype=f'multipart/form-data; boundary={boundary}'
-            )
+        if output_path and os.path.exists(output_path):
+            # multipart 返回文件和json，输出文件在发送完毕后删除
+            response = _multipart_response(output_path, result_json, mimetype, ext)
+            output_path = None
+            return response
+        # 检测类接口直接返回json
+        return Response(result_json, mimetype="application/json")
+
+    except AdmissionRejected as e:
+        response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+        response.status_code = e.status
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    except Exception as e:
+        import traceback
+        return jsonify({'error': str(e), 'trace': traceback.format_exc()}), 500
+    finally:
+        # 清理临时文件（上传临时文件在请求结束时删除）
+        _remove_quietly(input_path)
+        _remove_quietly(output_path)
+
+def _take_uploads(files):
+    """
+    返回上传文件的 [(文件名, 路径), ...]，并把这些路径移出请求结束时的清理列表，由调用方负责删除。
+    流式响应在请求上下文结束后才读取上传文件，不能依赖 _remove_spooled_uploads。
+    """
+    uploads = []
+    for file in files:
+        name = file.filename or ""
+        path = _spooled_path(file, os.path.splitext(name)[-1])
+        if path in request.spooled_paths:
+            request.spooled_paths.remove(path)
+        uploads.append((name, path))
+    return uploads
+
+def _iter_batch_inputs(uploads):
+    """
+    展开批量请求中的文件，产出 (文件名, 路径, 是否需要处理后删除)。
+    压缩包（zip/tar）逐个成员解压，普通文件直接使用上传时写入的临时文件。
+    """
+    for name, path in uploads:
+        if is_archive(name):
+            for member_name, member_path in iter_archive(path, name):
+                yield member_name, member_path, True
         else:
-            # 检测类接口直接返回json
-            return Response(result_json, mimetype="application/json")
+            yield name, path, False
+
+def _process_batch_item(method, name, path, params, timings=False):
+    """处理批量请求中的一个文件，返回该文件的结果记录"""
+    with trace() as current:
+        record = _run_batch_item(method, name, path, params)
+    if "error" not in record:
+        STAGE_TIMINGS.record(method, current)
+    if timings:
+        record["timings"] = current.summary()
+    return record
+
+def _run_batch_item(method, name, path, params):
+    ext = os.path.splitext(name)[-1]
+    record = {"filename": name}
+    output_path = None
+    try:
+        cache_key = None
+        if method in ALGORITHM_VERSIONS:
+            with span("io.hash"):
+                digest = hash_file(path)
+            cache_key = _cache_key(method, params, digest)
+            with span("cache.lookup"):
+                cached = RESULT_CACHE.get(cache_key)
+            if cached is not None:
+                record["cached"] = True
+                record["result"] = json.loads(cached)
+                return record
+
+        if "Embed" in method:
+            fd, output_path = tempfile.mkstemp(suffix=ext)
+            os.close(fd)
+
+        # 批量任务自身的并发已按执行槽数限制，这里排队等待而不是拒绝
+        with ADMISSION.slot(method, block=True), span("handler"):
+            result_json = _call_method(method, path, output_path, params)
+        if cache_key and _is_cacheable(result_json):
+            RESULT_CACHE.put(cache_key, result_json)
+        record["result"] = json.loads(result_json)
+
+        output_size = os.path.getsize(output_path) if output_path else 0
+        if 0 < output_size <= BATCH_INLINE_BYTES:
+            with span("encode.base64"), open(output_path, "rb") as fout:
+                record["file_base64"] = base64.b64encode(fout.read()).decode("ascii")
+        elif output_size > 0:
+            # 输出文件移交给任务，保留到任务过期
+            job = JOB_MANAGER.complete(method, None, output_path, ext, result_json)
+            output_path = None
+            record["result_url"] = f"/jobs/{job.id}/result"
+        return record
+    except Exception as e:
+        record["error"] = str(e)
+        return record
+    finally:
+        _remove_quietly(output_path)
+
+@app.route('/batch_process', methods=['POST'])
+def batch_process():
+    """
+    批量处理：同一 method 和参数作用于多个文件（多个 file 字段，或 zip/tar 压缩包），
+    按方法执行槽数并发处理，每完成一个文件输出一行 JSON（NDJSON），最后一行为汇总。
+    """
+    files = request.files.getlist('file')
+    if not files:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    method = request.form.get('method')
+    if not method or method not in METHOD_MAP:
+        return jsonify({'error': 'Invalid or missing method'}), 400
+
+    params = _parse_params(request.form)
+    timings = _wants_timings()
+    workers = ADMISSION.slots(method)
+    uploads = _take_uploads(files)
+
+    def generate():
+        started = time.time()
+        counts = {"total": 0, "succeeded": 0, "failed": 0, "cached": 0}
+        executor = ThreadPoolExecutor(max_workers=workers)
+        pending = {}
+
+        def finished(futures):
+            for future in futures:
+                index, owned_path = pending.pop(future)
+                _remove_quietly(owned_path)
+                record = future.result()
+                record["index"] = index
+                counts["failed" if "error" in record else "succeeded"] += 1
+                counts["cached"] += 1 if record.get("cached") else 0
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+
+        try:
+            try:
+                for index, (name, path, owned) in enumerate(_iter_batch_inputs(uploads)):
+                    if index >= BATCH_MAX_ITEMS:
+                        _remove_quietly(path if owned else None)
+                        yield json.dumps({"error": f"超过单次批量上限 {BATCH_MAX_ITEMS} 个文件，其余文件未处理"},
+                                         ensure_ascii=False) + "\n"
+                        break
+                    counts["total"] += 1
+                    future = executor.submit(_process_batch_item, method, name, path, params, timings)
+                    pending[future] = (index, path if owned else None)
+                    # 在途文件数有上限，压缩包不会被一次性全部解压到磁盘
+                    if len(pending) >= workers * 2:
+                        done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                        yield from finished(done)
+            except ArchiveTooLarge as e:
+                # 已提交的文件照常输出结果
+                yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                yield from finished(done)
+        except Exception as e:
+            yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+        finally:
+            executor.shutdown(wait=True)
+            for _, owned_path in pending.values():
+                _remove_quietly(owned_path)
+
+        counts["elapsed"] = round(time.time() - started, 3)
+        yield json.dumps({"summary": counts}, ensure_ascii=False) + "\n"
+
+    response = Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+    # 上传文件在响应发送完毕（或客户端提前断开）后删除
+    response.call_on_close(lambda: [_remove_quietly(path) for _, path in uploads])
+    return response
+
+def _cache_job_result(job):
+    if job.cache_key and _is_cacheable(job.result):
+        RESULT_CACHE.put(job.cache_key, job.result)
+
+# 异步任务：元数据读写为轻任务，其余为重任务，两类任务使用各自的进程池
+JOB_MANAGER = JobManager(
+    _call_method,
+    light_methods=[m for m in METHOD_MAP if "Implicit" in m],
+    on_complete=_cache_job_result,
+)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """提交异步任务，参数与 /seal_process 相同，立即返回任务 id"""
+    input_path = None
+    try:
+        file = request.files.get('file')
+        if not file:
+            return jsonify({'error': 'No file uploaded'}), 400
+
+        method = request.form.get('method')
+        if not method or method not in METHOD_MAP:
+            return jsonify({'error': 'Invalid or missing method'}), 400
+
+        ext = os.path.splitext(file.filename)[-1]
+        params = _parse_params(request.form)
+
+        # 上传文件移交给任务，在任务结束后删除
+        fd, input_path = tempfile.mkstemp(suffix=ext)
+        os.close(fd)
+        shutil.move(_spooled_path(file, ext), input_path)
+
+        cache_key = None
+        if method in ALGORITHM_VERSIONS:
+            cache_key = _cache_key(method, params, hash_file(input_path))
+            cached = RESULT_CACHE.get(cache_key)
+            if cached is not None:
+                _remove_quietly(input_path)
+                job = JOB_MANAGER.complete(method, None, None, ext, cached)
+                input_path = None
+                return jsonify(_job_links(job.id, JOB_MANAGER.describe(job.id))), 202
+
+        output_path = None
+        if "Embed" in method:
+            fd, output_path = tempfile.mkstemp(suffix=ext)
+            os.close(fd)
+
+        job = JOB_MANAGER.submit(method, input_path, output_path, params, ext, cache_key)
+        input_path = None
+        return jsonify(_job_links(job.id, JOB_MANAGER.describe(job.id))), 202
 
     except Exception as e:
         import traceback
+        _remove_quietly(input_path)
         return jsonify({'error': str(e), 'trace': traceback.format_exc()}), 500
 
+def _job_links(job_id, info):
+    info["status_url"] = f"/jobs/{job_id}"
+    info["result_url"] = f"/jobs/{job_id}/result"
+    return info
+
+@app.route('/jobs/stats', methods=['GET'])
+def job_stats():
+    """各方法的队列长度、运行数、等待时间与执行时间"""
+    return jsonify(JOB_MANAGER.stats())
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    info = JOB_MANAGER.describe(job_id)
+    if info is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(_job_links(job_id, info))
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = JOB_MANAGER.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.state == FAILED:
+        return jsonify({'error': job.error, 'state': job.state}), 500
+    if job.state != DONE:
+        return jsonify(_job_links(job_id, JOB_MANAGER.describe(job_id))), 202
+
+    if job.output_path and os.path.exists(job.output_path):
+        _, _, file_type = METHOD_MAP[job.method]
+        mimetype = MIMETYPE_MAP.get(file_type, 'application/octet-stream')
+        # 输出文件保留到任务过期，可以重复获取
+        return _multipart_response(job.output_path, job.result, mimetype, job.ext, remove=False)
+    return Response(job.result, mimetype="application/json")
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=14000,threaded=True,debug=True)
\ No newline at end of file
+    debug = True
+    # debug 模式下 reloader 的父进程只负责监视文件，只在实际处理请求的子进程中预热
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_warmup()
+    app.run(host='0.0.0.0', port=14000,threaded=True,debug=debug)
\ No newline at end of file
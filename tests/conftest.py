@@ -0,0 +1,12 @@
+import os
+import sys
+
+# 各模块按仓库根目录下的顶层包导入（与 seal_flask.py 一致）
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# audio_detection 下的模块按顶层包导入内置的 whisper（线上通过 sys.path.append 指向部署目录）
+AUDIO_DIR = os.path.join(ROOT, "audio_detection")
+if AUDIO_DIR not in sys.path:
+    sys.path.append(AUDIO_DIR)
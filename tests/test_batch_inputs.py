@@ -0,0 +1,77 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+import batch_inputs
+from batch_inputs import ArchiveTooLarge, iter_archive
+
+
+def _zip(tmp_path, members):
+    path = str(tmp_path / "batch.zip")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return path
+
+
+def _tar(tmp_path, members):
+    path = str(tmp_path / "batch.tar.gz")
+    with tarfile.open(path, "w:gz") as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return path
+
+
+@pytest.mark.parametrize("make, filename", [(_zip, "batch.zip"), (_tar, "batch.tar.gz")])
+def test_extracts_members_within_limits(tmp_path, make, filename):
+    path = make(tmp_path, {"a.png": b"a" * 10, ".hidden": b"x", "b.png": b"b" * 20})
+    extracted = []
+    for name, member_path in iter_archive(path, filename):
+        with open(member_path, "rb") as fin:
+            extracted.append((name, len(fin.read())))
+        os.remove(member_path)
+    assert extracted == [("a.png", 10), ("b.png", 20)]
+
+
+@pytest.mark.parametrize("make, filename", [(_zip, "batch.zip"), (_tar, "batch.tar.gz")])
+def test_member_limit(tmp_path, monkeypatch, make, filename):
+    monkeypatch.setattr(batch_inputs, "BATCH_MAX_MEMBER_BYTES", 15)
+    path = make(tmp_path, {"a.png": b"a" * 10, "b.png": b"b" * 20, "c.png": b"c"})
+    members = iter_archive(path, filename)
+    name, member_path = next(members)
+    os.remove(member_path)
+    assert name == "a.png"
+    with pytest.raises(ArchiveTooLarge, match="b.png"):
+        next(members)
+
+
+@pytest.mark.parametrize("make, filename", [(_zip, "batch.zip"), (_tar, "batch.tar.gz")])
+def test_total_limit(tmp_path, monkeypatch, make, filename):
+    monkeypatch.setattr(batch_inputs, "BATCH_MAX_TOTAL_BYTES", 25)
+    path = make(tmp_path, {"a.png": b"a" * 10, "b.png": b"b" * 10, "c.png": b"c" * 10})
+    with pytest.raises(ArchiveTooLarge):
+        for _, member_path in iter_archive(path, filename):
+            os.remove(member_path)
+
+
+def test_zip_size_is_checked_while_extracting(tmp_path, monkeypatch):
+    # zip 目录中记录的大小可以伪造，解压时按实际写入量检查，超出时不残留临时文件
+    monkeypatch.setattr(batch_inputs, "BATCH_MAX_MEMBER_BYTES", 15)
+    monkeypatch.setattr(batch_inputs, "EXTRACT_CHUNK_SIZE", 4)
+    created = []
+    named_temporary_file = batch_inputs.tempfile.NamedTemporaryFile
+
+    def record(*args, **kwargs):
+        tmp = named_temporary_file(*args, **kwargs)
+        created.append(tmp.name)
+        return tmp
+
+    monkeypatch.setattr(batch_inputs.tempfile, "NamedTemporaryFile", record)
+    with pytest.raises(ArchiveTooLarge):
+        batch_inputs._ExtractBudget().extract(io.BytesIO(b"x" * 20), "a.png")
+    assert created and not os.path.exists(created[0])
@@ -0,0 +1,103 @@
+import json
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("easyocr")
+
+from image_detection.edge_bands import edge_zones
+from image_explicit.label_spec import CONTENT_OPTIONS, LABEL_MARGIN_RATIO
+
+POSITION_MODES = (1, 2, 3, 4, -1, -2, -3, -4)
+IMAGE_SIZES = ((1920, 1080), (1080, 1920), (1000, 1000), (4000, 3000), (640, 360))
+
+
+def _label_box(width, height, text_scale, content, position_mode, vertical):
+    """按 image_explicit 的排版计算标识所占区域 (x0, y0, x1, y1)"""
+    font_size = int(min(width, height) * text_scale)
+    if vertical:
+        text_width, text_height = font_size, int(len(content) * font_size * 1.2)
+    else:
+        text_width, text_height = len(content) * font_size, font_size
+    margin = int(font_size * LABEL_MARGIN_RATIO)
+    positions = {
+        1: (width - text_width - margin, height - text_height - margin),
+        2: (margin, height - text_height - margin),
+        3: (width - text_width - margin, margin),
+        4: (margin, margin),
+        -1: ((width - text_width) // 2, height - text_height - margin),
+        -2: ((width - text_width) // 2, margin),
+        -3: (margin, (height - text_height) // 2),
+        -4: (width - text_width - margin, (height - text_height) // 2),
+    }
+    x, y = positions[position_mode]
+    return x, y, x + text_width, y + text_height
+
+
+def _inside(box, zone):
+    _, x0, y0, x1, y1 = zone
+    return x0 <= box[0] and y0 <= box[1] and box[2] <= x1 and box[3] <= y1
+
+
+@pytest.mark.parametrize("width,height", IMAGE_SIZES)
+@pytest.mark.parametrize("position_mode", POSITION_MODES)
+@pytest.mark.parametrize("vertical", (False, True))
+def test_every_label_fits_in_one_zone(width, height, position_mode, vertical):
+    text_scale = 0.08
+    zones = edge_zones(width, height, text_scale)
+    for content in CONTENT_OPTIONS.values():
+        box = _label_box(width, height, text_scale, content, position_mode, vertical)
+        assert any(_inside(box, zone) for zone in zones), (content, box, zones)
+
+
+def test_mid_zones_start_at_the_image_edge():
+    zones = {zone[0]: zone[1:] for zone in edge_zones(1920, 1080, 0.08)}
+    assert zones["left_mid"][0] == 0
+    assert zones["right_mid"][2] == 1920
+    assert zones["top_mid"][1] == 0
+    assert zones["bottom_mid"][3] == 1080
+
+
+def test_zones_scale_with_text_scale():
+    small = {zone[0]: zone[1:] for zone in edge_zones(1920, 1080, 0.05)}
+    large = {zone[0]: zone[1:] for zone in edge_zones(1920, 1080, 0.1)}
+    assert large["top"][3] > small["top"][3]
+    assert large["left_mid"][2] > small["left_mid"][2]
+
+
+def test_small_image_uses_full_frame():
+    assert edge_zones(100, 100, 0.3) == [("full", 0, 0, 100, 100)]
+
+
+def test_zones_stay_inside_the_image():
+    width, height = 800, 200
+    for _, x0, y0, x1, y1 in edge_zones(width, height, 0.08):
+        assert 0 <= x0 < x1 <= width
+        assert 0 <= y0 < y1 <= height
+
+
+@pytest.mark.parametrize("position_mode", POSITION_MODES)
+def test_embed_then_detect_in_edge_mode(tmp_path, position_mode):
+    """嵌入横排标识后只做边缘识别即可找到，PositionMode 与嵌入时一致"""
+    Image = pytest.importorskip("PIL.Image")
+    from image_detection import main
+    from image_detection.edge_bands import readtext_edge_bands
+    from image_detection.judge_content import judge_content
+    from image_explicit.image_explicit import EmbedImageExplicitLabel, find_font
+
+    if not (find_font(1) or find_font(4)):
+        pytest.skip("没有可用的标识字体")
+
+    source = tmp_path / "source.png"
+    result = tmp_path / "result.png"
+    Image.new("RGB", (1280, 720), (40, 60, 90)).save(source)
+    embedded = json.loads(EmbedImageExplicitLabel(
+        str(source), str(result), {"ContentMode": 3, "PositionMode": position_mode, "TextDirection": 0}))
+    assert embedded["status"] == 1, embedded
+
+    texts = [text for _, text, _ in readtext_edge_bands(str(result))]
+    assert judge_content(texts) != "错误标识", texts
+
+    detected = json.loads(main.DetectImageExplicitLabel(str(result)))
+    assert detected["status"] == 1, detected
+    assert dict((item[0], item[1]) for item in detected["ExplicitLabel"])["PositionMode"] == position_mode
@@ -0,0 +1,311 @@
+import struct
+import zlib
+
+import pytest
+
+from image_metadata.exif_container import (
+    EXIF_HEADER,
+    UnsupportedImageFormatError,
+    _iter_boxes,
+    _parse_iinf,
+    _parse_iloc,
+    detect_format,
+    insert_exif,
+)
+
+
+def _exif(comment: bytes) -> bytes:
+    """最小的 EXIF：IFD0 只有 Exif IFD 指针，Exif IFD 只有 UserComment（与 piexif.dump 的输出格式相同）"""
+    user_comment = b"ASCII\x00\x00\x00" + comment
+    ifd0 = 8
+    exif_ifd = ifd0 + 2 + 12 + 4
+    value = exif_ifd + 2 + 12 + 4
+    tiff = b"II*\x00" + struct.pack("<I", ifd0)
+    tiff += struct.pack("<H", 1) + struct.pack("<HHII", 0x8769, 4, 1, exif_ifd) + struct.pack("<I", 0)
+    tiff += struct.pack("<H", 1) + struct.pack("<HHII", 0x9286, 7, len(user_comment), value) + struct.pack("<I", 0)
+    return EXIF_HEADER + tiff + user_comment
+
+
+# --- JPEG ---
+
+JPEG_APP0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+JPEG_BODY = (
+    b"\xff\xdb" + struct.pack(">H", 67) + bytes(range(65))
+    + b"\xff\xda" + struct.pack(">H", 12) + b"\x03\x01\x00\x02\x11\x03\x11\x00\x3f\x00"
+    + b"\x12\x34\xff\x00\x56\x78"
+    + b"\xff\xd9"
+)
+
+
+def _jpeg_segments(data):
+    """返回 SOS 之前各段的 (marker, body)"""
+    segments, pos = [], 2
+    while data[pos + 1] != 0xDA:
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        segments.append((data[pos + 1], data[pos + 4:pos + 2 + length]))
+        pos += 2 + length
+    return segments
+
+
+def test_jpeg_exif_follows_app0_and_body_is_copied(tmp_path):
+    src = tmp_path / "src.jpg"
+    src.write_bytes(b"\xff\xd8" + JPEG_APP0 + JPEG_BODY)
+    dst = tmp_path / "dst.jpg"
+    insert_exif(str(src), str(dst), _exif(b"label"))
+
+    data = dst.read_bytes()
+    segments = _jpeg_segments(data)
+    assert [marker for marker, _ in segments] == [0xE0, 0xE1, 0xDB]
+    assert segments[1][1] == _exif(b"label")
+    assert data.endswith(JPEG_BODY)
+
+
+def test_jpeg_reinsert_replaces_existing_exif(tmp_path):
+    src = tmp_path / "src.jpg"
+    src.write_bytes(b"\xff\xd8" + JPEG_APP0 + JPEG_BODY)
+    insert_exif(str(src), str(src), _exif(b"first"))
+    insert_exif(str(src), str(src), _exif(b"second"))
+
+    exif_segments = [body for marker, body in _jpeg_segments(src.read_bytes()) if marker == 0xE1]
+    assert exif_segments == [_exif(b"second")]
+
+
+def test_jpeg_without_app0_gets_exif_first(tmp_path):
+    src = tmp_path / "src.jpg"
+    src.write_bytes(b"\xff\xd8" + JPEG_BODY)
+    dst = tmp_path / "dst.jpg"
+    insert_exif(str(src), str(dst), _exif(b"label"))
+
+    assert [marker for marker, _ in _jpeg_segments(dst.read_bytes())] == [0xE1, 0xDB]
+
+
+# --- PNG ---
+
+def _png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def _png_chunks(data):
+    chunks, pos = [], 8
+    while pos < len(data):
+        length, chunk_type = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        crc = struct.unpack(">I", data[pos + 8 + length:pos + 12 + length])[0]
+        assert crc == zlib.crc32(chunk_type + body), chunk_type
+        chunks.append((chunk_type, body))
+        pos += 12 + length
+    return chunks
+
+
+PNG_IHDR = struct.pack(">IIBBBBB", 4, 3, 8, 2, 0, 0, 0)
+PNG_IDAT = zlib.compress(b"\x00" + b"\x80" * 12 * 3)
+
+
+def _png():
+    return b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", PNG_IHDR) + _png_chunk(b"IDAT", PNG_IDAT) + _png_chunk(b"IEND", b"")
+
+
+def test_png_exif_chunk_after_ihdr(tmp_path):
+    src = tmp_path / "src.png"
+    src.write_bytes(_png())
+    dst = tmp_path / "dst.png"
+    insert_exif(str(src), str(dst), _exif(b"label"))
+
+    chunks = _png_chunks(dst.read_bytes())
+    assert [chunk_type for chunk_type, _ in chunks] == [b"IHDR", b"eXIf", b"IDAT", b"IEND"]
+    assert chunks[1][1] == _exif(b"label")[len(EXIF_HEADER):]
+    assert chunks[2][1] == PNG_IDAT
+
+
+def test_png_reinsert_keeps_one_exif_chunk(tmp_path):
+    src = tmp_path / "src.png"
+    src.write_bytes(_png())
+    insert_exif(str(src), str(src), _exif(b"first"))
+    insert_exif(str(src), str(src), _exif(b"second"))
+
+    exif_chunks = [body for chunk_type, body in _png_chunks(src.read_bytes()) if chunk_type == b"eXIf"]
+    assert exif_chunks == [_exif(b"second")[len(EXIF_HEADER):]]
+
+
+# --- WebP ---
+
+def _riff_chunk(chunk_type, data):
+    return struct.pack("<4sI", chunk_type, len(data)) + data + (b"\x00" if len(data) % 2 else b"")
+
+
+def _webp(chunks):
+    body = b"WEBP" + b"".join(chunks)
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def _webp_chunks(data):
+    assert data[:4] == b"RIFF" and data[8:12] == b"WEBP"
+    assert struct.unpack("<I", data[4:8])[0] == len(data) - 8
+    chunks, pos = [], 12
+    while pos < len(data):
+        chunk_type, size = struct.unpack("<4sI", data[pos:pos + 8])
+        chunks.append((chunk_type, data[pos + 8:pos + 8 + size]))
+        pos += 8 + size + (size & 1)
+    return chunks
+
+
+# VP8L 位流头：签名 0x2f，14 位宽-1、14 位高-1、1 位 alpha；数据长度为奇数以覆盖补齐字节
+VP8L_DATA = b"\x2f" + struct.pack("<I", (320 - 1) | ((200 - 1) << 14) | (1 << 28)) + b"\xaa" * 9
+
+
+def test_simple_webp_is_converted_to_vp8x(tmp_path):
+    src = tmp_path / "src.webp"
+    src.write_bytes(_webp([_riff_chunk(b"VP8L", VP8L_DATA)]))
+    dst = tmp_path / "dst.webp"
+    insert_exif(str(src), str(dst), _exif(b"label"))
+
+    chunks = _webp_chunks(dst.read_bytes())
+    assert [chunk_type for chunk_type, _ in chunks] == [b"VP8X", b"VP8L", b"EXIF"]
+    vp8x = chunks[0][1]
+    assert vp8x[0] & 0x08 and vp8x[0] & 0x10
+    assert int.from_bytes(vp8x[4:7], "little") + 1 == 320
+    assert int.from_bytes(vp8x[7:10], "little") + 1 == 200
+    assert chunks[1][1] == VP8L_DATA
+    assert chunks[2][1] == _exif(b"label")[len(EXIF_HEADER):]
+
+
+def test_extended_webp_places_exif_before_xmp(tmp_path):
+    vp8x = bytes([0x04, 0, 0, 0]) + (320 - 1).to_bytes(3, "little") + (200 - 1).to_bytes(3, "little")
+    src = tmp_path / "src.webp"
+    src.write_bytes(_webp([_riff_chunk(b"VP8X", vp8x), _riff_chunk(b"VP8L", VP8L_DATA), _riff_chunk(b"XMP ", b"<x/>")]))
+    dst = tmp_path / "dst.webp"
+    insert_exif(str(src), str(dst), _exif(b"first"))
+    insert_exif(str(dst), str(dst), _exif(b"second"))
+
+    chunks = _webp_chunks(dst.read_bytes())
+    assert [chunk_type for chunk_type, _ in chunks] == [b"VP8X", b"VP8L", b"EXIF", b"XMP "]
+    assert chunks[0][1][0] == 0x04 | 0x08
+    assert chunks[2][1] == _exif(b"second")[len(EXIF_HEADER):]
+
+
+# --- HEIF ---
+
+HEIF_IMAGE = b"hevc-coded-image-data" * 3
+
+
+def _box(box_type, payload):
+    return struct.pack(">I4s", len(payload) + 8, box_type) + payload
+
+
+def _heif():
+    """ftyp + meta（hdlr/pitm/iinf/iloc，单个 hvc1 图像项）+ mdat"""
+    ftyp = _box(b"ftyp", b"heic\x00\x00\x00\x00mif1heic")
+
+    def meta(image_offset):
+        hdlr = _box(b"hdlr", b"\x00" * 8 + b"pict" + b"\x00" * 12 + b"\x00")
+        pitm = _box(b"pitm", b"\x00" * 4 + struct.pack(">H", 1))
+        infe = _box(b"infe", bytes([2, 0, 0, 0]) + struct.pack(">HH", 1, 0) + b"hvc1" + b"\x00")
+        iinf = _box(b"iinf", b"\x00" * 4 + struct.pack(">H", 1) + infe)
+        iloc = _box(b"iloc", bytes([0, 0, 0, 0, 0x44, 0x00]) + struct.pack(">HHHHII", 1, 1, 0, 1, image_offset, len(HEIF_IMAGE)))
+        return _box(b"meta", b"\x00" * 4 + hdlr + pitm + iinf + iloc)
+
+    image_offset = len(ftyp) + len(meta(0)) + 8
+    return ftyp + meta(image_offset) + _box(b"mdat", HEIF_IMAGE)
+
+
+def _heif_items(data):
+    """返回 {item_type: 项数据}，按 iloc 中 construction_method 0 的偏移读取"""
+    for box_type, offset, size, header in _iter_boxes(data):
+        if box_type == b"meta":
+            meta = data[offset:offset + size]
+            break
+    children = {box_type: meta[offset + header:offset + size]
+                for box_type, offset, size, header in _iter_boxes(meta, 12)}
+    _, entries = _parse_iinf(children[b"iinf"])
+    types = {item_id: item_type for item_id, item_type, _ in entries}
+    _, _, items = _parse_iloc(children[b"iloc"])
+    assert len(set(types.values())) == len(items) == len(entries)
+    return {
+        types[item["id"]]: b"".join(data[item["base"] + extent_offset:item["base"] + extent_offset + length]
+                                    for _, extent_offset, length in item["extents"])
+        for item in items
+    }
+
+
+def test_heif_exif_item_added_and_image_offsets_shifted(tmp_path):
+    src = tmp_path / "src.heic"
+    src.write_bytes(_heif())
+    assert _heif_items(src.read_bytes()) == {b"hvc1": HEIF_IMAGE}
+    dst = tmp_path / "dst.heic"
+    insert_exif(str(src), str(dst), _exif(b"label"))
+
+    items = _heif_items(dst.read_bytes())
+    assert items[b"hvc1"] == HEIF_IMAGE
+    assert items[b"Exif"] == struct.pack(">I", len(EXIF_HEADER)) + _exif(b"label")
+
+
+def test_heif_reinsert_replaces_exif_item(tmp_path):
+    src = tmp_path / "src.heic"
+    src.write_bytes(_heif())
+    insert_exif(str(src), str(src), _exif(b"first"))
+    insert_exif(str(src), str(src), _exif(b"second"))
+
+    items = _heif_items(src.read_bytes())
+    assert items[b"hvc1"] == HEIF_IMAGE
+    assert items[b"Exif"].endswith(_exif(b"second"))
+
+
+# --- 其他 ---
+
+def test_detect_format():
+    assert detect_format(b"\xff\xd8\xff\xe0") == "jpeg"
+    assert detect_format(_png()[:16]) == "png"
+    assert detect_format(_webp([_riff_chunk(b"VP8L", VP8L_DATA)])[:16]) == "webp"
+    assert detect_format(_heif()[:16]) == "heif"
+    assert detect_format(b"GIF89a" + b"\x00" * 10) is None
+
+
+def test_unknown_format_leaves_no_output(tmp_path):
+    src = tmp_path / "src.gif"
+    src.write_bytes(b"GIF89a" + b"\x00" * 32)
+    dst = tmp_path / "dst.gif"
+    with pytest.raises(UnsupportedImageFormatError):
+        insert_exif(str(src), str(dst), _exif(b"label"))
+    assert not dst.exists()
+
+
+# --- 只读文件头探测 UserComment ---
+
+@pytest.mark.parametrize("name,make", [
+    ("src.jpg", lambda: b"\xff\xd8" + JPEG_APP0 + JPEG_BODY),
+    ("src.png", _png),
+    ("src.webp", lambda: _webp([_riff_chunk(b"VP8L", VP8L_DATA)])),
+    ("src.heic", _heif),
+])
+def test_probe_reads_user_comment_after_splice(tmp_path, name, make):
+    pytest.importorskip("requests")
+    from image_metadata.exif_probe import probe_user_comment
+
+    src = tmp_path / name
+    src.write_bytes(make())
+    assert probe_user_comment(str(src)) is None
+
+    insert_exif(str(src), str(src), _exif(b'{"Label": "1"}'))
+    assert probe_user_comment(str(src)) == b'ASCII\x00\x00\x00{"Label": "1"}'
+
+
+def test_probe_stops_at_png_image_data(tmp_path):
+    pytest.importorskip("requests")
+    from image_metadata.exif_probe import probe_user_comment
+
+    # eXIf 位于 IDAT 之后不符合规范，探测只读到 IDAT 为止
+    data = _png()
+    iend = data.index(b"IEND") - 4
+    src = tmp_path / "late.png"
+    src.write_bytes(data[:iend] + _png_chunk(b"eXIf", _exif(b"late")[len(EXIF_HEADER):]) + data[iend:])
+    assert probe_user_comment(str(src)) is None
+
+
+def test_probe_rejects_unknown_format(tmp_path):
+    pytest.importorskip("requests")
+    from image_metadata.exif_probe import probe_user_comment
+
+    src = tmp_path / "src.gif"
+    src.write_bytes(b"GIF89a" + b"\x00" * 32)
+    with pytest.raises(UnsupportedImageFormatError):
+        probe_user_comment(str(src))
@@ -0,0 +1,51 @@
+import shutil
+
+import pytest
+
+ffmpeg = pytest.importorskip("ffmpeg")
+pytest.importorskip("cv2")
+pytest.importorskip("numpy")
+
+from video_explicit.frame_source import iter_frames
+
+pytestmark = pytest.mark.skipif(not (shutil.which("ffmpeg") and shutil.which("ffprobe")),
+                                reason="需要 ffmpeg 与 ffprobe")
+
+
+def _make_clip(path):
+    (
+        ffmpeg
+        .input("testsrc=size=160x120:rate=25", f="lavfi", t=4)
+        .output(path, vcodec="libx264", pix_fmt="yuv420p", movflags="+faststart")
+        .global_args("-nostdin", "-loglevel", "error")
+        .run(overwrite_output=True, capture_stderr=True)
+    )
+
+
+def test_frames_are_sampled_at_interval(tmp_path):
+    path = str(tmp_path / "clip.mp4")
+    _make_clip(path)
+    frames = list(iter_frames(path, 0.5))
+    assert [t for t, _ in frames] == [i * 0.5 for i in range(8)]
+    assert frames[0][1].shape == (120, 160, 3)
+
+
+def test_stopping_early_is_not_an_error(tmp_path):
+    path = str(tmp_path / "clip.mp4")
+    _make_clip(path)
+    frames = iter_frames(path, 0.5)
+    next(frames)
+    frames.close()
+
+
+def test_undecodable_input_raises(tmp_path):
+    path = tmp_path / "clip.mp4"
+    _make_clip(str(path))
+    # 文件头完整（可以探测），码流内容全部清零
+    data = bytearray(path.read_bytes())
+    payload = data.find(b"mdat") + 4
+    data[payload:] = bytes(len(data) - payload)
+    path.write_bytes(bytes(data))
+    with pytest.raises(ffmpeg.Error) as info:
+        list(iter_frames(str(path), 0.5))
+    assert info.value.stderr
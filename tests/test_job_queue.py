@@ -0,0 +1,25 @@
+from job_queue import DONE, FAILED, QUEUED, RUNNING, RUNNING_PROGRESS_CAP, Job
+
+
+def _job(state, started_at=None):
+    job = Job("DetectVideoExplicitLabel", "input.mp4", None, {}, ".mp4")
+    job.state = state
+    job.started_at = started_at
+    return job
+
+
+def test_queued_and_finished_progress():
+    assert _job(QUEUED).progress() == 0.0
+    assert _job(DONE, 0.0).progress() == 1.0
+    assert _job(FAILED, 0.0).progress() == 1.0
+
+
+def test_running_progress_is_estimated_from_average_run_time():
+    job = _job(RUNNING, 100.0)
+    assert job.progress(expected_run=10.0, now=104.0) == 0.4
+    assert job.progress(expected_run=10.0, now=130.0) == RUNNING_PROGRESS_CAP
+    assert job.progress(expected_run=None, now=104.0) is None
+
+
+def test_progress_in_status():
+    assert _job(QUEUED).to_dict(queue_position=0)["progress"] == 0.0
@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from audio_detection.keyword_gate import (
+    _may_contain_keyword,
+    candidates_from_segments,
+    complement_windows,
+    intersect_windows,
+    merge_windows,
+)
+
+
+@pytest.mark.parametrize("text", ["This audio is AI generated.", "A.I. content", "本内容由AI生成", "人工智能合成", "生 成"])
+def test_keyword_text_passes_gate(text):
+    assert _may_contain_keyword(text)
+
+
+@pytest.mark.parametrize("text", ["I said it again.", "The captain of the main team.", "Fresh air", "今天天气不错"])
+def test_ordinary_text_is_screened_out(text):
+    assert not _may_contain_keyword(text)
+
+
+def test_candidates_are_padded_and_merged():
+    segments = [
+        {"start": 1.0, "end": 2.0, "text": "AI生成"},
+        {"start": 2.5, "end": 3.0, "text": "合成"},
+        {"start": 10.0, "end": 12.0, "text": "I said it again"},
+    ]
+    assert candidates_from_segments(segments, 20.0) == [(0.0, 4.0)]
+
+
+def test_window_set_operations():
+    assert merge_windows([(5, 6), (-1, 2), (1.5, 3), (19, 25)], 20.0) == [(0.0, 3.0), (5.0, 6.0), (19.0, 20.0)]
+    assert merge_windows([(0, 1), (1.4, 2)], 10.0, min_gap=0.5) == [(0.0, 2.0)]
+    assert intersect_windows([(0, 5), (8, 12)], [(4, 9)]) == [(4, 5), (8, 9)]
+    assert complement_windows([(0, 5), (8, 12)], 20.0) == [(5, 8), (12, 20.0)]
@@ -0,0 +1,33 @@
+import glob
+import os
+import shutil
+import wave
+
+import pytest
+
+from audio_detection.audio_buffer import DecodedAudio
+from audio_detection.morse_ai_detector import detect_ai_pattern
+
+pytestmark = pytest.mark.skipif(not shutil.which("ffmpeg"), reason="需要 ffmpeg")
+
+AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "audio_detection")
+SAMPLES = sorted(glob.glob(os.path.join(AUDIO_DIR, "ai_label", "*")) + glob.glob(os.path.join(AUDIO_DIR, "ai_result", "*")))
+SAMPLES = [path for path in SAMPLES if not path.endswith(".py")]
+
+# 改用共享解码前（librosa 按原始采样率加载）在示例音频上的检测结果：只有 morse0.wav 在开头检测到节奏标识。
+# 按 16kHz / 8kHz 重采样后 morse0.wav 的音段边界移动一帧，检测不到
+EXPECTED_STARTS = {"morse0.wav": [0.0]}
+
+
+@pytest.mark.parametrize("path", SAMPLES, ids=os.path.basename)
+def test_bundled_samples_match_native_rate_results(path):
+    starts = [start for start, _ in detect_ai_pattern(path)]
+    assert starts == EXPECTED_STARTS.get(os.path.basename(path), [])
+
+
+def test_native_decode_keeps_sample_rate():
+    path = os.path.join(AUDIO_DIR, "ai_result", "morse0.wav")
+    with wave.open(path) as w:
+        rate, frames = w.getframerate(), w.getnframes()
+    sample_rate, samples = DecodedAudio(path).native()
+    assert (sample_rate, len(samples)) == (rate, frames)
@@ -0,0 +1,139 @@
+import struct
+
+import pytest
+
+from video_metadata.mp4_atoms import (
+    UnsupportedContainerError,
+    iter_boxes,
+    read_metadata_tag,
+    write_metadata_tag,
+)
+
+CHUNKS = [b"chunk-one", b"chunk-two!", b"chunk-three"]
+
+
+def _box(box_type, payload):
+    return struct.pack(">I4s", len(payload) + 8, box_type) + payload
+
+
+def _chunk_offset_box(box_type, offsets):
+    fmt = ">I" if box_type == b"stco" else ">Q"
+    return _box(box_type, b"\x00" * 4 + struct.pack(">I", len(offsets)) + b"".join(struct.pack(fmt, o) for o in offsets))
+
+
+def _moov(box_type, offsets, udta=b""):
+    stbl = _box(b"stbl", _chunk_offset_box(box_type, offsets))
+    trak = _box(b"trak", _box(b"mdia", _box(b"minf", stbl)))
+    return _box(b"moov", _box(b"mvhd", b"\x00" * 100) + trak + udta)
+
+
+def _make_mp4(path, moov_first=True, box_type=b"stco", free=0):
+    """生成最小的 MP4：ftyp + moov (+ free) + mdat，moov 中的 stco/co64 指向 mdat 中各数据块"""
+    ftyp = _box(b"ftyp", b"isom\x00\x00\x02\x00isommp41")
+    mdat_payload = b"".join(CHUNKS)
+    padding = _box(b"free", b"\x00" * (free - 8)) if free else b""
+
+    def layout(offsets):
+        moov = _moov(box_type, offsets)
+        if moov_first:
+            return ftyp + moov + padding + _box(b"mdat", mdat_payload), len(ftyp) + len(moov) + len(padding) + 8
+        return ftyp + _box(b"mdat", mdat_payload) + moov + padding, len(ftyp) + 8
+
+    # 先按占位偏移排版得到 mdat 位置，再写入真实偏移（偏移字段定长，排版不变）
+    _, data_start = layout([0] * len(CHUNKS))
+    offsets, position = [], data_start
+    for chunk in CHUNKS:
+        offsets.append(position)
+        position += len(chunk)
+    data, _ = layout(offsets)
+    path.write_bytes(data)
+    return path
+
+
+def _chunk_offsets(path):
+    data = path.read_bytes()
+    for box_type, offset, size, header in iter_boxes(data):
+        if box_type == b"moov":
+            moov = data[offset:offset + size]
+            for table in (b"stco", b"co64"):
+                pos = moov.find(table)
+                if pos >= 0:
+                    fmt, width = (">I", 4) if table == b"stco" else (">Q", 8)
+                    count = struct.unpack(">I", moov[pos + 8:pos + 12])[0]
+                    return [struct.unpack(fmt, moov[pos + 12 + i * width:pos + 12 + (i + 1) * width])[0]
+                            for i in range(count)]
+    raise AssertionError("moov 中没有 stco/co64")
+
+
+def _assert_chunks_intact(path):
+    data = path.read_bytes()
+    for offset, chunk in zip(_chunk_offsets(path), CHUNKS):
+        assert data[offset:offset + len(chunk)] == chunk
+
+
+@pytest.mark.parametrize("box_type", (b"stco", b"co64"))
+def test_faststart_file_shifts_chunk_offsets(tmp_path, box_type):
+    src = _make_mp4(tmp_path / "src.mp4", moov_first=True, box_type=box_type)
+    dst = tmp_path / "dst.mp4"
+    write_metadata_tag(str(src), str(dst), '{"Label": "1"}')
+
+    assert read_metadata_tag(str(dst)) == '{"Label": "1"}'
+    assert _chunk_offsets(dst) != _chunk_offsets(src)
+    _assert_chunks_intact(dst)
+
+
+def test_moov_at_end_keeps_chunk_offsets(tmp_path):
+    src = _make_mp4(tmp_path / "src.mp4", moov_first=False)
+    dst = tmp_path / "dst.mp4"
+    write_metadata_tag(str(src), str(dst), "value")
+
+    assert read_metadata_tag(str(dst)) == "value"
+    assert _chunk_offsets(dst) == _chunk_offsets(src)
+    _assert_chunks_intact(dst)
+
+
+def test_free_padding_is_reused_in_place(tmp_path):
+    src = _make_mp4(tmp_path / "src.mp4", moov_first=True, free=512)
+    size = src.stat().st_size
+    write_metadata_tag(str(src), str(src), "value")
+
+    assert src.stat().st_size == size
+    assert read_metadata_tag(str(src)) == "value"
+    _assert_chunks_intact(src)
+
+
+def test_rewriting_replaces_the_existing_value(tmp_path):
+    src = _make_mp4(tmp_path / "src.mp4", moov_first=True)
+    first = tmp_path / "first.mp4"
+    second = tmp_path / "second.mp4"
+    write_metadata_tag(str(src), str(first), "old")
+    write_metadata_tag(str(first), str(second), "new value")
+
+    assert read_metadata_tag(str(second)) == "new value"
+    # 第一次写入预留的 free 填充足够放下新值，不再移动媒体数据
+    assert _chunk_offsets(second) == _chunk_offsets(first)
+    _assert_chunks_intact(second)
+
+
+def test_other_keys_are_preserved(tmp_path):
+    src = _make_mp4(tmp_path / "src.mp4", moov_first=False)
+    dst = tmp_path / "dst.mp4"
+    write_metadata_tag(str(src), str(dst), "a", key="First")
+    write_metadata_tag(str(dst), str(dst), "b", key="Second")
+
+    assert read_metadata_tag(str(dst), key="First") == "a"
+    assert read_metadata_tag(str(dst), key="Second") == "b"
+
+
+def test_missing_tag_reads_as_none(tmp_path):
+    src = _make_mp4(tmp_path / "src.mp4")
+    assert read_metadata_tag(str(src)) is None
+
+
+def test_non_mp4_is_rejected(tmp_path):
+    path = tmp_path / "not.mp4"
+    path.write_bytes(b"RIFF\x00\x00\x00\x00WAVEfmt ")
+    with pytest.raises(UnsupportedContainerError):
+        read_metadata_tag(str(path))
+    with pytest.raises(UnsupportedContainerError):
+        write_metadata_tag(str(path), str(tmp_path / "out.mp4"), "value")
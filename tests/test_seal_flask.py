@@ -0,0 +1,90 @@
+import io
+import json
+import os
+
+import pytest
+
+pytest.importorskip("flask")
+
+import seal_flask
+
+
+@pytest.fixture
+def spooled(monkeypatch):
+    """记录 SpoolingRequest 写入的上传临时文件路径"""
+    paths = []
+    get_file_stream = seal_flask.SpoolingRequest._get_file_stream
+
+    def record(self, *args, **kwargs):
+        stream = get_file_stream(self, *args, **kwargs)
+        paths.append(stream.name)
+        return stream
+
+    monkeypatch.setattr(seal_flask.SpoolingRequest, "_get_file_stream", record)
+    return paths
+
+
+@pytest.fixture
+def client():
+    return seal_flask.app.test_client()
+
+
+def test_uploads_removed_on_early_return(client, spooled):
+    response = client.post("/seal_process", data={"file": (io.BytesIO(b"abc"), "a.jpg")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 400
+    assert spooled and not any(os.path.exists(path) for path in spooled)
+
+
+def test_uploads_removed_when_body_is_truncated(client, spooled):
+    # 请求体在文件内容中途截断，解析失败时 request.files 为空，已写入的临时文件仍需删除
+    body = b'--B\r\nContent-Disposition: form-data; name="file"; filename="a.jpg"\r\n\r\n' + b"x" * 100000
+    response = client.post("/seal_process", data=body, content_type="multipart/form-data; boundary=B")
+    assert response.status_code == 400
+    assert spooled and not any(os.path.exists(path) for path in spooled)
+
+
+def test_batch_reads_uploads_after_request_and_removes_them(client, spooled, monkeypatch):
+    def call_method(method, input_path, output_path, params):
+        with open(input_path, "rb") as fin:
+            size = len(fin.read())
+        return json.dumps({"status": 0, "result": size})
+
+    monkeypatch.setattr(seal_flask, "_call_method", call_method)
+    files = [(io.BytesIO(b"abc"), "a.jpg"), (io.BytesIO(b"abcd"), "b.jpg")]
+    response = client.post("/batch_process", data={"method": "EmbedImageImplicitLabel", "file": files},
+                           content_type="multipart/form-data")
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    response.close()
+
+    sizes = {record["filename"]: record["result"]["result"] for record in lines[:-1]}
+    assert sizes == {"a.jpg": 3, "b.jpg": 4}
+    assert lines[-1]["summary"]["succeeded"] == 2
+    assert spooled and not any(os.path.exists(path) for path in spooled)
+
+
+@pytest.mark.parametrize("size, inline", [(16, True), (64, False)])
+def test_batch_returns_large_outputs_by_reference(client, monkeypatch, size, inline):
+    def call_method(method, input_path, output_path, params):
+        with open(output_path, "wb") as fout:
+            fout.write(b"x" * size)
+        return json.dumps({"status": 0, "result": "嵌入成功"})
+
+    monkeypatch.setattr(seal_flask, "_call_method", call_method)
+    monkeypatch.setattr(seal_flask, "BATCH_INLINE_BYTES", 32)
+    response = client.post("/batch_process", data={"method": "EmbedImageImplicitLabel",
+                                                   "file": (io.BytesIO(b"abc"), "a.jpg")},
+                           content_type="multipart/form-data")
+    record = json.loads(response.get_data(as_text=True).splitlines()[0])
+    response.close()
+
+    if inline:
+        assert "result_url" not in record and len(record["file_base64"]) > 0
+        return
+    assert "file_base64" not in record
+    result = client.get(record["result_url"])
+    assert result.status_code == 200
+    assert b"x" * size in result.get_data()
+    job = seal_flask.JOB_MANAGER.get(record["result_url"].split("/")[2])
+    assert os.path.exists(job.output_path)
+    os.remove(job.output_path)
@@ -0,0 +1,147 @@
+import shutil
+
+import pytest
+
+ffmpeg = pytest.importorskip("ffmpeg")
+
+from video_explicit.segment_embed import embed_segments, encoder_args, has_open_gop, keyframe_times, plan_cuts
+
+FPS = 25
+WIDTH, HEIGHT = 320, 240
+# 标识画在左上角，源视频为带噪声的深灰色，标识区域内出现亮像素即视为有标识
+LABEL_BOX = (slice(0, 80), slice(0, 120))
+
+
+def test_closed_gop_with_b_frames_is_not_open():
+    # 解码顺序 I P B B | I P B B，B 帧显示时间在关键帧之后
+    packets = [(0.0, True), (0.3, False), (0.1, False), (0.2, False),
+               (1.0, True), (1.3, False), (1.1, False), (1.2, False)]
+    assert not has_open_gop(packets)
+    assert keyframe_times(packets) == [0.0, 1.0]
+
+
+def test_leading_frames_before_keyframe_mark_open_gop():
+    # 第二个关键帧之后的 B 帧显示时间早于关键帧，参考上一个 GOP
+    packets = [(0.0, True), (0.3, False), (0.1, False), (0.2, False),
+               (1.0, True), (0.8, False), (0.9, False), (1.3, False)]
+    assert has_open_gop(packets)
+
+
+def test_plan_cuts_expands_to_gop_boundaries_and_merges():
+    keyframes = [0.0, 2.0, 4.0, 6.0, 8.0]
+    assert plan_cuts(keyframes, [(2.5, 3.0), (3.5, 4.5)]) == [(2.0, 6.0)]
+    assert plan_cuts(keyframes, [(0.5, 1.0), (6.5, 9.0)]) == [(0.0, 2.0), (6.0, None)]
+
+
+def test_h264_segments_match_source_profile_and_level():
+    args = encoder_args("libx264", {"profile": "High", "level": 41, "pix_fmt": "yuv420p", "bit_rate": "2000000"})
+    assert args["profile:v"] == "high"
+    assert args["level"] == "4.1"
+    assert args["x264-params"] == "open-gop=0"
+    assert args["pix_fmt"] == "yuv420p"
+
+
+def test_hevc_segments_use_closed_gop():
+    args = encoder_args("libx265", {"profile": "Main 10", "level": 120})
+    assert args["x265-params"] == "open-gop=0:profile=main10:level-idc=4.0"
+
+
+def _font_file(tmp_path):
+    """Pillow 内置的 FreeType 字体写到临时文件，供 drawtext 使用"""
+    image_font = pytest.importorskip("PIL.ImageFont")
+    font_bytes = getattr(image_font.load_default(size=20), "font_bytes", None)
+    if not font_bytes:
+        pytest.skip("Pillow 未带 FreeType 默认字体")
+    path = tmp_path / "font.ttf"
+    path.write_bytes(font_bytes)
+    return str(path)
+
+
+def _make_source(path):
+    # 1 秒一个 GOP，带 B 帧（起始延迟 2 帧）；关闭 CABAC，使重编码片段的参数集与源视频不同
+    # 叠加随机噪声，使源视频码率足够重编码片段清晰地画出标识
+    video = ffmpeg.input(f"color=c=0x404040:size={WIDTH}x{HEIGHT}:rate={FPS},noise=alls=20:allf=t+u", f="lavfi", t=6)
+    audio = ffmpeg.input("sine=frequency=440:sample_rate=44100", f="lavfi", t=6)
+    (
+        ffmpeg
+        .output(video, audio, path, vcodec="libx264", g=FPS, bf=2, sc_threshold=0, pix_fmt="yuv420p",
+                **{"x264-params": "cabac=0:ref=1", "profile:v": "main", "c:a": "aac"})
+        .global_args("-nostdin", "-loglevel", "error")
+        .run(overwrite_output=True, capture_stderr=True)
+    )
+
+
+def _gray_frames(path):
+    np = pytest.importorskip("numpy")
+    out, _ = (
+        ffmpeg
+        .input(path)
+        .output("pipe:", format="rawvideo", pix_fmt="gray")
+        .global_args("-nostdin", "-loglevel", "error")
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return np.frombuffer(out, np.uint8).reshape(-1, HEIGHT, WIDTH)
+
+
+def _require_mpegts(tmp_path):
+    """片段以 MPEG-TS 中转；部分静态编译的 ffmpeg 读取 MPEG-TS 时崩溃，此时跳过"""
+    path = str(tmp_path / "probe.ts")
+    try:
+        (
+            ffmpeg
+            .input(f"color=size={WIDTH}x{HEIGHT}:rate={FPS}", f="lavfi", t=0.2)
+            .output(path, vcodec="libx264", f="mpegts")
+            .global_args("-nostdin", "-loglevel", "error")
+            .run(overwrite_output=True, capture_stderr=True)
+        )
+        ffmpeg.input(path).output("-", format="null").global_args("-nostdin").run(capture_stdout=True,
+                                                                                   capture_stderr=True)
+    except ffmpeg.Error:
+        pytest.skip("ffmpeg 无法读写 MPEG-TS")
+
+
+@pytest.mark.skipif(not (shutil.which("ffmpeg") and shutil.which("ffprobe")), reason="需要 ffmpeg 与 ffprobe")
+def test_embed_segments_end_to_end(tmp_path):
+    _require_mpegts(tmp_path)
+    source = str(tmp_path / "source.mp4")
+    result = str(tmp_path / "result.mp4")
+    _make_source(source)
+    probe = ffmpeg.probe(source)
+    video_stream = next(s for s in probe["streams"] if s["codec_type"] == "video")
+    drawtext_args = {"fontfile": _font_file(tmp_path), "text": "AI", "fontsize": 40, "fontcolor": "white",
+                     "x": "10", "y": "10"}
+    start, end = 2.4, 4.4
+
+    # 标识窗口落在 [2, 5) 的 GOP 内：只重编码这三个 GOP，前后片段直接复制
+    embed_segments(source, result, drawtext_args, [(start, end)], video_stream,
+                   float(probe["format"]["start_time"]))
+
+    # 完整解码无错误
+    _, stderr = (
+        ffmpeg
+        .input(result)
+        .output("-", format="null")
+        .global_args("-nostdin", "-loglevel", "error", "-xerror")
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    assert not stderr.strip()
+
+    result_probe = ffmpeg.probe(result)
+    streams = {s["codec_type"]: s for s in result_probe["streams"]}
+    assert "audio" in streams
+    assert streams["video"]["codec_tag_string"] == "avc3"
+    assert abs(float(result_probe["format"]["duration"]) - float(probe["format"]["duration"])) < 0.1
+
+    # 标识只出现在时间窗内，片段边界处不偏移
+    frames = _gray_frames(result)
+    assert len(frames) == 6 * FPS
+    for index, frame in enumerate(frames):
+        t = index / FPS
+        if abs(t - start) < 0.01 or abs(t - end) < 0.01:
+            continue
+        assert (frame[LABEL_BOX].max() > 200) == (start < t < end), t
+
+    # 时间窗外的 GOP 直接复制原码流，解码结果与源视频逐像素相同
+    source_frames = _gray_frames(source)
+    assert (frames[:2 * FPS] == source_frames[:2 * FPS]).all()
+    assert (frames[5 * FPS:] == source_frames[5 * FPS:]).all()
@@ -0,0 +1,75 @@
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("easyocr")
+
+from video_explicit import video_explicit
+
+
+class _Reader:
+    """按时间点读取的帧直接用时间代替图像"""
+
+    def __init__(self, video_path):
+        self.reads = 0
+
+    def read_at(self, t):
+        self.reads += 1
+        return t
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _iter_frames(video_path, interval, start=0.0, end=None, probe=None):
+    index = 0
+    while start + index * interval < end:
+        t = round(start + index * interval, 3)
+        yield t, t
+        index += 1
+
+
+class _Detector:
+    def __init__(self, windows):
+        self.windows = windows
+
+    def check(self, t):
+        return any(start <= t < end for start, end in self.windows)
+
+
+@pytest.fixture
+def scan(monkeypatch):
+    monkeypatch.setattr(video_explicit, "FrameReader", _Reader)
+    monkeypatch.setattr(video_explicit, "iter_frames", _iter_frames)
+
+    def run(duration, windows):
+        return video_explicit._scan_adaptive("video.mp4", duration, {}, _Detector(windows))
+    return run
+
+
+def test_label_boundaries_found_to_precision(scan):
+    segments, probes = scan(60.0, [(12.34, 17.0)])
+    assert len(segments) == 1
+    start, end = segments[0]
+    assert 12.34 <= start <= 12.34 + video_explicit.TIME_PRECISION
+    assert 17.0 <= end <= 17.0 + video_explicit.TIME_PRECISION
+    assert probes < 60.0 / video_explicit.UNIFORM_INTERVAL
+
+
+def test_short_label_between_old_stride_probes_is_found(scan):
+    # 0.8 秒的标识落在 1.5 秒步长的两个探测点（1.5、3.0）之间
+    segments, _ = scan(10.0, [(1.6, 2.4)])
+    assert len(segments) == 1
+    start, end = segments[0]
+    assert abs(start - 1.6) <= video_explicit.TIME_PRECISION
+    assert abs(end - 2.4) <= video_explicit.TIME_PRECISION
+
+
+def test_label_running_to_the_end(scan):
+    segments, _ = scan(10.0, [(8.0, 10.0)])
+    assert segments[-1][1] == 10.0
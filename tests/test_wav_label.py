@@ -0,0 +1,103 @@
+import struct
+import wave
+
+import pytest
+
+pytest.importorskip("mutagen")
+
+from audio_metadata.audio_metadata import _detect_wav_label, _embed_wav_label, _scan_wav_chunks
+
+FRAMES = bytes(range(256)) * 40
+
+
+def _make_wav(path, extra_chunks=b""):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(FRAMES)
+    if extra_chunks:
+        data = path.read_bytes() + extra_chunks
+        path.write_bytes(data[:4] + struct.pack("<I", len(data) - 8) + data[8:])
+    return path
+
+
+def _chunk_ids(path):
+    with open(path, "rb") as f:
+        return [cid for cid, _, _ in _scan_wav_chunks(f, path.stat().st_size)]
+
+
+def _assert_valid_wav(path):
+    data = path.read_bytes()
+    assert struct.unpack("<I", data[4:8])[0] == len(data) - 8
+    with wave.open(str(path), "rb") as w:
+        assert w.readframes(w.getnframes()) == FRAMES
+
+
+def test_embed_to_new_file_places_label_after_fmt(tmp_path):
+    src = _make_wav(tmp_path / "src.wav")
+    dst = tmp_path / "dst.wav"
+    _embed_wav_label(str(src), '{"Label": "1"}', str(dst))
+
+    assert _chunk_ids(dst) == [b"fmt ", b"AIGC", b"data"]
+    assert _detect_wav_label(str(dst)) == '{"Label": "1"}'
+    _assert_valid_wav(dst)
+
+
+def test_embed_to_new_file_replaces_old_label_and_keeps_other_chunks(tmp_path):
+    src = _make_wav(tmp_path / "src.wav", extra_chunks=b"LIST" + struct.pack("<I", 3) + b"abc\x00")
+    first = tmp_path / "first.wav"
+    second = tmp_path / "second.wav"
+    _embed_wav_label(str(src), "odd", str(first))
+    _embed_wav_label(str(first), "second label", str(second))
+
+    assert _chunk_ids(second) == [b"fmt ", b"AIGC", b"data", b"LIST"]
+    assert _detect_wav_label(str(second)) == "second label"
+    _assert_valid_wav(second)
+
+
+def test_in_place_overwrites_when_label_fits(tmp_path):
+    path = _make_wav(tmp_path / "a.wav")
+    _embed_wav_label(str(path), "a much longer first label", str(tmp_path / "b.wav"))
+    path = tmp_path / "b.wav"
+    size = path.stat().st_size
+    _embed_wav_label(str(path), "short")
+
+    assert path.stat().st_size == size
+    assert _detect_wav_label(str(path)) == "short"
+    _assert_valid_wav(path)
+
+
+def test_in_place_appends_when_label_grows(tmp_path):
+    path = _make_wav(tmp_path / "a.wav")
+    _embed_wav_label(str(path), "short", str(path))
+    _embed_wav_label(str(path), "a label that no longer fits in the old chunk", str(path))
+
+    # 原地写入时新块追加到末尾，放不下新标签的旧块改为 JUNK
+    assert _chunk_ids(path) == [b"fmt ", b"data", b"JUNK", b"AIGC"]
+    assert _detect_wav_label(str(path)) == "a label that no longer fits in the old chunk"
+    _assert_valid_wav(path)
+
+    _embed_wav_label(str(path), "x" * 200, str(path))
+    assert _chunk_ids(path) == [b"fmt ", b"data", b"JUNK", b"JUNK", b"AIGC"]
+    assert _detect_wav_label(str(path)) == "x" * 200
+    _assert_valid_wav(path)
+
+
+def test_truncated_data_chunk_is_repaired_on_append(tmp_path):
+    path = _make_wav(tmp_path / "a.wav")
+    # 模拟录制中断：data 块声明的长度大于实际长度
+    path.write_bytes(path.read_bytes()[:-101])
+    _embed_wav_label(str(path), "label", str(path))
+
+    assert _detect_wav_label(str(path)) == "label"
+    data = path.read_bytes()
+    assert struct.unpack("<I", data[4:8])[0] == len(data) - 8
+
+
+def test_non_wav_is_rejected(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(b"ID3\x03" + b"\x00" * 64)
+    with pytest.raises(ValueError):
+        _embed_wav_label(str(path), "label", str(tmp_path / "b.wav"))
+    assert _detect_wav_label(str(path)) is None
@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("torch")
+
+from audio_detection.whisper_batcher import WINDOW_SECONDS, _owned_segments, _split_segments, split_windows
+
+TIMESTAMP_BEGIN = 1000
+TIME_PRECISION = 0.02
+
+
+class _Tokenizer:
+    timestamp_begin = TIMESTAMP_BEGIN
+
+    def decode(self, tokens):
+        return "".join(chr(ord("a") + token) for token in tokens)
+
+
+def _result(tokens):
+    return SimpleNamespace(tokens=tokens, temperature=0.0, avg_logprob=-0.2, compression_ratio=1.0,
+                           no_speech_prob=0.01)
+
+
+def _ts(seconds):
+    return TIMESTAMP_BEGIN + round(seconds / TIME_PRECISION)
+
+
+def _segment(start, end, text):
+    return {"start": start, "end": end, "text": text}
+
+
+def test_split_segments_offsets_timestamps():
+    result = _result([_ts(0.0), 0, 1, _ts(1.0), _ts(1.0), 2, _ts(2.5)])
+    segments = _split_segments(result, _Tokenizer(), 30.0, 30.0, TIME_PRECISION)
+    assert [(s["start"], s["end"], s["text"]) for s in segments] == [(30.0, 31.0, "ab"), (31.0, 32.5, "c")]
+    assert segments[0]["seek"] == 3000
+    assert segments[0]["tokens"] == [0, 1]
+
+
+def test_split_segments_unclosed_tail_ends_at_window_end():
+    result = _result([_ts(0.0), 0, _ts(1.0), _ts(27.0), 1, 2])
+    segments = _split_segments(result, _Tokenizer(), 0.0, 28.0, TIME_PRECISION)
+    assert [(s["start"], s["end"], s["text"]) for s in segments] == [(0.0, 1.0, "a"), (27.0, 28.0, "bc")]
+
+
+def test_split_segments_clamps_end_to_duration():
+    result = _result([_ts(4.0), 0, _ts(12.0)])
+    segments = _split_segments(result, _Tokenizer(), 10.0, 5.0, TIME_PRECISION)
+    assert (segments[0]["start"], segments[0]["end"]) == (14.0, 15.0)
+
+
+def test_short_clips_are_not_split():
+    assert split_windows([(0.0, 10.0), (40.0, 60.0)]) == [(0.0, 10.0), (40.0, 60.0)]
+
+
+def test_long_clip_windows_overlap():
+    windows = split_windows([(0.0, 70.0)], overlap=2.0)
+    assert windows == [(0.0, 30.0), (28.0, 58.0), (56.0, 70.0)]
+    assert all(end - start <= WINDOW_SECONDS for start, end in windows)
+
+
+def test_zero_overlap_cuts_back_to_back():
+    assert split_windows([(0.0, 60.0)], overlap=0.0) == [(0.0, 30.0), (30.0, 60.0)]
+
+
+def test_pack_merges_clips_within_one_window():
+    assert split_windows([(0.0, 5.0), (10.0, 20.0), (25.0, 40.0)], pack=True) == [(0.0, 20.0), (25.0, 40.0)]
+
+
+def test_overlap_keeps_one_copy_of_repeated_segments():
+    windows = [(0.0, 30.0), (28.0, 58.0)]
+    results = [
+        [_segment(0.0, 5.0, "head"), _segment(28.2, 28.8, "dup")],
+        [_segment(28.2, 28.8, "dup"), _segment(40.0, 45.0, "tail")],
+    ]
+    assert [s["text"] for s in _owned_segments(windows, results)] == ["head", "dup", "tail"]
+
+
+def test_keyword_cut_at_boundary_comes_from_next_window():
+    windows = [(0.0, 30.0), (28.0, 58.0)]
+    results = [
+        [_segment(0.0, 5.0, "head"), _segment(29.2, 30.0, "人工智")],
+        [_segment(29.2, 30.8, "人工智能生成")],
+    ]
+    assert [s["text"] for s in _owned_segments(windows, results)] == ["head", "人工智能生成"]
+
+
+def test_separate_windows_keep_all_segments():
+    windows = [(0.0, 10.0), (10.0, 20.0)]
+    results = [[_segment(8.0, 10.0, "a")], [_segment(10.0, 11.0, "b")]]
+    assert [s["text"] for s in _owned_segments(windows, results)] == ["a", "b"]
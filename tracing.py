@@ -0,0 +1,125 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+# 耗时直方图的桶上界（秒），最后一个桶收集超出上界的样本
+HISTOGRAM_BOUNDS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("seal_trace", default=None)
+
+
+class Trace:
+    """
+    一次请求内各阶段的耗时记录。同名阶段多次出现时累加耗时与次数。
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}
+        self.order: List[str] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = [0.0, 0]
+            self.order.append(name)
+        stage[0] += seconds
+        stage[1] += 1
+
+    def summary(self) -> dict:
+        return {
+            "total": round(time.perf_counter() - self.started, 4),
+            "stages": {
+                name: {"seconds": round(self.stages[name][0], 4), "count": self.stages[name][1]}
+                for name in self.order
+            },
+        }
+
+
+@contextmanager
+def trace():
+    """
+    在当前上下文开始记录阶段耗时，退出后恢复外层记录。嵌套调用时内层使用独立的 Trace。
+    """
+    current = Trace()
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str):
+    """
+    记录一个阶段的耗时。不在 trace() 内时不做任何记录，开销只有一次上下文变量查询。
+
+    阶段名按 "类别.步骤" 命名，如 io.upload、model.load、ocr.edge、decode.frames、encode.video。
+    """
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.add(name, time.perf_counter() - started)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else 0.0,
+            "max": round(self.max, 4),
+            "buckets": {
+                (f"le_{bound}" if i < len(HISTOGRAM_BOUNDS) else "inf"): n
+                for i, (bound, n) in enumerate(zip(HISTOGRAM_BOUNDS + (None,), self.buckets))
+            },
+        }
+
+
+class StageHistograms:
+    """
+    按 (方法, 阶段) 聚合的耗时直方图，阶段 "total" 为整个请求的耗时。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[str, _Histogram]] = {}
+
+    def record(self, method: str, current: Trace) -> None:
+        summary = current.summary()
+        with self._lock:
+            stages = self._histograms.setdefault(method, {})
+            stages.setdefault("total", _Histogram()).observe(summary["total"])
+            for name, stage in summary["stages"].items():
+                stages.setdefault(name, _Histogram()).observe(stage["seconds"])
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                method: {name: histogram.to_dict() for name, histogram in stages.items()}
+                for method, stages in self._histograms.items()
+            }
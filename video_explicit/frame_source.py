@@ -0,0 +1,122 @@
+import threading
+from fractions import Fraction
+from typing import Iterator, Optional, Tuple
+import cv2
+import ffmpeg
+import numpy as np
+
+
+def get_frame_size(probe: dict) -> Tuple[int, int]:
+    """
+    从 ffprobe 结果中获取解码后帧的 (宽, 高)，考虑旋转元数据（ffmpeg 默认会自动旋转）。
+    """
+    video_stream = next((s for s in probe["streams"] if s["codec_type"] == "video"), None)
+    if video_stream is None:
+        raise ValueError("未找到视频流")
+    width = int(video_stream["width"])
+    height = int(video_stream["height"])
+
+    rotation = video_stream.get("tags", {}).get("rotate")
+    for side_data in video_stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            rotation = side_data["rotation"]
+    if rotation is not None and abs(int(float(rotation))) % 180 == 90:
+        width, height = height, width
+    return width, height
+
+
+def iter_frames(video_path: str, interval: float, start: float = 0.0, end: Optional[float] = None,
+                probe: Optional[dict] = None) -> Iterator[Tuple[float, np.ndarray]]:
+    """
+    只启动一个 ffmpeg 进程顺序解码视频，通过 fps 滤镜按固定间隔抽帧，
+    以 BGR 原始像素经管道读入内存，不落盘、不做 JPEG 编解码。
+
+    参数:
+        video_path: 视频文件路径
+        interval: 抽帧间隔（秒）
+        start: 起始时间（秒）
+        end: 结束时间（秒），None 表示到视频结尾
+        probe: 已有的 ffmpeg.probe 结果，避免重复探测
+
+    返回:
+        迭代器，每项为 (帧时间, BGR 图像 numpy 数组)
+
+    异常:
+        ffmpeg.Error: 读完全部帧后 ffmpeg 以非零状态退出（文件损坏、格式不支持等），stderr 为其错误输出
+    """
+    if probe is None:
+        probe = ffmpeg.probe(video_path)
+    width, height = get_frame_size(probe)
+    frame_bytes = width * height * 3
+
+    input_kwargs = {}
+    if start > 0:
+        input_kwargs["ss"] = start
+    if end is not None:
+        input_kwargs["t"] = max(0.0, end - start)
+    rate = str(Fraction(1 / interval).limit_denominator(1000))
+
+    process = (
+        ffmpeg
+        .input(video_path, **input_kwargs)
+        .filter("fps", fps=rate)
+        .output("pipe:", format="rawvideo", pix_fmt="bgr24")
+        .global_args("-nostdin", "-loglevel", "error")
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+    # stderr 在后台线程中读取，避免错误输出填满管道后 ffmpeg 阻塞
+    stderr_chunks = []
+    stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()), daemon=True)
+    stderr_reader.start()
+    finished = False
+    try:
+        index = 0
+        while True:
+            buffer = process.stdout.read(frame_bytes)
+            if len(buffer) < frame_bytes:
+                break
+            frame = np.frombuffer(buffer, np.uint8).reshape(height, width, 3)
+            yield round(start + index * interval, 3), frame
+            index += 1
+        finished = True
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        stderr_reader.join()
+        process.stderr.close()
+    # 调用方提前停止迭代时 ffmpeg 被终止，返回码不代表出错；只检查读到输出末尾的情况
+    if finished and process.returncode != 0:
+        raise ffmpeg.Error("ffmpeg", b"", b"".join(stderr_chunks))
+
+
+class FrameReader:
+    """
+    按时间点随机读取单帧。视频只打开一次，多次读取之间复用同一个解码器。
+    每次读取都从目标时间之前的关键帧开始解码，reads 只统计读取次数，实际解码的帧数更多。
+    """
+
+    def __init__(self, video_path: str):
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise ValueError(f"无法打开视频: {video_path}")
+        self.reads = 0
+
+    def read_at(self, t: float) -> Optional[np.ndarray]:
+        """
+        读取时间点 t（秒）处的 BGR 帧，读取失败时返回 None。
+        """
+        self.cap.set(cv2.CAP_PROP_POS_MSEC, t * 1000)
+        ok, frame = self.cap.read()
+        self.reads += 1
+        return frame if ok else None
+
+    def close(self) -> None:
+        self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
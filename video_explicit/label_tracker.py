@@ -0,0 +1,81 @@
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+
+# 归一化互相关得分不低于该值时认为标识仍在原位置
+MATCH_THRESHOLD = 0.8
+# 匹配时在标识框四周额外搜索的像素范围，容忍编码抖动带来的轻微位移
+SEARCH_MARGIN = 8
+# 模板灰度标准差过小（纯色块）时无法可靠匹配，不进行跟踪
+MIN_TEMPLATE_STD = 5.0
+
+
+class LabelTracker:
+    """
+    静态叠加标识跟踪器。
+
+    烧录在画面上的显式标识在其持续时间内位置和外观不变，因此只需在某一帧 OCR 定位标识，
+    之后的采样帧用标识区域的模板做归一化互相关匹配来确认标识仍然存在；
+    匹配得分下降时才需要重新 OCR。
+    """
+
+    def __init__(self, threshold: float = MATCH_THRESHOLD, search_margin: int = SEARCH_MARGIN):
+        self.threshold = threshold
+        self.search_margin = search_margin
+        self.template: Optional[np.ndarray] = None
+        self.box: Optional[Tuple[int, int, int, int]] = None
+        self.match_count = 0
+        self.miss_count = 0
+
+    def reset(self) -> None:
+        """
+        丢弃当前模板，下一帧需要重新 OCR。
+        """
+        self.template = None
+        self.box = None
+
+    def update(self, image: np.ndarray, box: Tuple[float, float, float, float]) -> None:
+        """
+        用 OCR 定位到的标识框 (x_min, y_min, x_max, y_max) 截取新的模板。
+        """
+        height, width = image.shape[:2]
+        x0 = max(0, int(box[0]))
+        y0 = max(0, int(box[1]))
+        x1 = min(width, int(round(box[2])))
+        y1 = min(height, int(round(box[3])))
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            self.reset()
+            return
+
+        template = cv2.cvtColor(image[y0:y1, x0:x1], cv2.COLOR_BGR2GRAY)
+        if float(template.std()) < MIN_TEMPLATE_STD:
+            self.reset()
+            return
+        self.template = template
+        self.box = (x0, y0, x1, y1)
+
+    def confirm(self, image: np.ndarray) -> bool:
+        """
+        判断当前帧中标识是否仍在原位置。没有模板或匹配得分低于阈值时返回 False。
+        """
+        if self.template is None:
+            return False
+
+        height, width = image.shape[:2]
+        x0, y0, x1, y1 = self.box
+        sx0 = max(0, x0 - self.search_margin)
+        sy0 = max(0, y0 - self.search_margin)
+        sx1 = min(width, x1 + self.search_margin)
+        sy1 = min(height, y1 + self.search_margin)
+        search = cv2.cvtColor(image[sy0:sy1, sx0:sx1], cv2.COLOR_BGR2GRAY)
+        if search.shape[0] < self.template.shape[0] or search.shape[1] < self.template.shape[1]:
+            self.miss_count += 1
+            return False
+
+        scores = cv2.matchTemplate(search, self.template, cv2.TM_CCOEFF_NORMED)
+        score = float(np.nan_to_num(scores).max())
+        if score >= self.threshold:
+            self.match_count += 1
+            return True
+        self.miss_count += 1
+        return False
@@ -0,0 +1,254 @@
+import csv
+import os
+import tempfile
+from typing import Dict, List, Tuple
+import ffmpeg
+
+# 源视频编码 -> 重编码片段使用的编码器；不在表中的编码回退为整段重编码
+ENCODER_MAP = {
+    "h264": "libx264",
+    "hevc": "libx265",
+    "mpeg4": "mpeg4",
+    "vp9": "libvpx-vp9",
+}
+
+# 重编码片段使用闭合 GOP，保证片段首帧之后的帧不参考前一个片段
+ENCODER_ARGS = {
+    "libx264": {"x264-params": "open-gop=0"},
+    "libx265": {"x265-params": "open-gop=0"},
+    "mpeg4": {"flags": "+cgop"},
+    "libvpx-vp9": {},
+}
+
+# ffprobe 报告的 H.264/HEVC profile -> 编码器 profile 参数
+PROFILE_MAP = {
+    "constrained baseline": "baseline",
+    "baseline": "baseline",
+    "main": "main",
+    "high": "high",
+    "high 10": "high10",
+    "high 4:2:2": "high422",
+    "high 4:4:4 predictive": "high444",
+    "main 10": "main10",
+}
+
+# MP4/MOV 中允许码流内携带参数集的样本条目：重编码片段的 SPS/PPS 与直接复制的片段不同，
+# 按 avc1/hvc1 封装时参数集只能来自文件头，播放器可能用错参数集解码重编码片段
+IN_BAND_TAGS = {
+    "h264": "avc3",
+    "hevc": "hev1",
+}
+MP4_EXTENSIONS = (".mp4", ".m4v", ".mov")
+
+# 切分时间提前的量（秒），避免浮点误差使切点落到下一个关键帧
+CUT_EPSILON = 0.001
+
+
+def video_packets(video_path: str) -> List[Tuple[float, bool]]:
+    """
+    按解码顺序读取视频流每个包的显示时间戳（秒）与关键帧标记，只解析包头，不解码画面。
+    """
+    probe = ffmpeg.probe(
+        video_path,
+        select_streams="v:0",
+        show_entries="packet=pts_time,dts_time,flags",
+    )
+    packets = []
+    for packet in probe.get("packets", []):
+        value = packet.get("pts_time")
+        if value in (None, "N/A"):
+            value = packet.get("dts_time")
+        if value in (None, "N/A"):
+            continue
+        packets.append((float(value), "K" in packet.get("flags", "")))
+    return packets
+
+
+def keyframe_times(packets: List[Tuple[float, bool]]) -> List[float]:
+    """关键帧的时间戳（秒），升序去重"""
+    return sorted({pts for pts, key in packets if key})
+
+
+def has_open_gop(packets: List[Tuple[float, bool]]) -> bool:
+    """
+    是否存在开放 GOP：关键帧之后（解码顺序）出现显示时间早于该关键帧的帧，
+    这些前导帧参考上一个 GOP，在关键帧处切开后与重编码片段拼接会解码出错。
+    """
+    key_pts = None
+    for pts, key in packets:
+        if key:
+            key_pts = pts
+        elif key_pts is not None and pts < key_pts:
+            return True
+    return False
+
+
+def plan_cuts(keyframes: List[float], windows: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """
+    把每个标识时间窗扩展到包住它的 GOP 边界：起点取窗口前最近的关键帧，终点取窗口后最近的关键帧，
+    重叠或相接的区间合并。
+
+    返回:
+        需要重编码的区间 [(开始关键帧时间, 结束关键帧时间或 None 表示到结尾), ...]
+    """
+    spans = []
+    for start, end in sorted(windows):
+        seg_start = max([k for k in keyframes if k <= start], default=0.0)
+        seg_end = min([k for k in keyframes if k >= end], default=None)
+        if spans and (spans[-1][1] is None or seg_start <= spans[-1][1]):
+            prev_start, prev_end = spans[-1]
+            merged_end = None if prev_end is None or seg_end is None else max(prev_end, seg_end)
+            spans[-1] = (prev_start, merged_end)
+        else:
+            spans.append((seg_start, seg_end))
+    return spans
+
+
+def encoder_args(encoder: str, video_stream: Dict) -> Dict:
+    """
+    重编码片段的编码参数：闭合 GOP，码率、像素格式与 H.264/HEVC 的 profile、level 与源视频一致，
+    使拼接后各片段的参数集兼容。
+    """
+    args = {"c:v": encoder, "f": "mpegts"}
+    args.update(ENCODER_ARGS.get(encoder, {}))
+    if video_stream.get("pix_fmt"):
+        args["pix_fmt"] = video_stream["pix_fmt"]
+    if video_stream.get("bit_rate"):
+        args["b:v"] = video_stream["bit_rate"]
+
+    profile = PROFILE_MAP.get(str(video_stream.get("profile", "")).lower())
+    level = video_stream.get("level")
+    if encoder == "libx264":
+        if profile:
+            args["profile:v"] = profile
+        if isinstance(level, int) and level > 0:
+            args["level"] = f"{level / 10:.1f}"
+    elif encoder == "libx265":
+        params = [args["x265-params"]]
+        if profile:
+            params.append(f"profile={profile}")
+        if isinstance(level, int) and level > 0:
+            # HEVC 的 level 在 ffprobe 中为 level_idc * 3
+            params.append(f"level-idc={level / 30:.1f}")
+        args["x265-params"] = ":".join(params)
+    return args
+
+
+def embed_segments(video_path: str, result_path: str, drawtext_args_base: Dict,
+                   windows: List[Tuple[float, float]], video_stream: Dict, start_time: float = 0.0) -> None:
+    """
+    只重编码包含标识的 GOP 片段，其余片段直接复制码流，最后无损拼接并复制原音轨。
+
+    流程:
+        1. 用 segment 复用器在关键帧处把视频流切成 MPEG-TS 片段（-c copy，一次读完）
+        2. 与标识时间窗重叠的片段用与源视频相同的编码器叠加 drawtext 重编码
+        3. concat 拼接所有片段，并从原文件复制音轨封装到输出文件
+    重编码片段使用闭合 GOP 并与源视频的 profile、level 一致；源视频为开放 GOP 时不能在关键帧处
+    无损切开，直接抛出 ValueError 由调用方回退为整段重编码。输出为 MP4/MOV 且有片段重编码时，
+    H.264/HEVC 按 avc3/hev1 封装，各片段的参数集随码流携带。
+
+    各片段的时间偏移取自切点关键帧的显示时间，而不是 segment 复用器的片段列表：
+    后者的时间包含源视频的起始/B 帧延迟（如关键帧 4.0 秒报告为 4.08 秒）。
+
+    参数:
+        video_path: 原始视频路径
+        result_path: 输出视频路径
+        drawtext_args_base: drawtext 滤镜参数（不含 enable）
+        windows: 标识时间窗 [(开始时间, 结束时间), ...]
+        video_stream: ffprobe 得到的视频流信息
+        start_time: 源视频的起始时间（ffprobe format.start_time），标识时间窗相对于该时间
+
+    异常:
+        ValueError: 源视频编码不支持片段重编码、为开放 GOP、找不到关键帧，或切分结果与关键帧不一致
+        ffmpeg.Error: ffmpeg 执行失败（stderr 中为 ffmpeg 的错误输出）
+    """
+    encoder = ENCODER_MAP.get(video_stream.get("codec_name"))
+    if encoder is None:
+        raise ValueError(f"不支持片段重编码的视频编码: {video_stream.get('codec_name')}")
+    packets = video_packets(video_path)
+    # 关键帧时间换算到与标识时间窗相同的时间轴（从视频起始时间算起）
+    keyframes = [t - start_time for t in keyframe_times(packets)]
+    if not keyframes:
+        raise ValueError("未找到关键帧")
+    if has_open_gop(packets):
+        raise ValueError("源视频为开放 GOP，不能按关键帧切分拼接")
+
+    spans = plan_cuts(keyframes, windows)
+    cut_times = sorted({t for span in spans for t in span if t is not None and t > keyframes[0]})
+    # 第 i 个片段从 bounds[i] 处的关键帧开始；闭合 GOP 中关键帧最先显示，片段内 t=0 即该关键帧
+    bounds = [keyframes[0]] + cut_times
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 1. 在关键帧处切分视频流
+        segment_list = os.path.join(work_dir, "segments.csv")
+        segment_args = {
+            "c": "copy",
+            "map": "0:v:0",
+            "f": "segment",
+            "segment_format": "mpegts",
+            "segment_list": segment_list,
+            "segment_list_type": "csv",
+            "reset_timestamps": 1,
+        }
+        if cut_times:
+            segment_args["segment_times"] = ",".join(f"{max(0.0, t - CUT_EPSILON):.3f}" for t in cut_times)
+        else:
+            # 没有切点时只生成一个片段
+            segment_args["segment_time"] = 1e9
+        (
+            ffmpeg
+            .input(video_path)
+            .output(os.path.join(work_dir, "seg%05d.ts"), **segment_args)
+            .global_args("-nostdin", "-loglevel", "error")
+            .run(overwrite_output=True, capture_stderr=True)
+        )
+
+        with open(segment_list, newline="") as f:
+            names = [row[0] for row in csv.reader(f) if row]
+        if len(names) != len(bounds):
+            raise ValueError(f"关键帧切分得到 {len(names)} 个片段，预期 {len(bounds)} 个")
+
+        # 2. 只重编码与标识时间窗重叠的片段
+        output_args = encoder_args(encoder, video_stream)
+
+        concat_lines = []
+        reencoded = False
+        for i, name in enumerate(names):
+            seg_path = os.path.join(work_dir, name)
+            seg_start = bounds[i]
+            seg_end = bounds[i + 1] if i + 1 < len(bounds) else float("inf")
+            overlaps = [(st, et) for st, et in windows if st < seg_end and et > seg_start]
+            if overlaps:
+                stream = ffmpeg.input(seg_path)
+                for st, et in overlaps:
+                    drawtext_args = drawtext_args_base.copy()
+                    drawtext_args["enable"] = f"between(t,{st - seg_start:.3f},{et - seg_start:.3f})"
+                    stream = stream.drawtext(**drawtext_args)
+                encoded_path = os.path.join(work_dir, "enc_" + name)
+                (
+                    stream
+                    .output(encoded_path, **output_args)
+                    .global_args("-nostdin", "-loglevel", "error")
+                    .run(overwrite_output=True, capture_stderr=True)
+                )
+                seg_path = encoded_path
+                reencoded = True
+            concat_lines.append("file '{}'".format(seg_path.replace("'", "'\\''")))
+
+        concat_list = os.path.join(work_dir, "concat.txt")
+        with open(concat_list, "w") as f:
+            f.write("\n".join(concat_lines) + "\n")
+
+        # 3. 拼接视频片段并复制原音轨
+        mux_args = {"c": "copy"}
+        tag = IN_BAND_TAGS.get(video_stream.get("codec_name"))
+        if reencoded and tag and result_path.lower().endswith(MP4_EXTENSIONS):
+            mux_args["tag:v"] = tag
+        video = ffmpeg.input(concat_list, f="concat", safe=0)
+        original = ffmpeg.input(video_path)
+        (
+            ffmpeg
+            .output(video["v"], original["a?"], result_path, **mux_args)
+            .global_args("-nostdin", "-loglevel", "error")
+            .run(overwrite_output=True, capture_stderr=True)
+        )
@@ -1,8 +1,14 @@
 import os
 import json
-import cv2
 import ffmpeg
-import easyocr
+from image_detection.ocr_reader import readtext
+from .frame_source import iter_frames, FrameReader
+from .label_tracker import LabelTracker
+from .segment_embed import embed_segments
+from tracing import span
+
+# 嵌入模式："segment" 只重编码标识所在的 GOP 片段；"full" 整段重编码
+EMBED_MODE = os.getenv("VIDEO_EMBED_MODE", "segment")
 
 def EmbedVideoExplicitLabel(OriginalVideoPath: str, ResultFilePath: str, ExplicitLabel: dict) -> str:
     try:
@@ -46,7 +52,8 @@ def EmbedVideoExplicitLabel(OriginalVideoPath: str, ResultFilePath: str, Explici
         fontcolor = f"#{r:02x}{g:02x}{b:02x}{a:02x}"
 
         # 获取视频信息
-        probe = ffmpeg.probe(OriginalVideoPath)
+        with span("probe"):
+            probe = ffmpeg.probe(OriginalVideoPath)
         video_stream = next((s for s in probe["streams"] if s["codec_type"] == "video"), None)
         if video_stream is None:
             return json.dumps({"status": -1, "result": "未找到视频流"})
@@ -96,6 +103,22 @@ def EmbedVideoExplicitLabel(OriginalVideoPath: str, ResultFilePath: str, Explici
             "alpha": "1"
         }
 
+        # 只重编码包含标识的 GOP 片段，其余片段直接复制；源编码不支持或切分失败时回退为整段重编码
+        if EMBED_MODE == "segment":
+            windows = [(st, st + duration) for st in start_time]
+            try:
+                with span("encode.segments"):
+                    embed_segments(OriginalVideoPath, ResultFilePath, drawtext_args_base, windows, video_stream,
+                                   float(probe["format"].get("start_time", 0.0)))
+                return json.dumps({"status": 1, "result": "嵌入成功"}, ensure_ascii=False)
+            except ValueError as e:
+                # 源视频不适合片段重编码（编码不支持、开放 GOP 等），属预期情况
+                print(f"片段重编码不可用，改为整段重编码: {e}")
+            except ffmpeg.Error as e:
+                # ffmpeg 执行失败，说明片段重编码本身出了问题，记录 ffmpeg 的错误输出便于排查
+                stderr = e.stderr.decode("utf-8", "replace").strip() if e.stderr else ""
+                print(f"片段重编码失败，改为整段重编码: {e}\n{stderr}")
+
         video_input = ffmpeg.input(OriginalVideoPath)
         video_output = video_input
 
@@ -121,7 +144,8 @@ def EmbedVideoExplicitLabel(OriginalVideoPath: str, ResultFilePath: str, Explici
             **output_args
         )
 
-        ffmpeg.run(stream, overwrite_output=True)
+        with span("encode.video"):
+            ffmpeg.run(stream, overwrite_output=True)
 
         return json.dumps({"status": 1, "result": "嵌入成功"}, ensure_ascii=False)
 
@@ -133,6 +157,202 @@ def EmbedVideoExplicitLabel(OriginalVideoPath: str, ResultFilePath: str, Explici
 
 
 
+EXPECTED_KEYWORDS = ['AI合成', 'AI生成', '人工智能合成', '人工智能生成']
+
+# 采样模式："adaptive" 由粗到细覆盖整段视频；"uniform" 仅在视频开头均匀采样
+SAMPLE_MODE = os.getenv("VIDEO_SAMPLE_MODE", "adaptive")
+# 粗扫描步长（秒），即保证能检测到的最短标识持续时间：二分只在相邻探测结果不同的区间内进行，
+# 短于步长的标识可能落在两个探测点之间而漏检。粗扫描顺序解码，步长变小只增加识别次数，不增加解码量
+COARSE_STRIDE = float(os.getenv("VIDEO_COARSE_STRIDE", "0.5"))
+# 标识开始时间与持续时间的精度（秒）
+TIME_PRECISION = 0.1
+UNIFORM_INTERVAL = 0.2  # 每0.2秒抽一帧
+UNIFORM_MAX_SEC = 10  # 最多采样前10秒
+
+
+def _ocr_label(image):
+    """
+    对一帧做 OCR，返回 (标识文字, 标识框 (x_min, y_min, x_max, y_max))；未找到标识时框为 None。
+    """
+    height, width = image.shape[:2]
+    frame_text = ''
+    x_min, y_min, x_max, y_max = width, height, 0, 0
+    found = False
+
+    with span("ocr.frame"):
+        results = readtext(image)
+    for (bbox, text, conf) in results:
+        if conf > 0.6 and text.strip():
+            if any(kw in text for kw in EXPECTED_KEYWORDS):
+                frame_text += text.strip()
+                for (x, y) in bbox:
+                    x_min = min(x_min, x)
+                    y_min = min(y_min, y)
+                    x_max = max(x_max, x)
+                    y_max = max(y_max, y)
+                found = True
+
+    return frame_text, ((x_min, y_min, x_max, y_max) if found else None)
+
+
+def _position_mode(box, width, height):
+    """
+    根据标识框中心点所在位置判断 PositionMode，无法归类时返回 0。
+    """
+    x_min, y_min, x_max, y_max = box
+    center_x = (x_min + x_max) / 2
+    center_y = (y_min + y_max) / 2
+    x_pct = center_x / width
+    y_pct = center_y / height
+    margin = 0.1
+
+    def near(val, target):
+        return abs(val - target) <= margin
+
+    pos_mode = 0
+    if near(x_pct, 0.9) and near(y_pct, 0.9):
+        pos_mode = 1
+    elif near(x_pct, 0.1) and near(y_pct, 0.9):
+        pos_mode = 2
+    elif near(x_pct, 0.9) and near(y_pct, 0.1):
+        pos_mode = 3
+    elif near(x_pct, 0.1) and near(y_pct, 0.1):
+        pos_mode = 4
+    elif near(y_pct, 0.9) and near(x_pct, 0.5):
+        pos_mode = -1
+    elif near(y_pct, 0.1) and near(x_pct, 0.5):
+        pos_mode = -2
+    elif near(x_pct, 0.1) and near(y_pct, 0.5):
+        pos_mode = -3
+    elif near(x_pct, 0.9) and near(y_pct, 0.5):
+        pos_mode = -4
+    return pos_mode
+
+
+class _LabelDetector:
+    """
+    判断单帧中是否存在显式标识，并记录首次 OCR 命中时的标识内容、位置和尺寸。
+    标识在持续时间内静止不变：OCR 定位后用模板匹配确认，匹配失败时才重新 OCR。
+    """
+
+    def __init__(self):
+        self.tracker = LabelTracker()
+        self.text = ""
+        self.pos = None
+        self.scale = None
+
+    def check(self, image) -> bool:
+        with span("track.confirm"):
+            confirmed = self.tracker.confirm(image)
+        if confirmed:
+            return True
+
+        frame_text, box = _ocr_label(image)
+        if box is None:
+            self.tracker.reset()
+            return False
+
+        self.tracker.update(image, box)
+        if not self.text:
+            height, width = image.shape[:2]
+            self.text = frame_text
+            self.pos = _position_mode(box, width, height)
+            self.scale = (box[3] - box[1]) / min(height, width)
+        return True
+
+
+def _scan_uniform(video_path, duration, probe, detector):
+    """
+    均匀采样：在视频前 UNIFORM_MAX_SEC 秒内每 UNIFORM_INTERVAL 秒抽一帧。
+
+    返回:
+        ([(开始时间, 结束时间), ...], 探测帧数)
+    """
+    detected_times = []
+    probed_frames = 0
+    max_sample_sec = min(duration, UNIFORM_MAX_SEC)
+
+    # 单个 ffmpeg 进程顺序解码，按采样间隔把原始帧经管道读入内存
+    for t, image in iter_frames(video_path, UNIFORM_INTERVAL, end=max_sample_sec, probe=probe):
+        probed_frames += 1
+        if detector.check(image):
+            detected_times.append(round(t, 1))  # 秒保留1位小数
+
+    if not detected_times:
+        return [], probed_frames
+
+    detected_times.sort()
+    time_groups = []
+    current_group = [detected_times[0]]
+
+    for i in range(1, len(detected_times)):
+        if abs(detected_times[i] - detected_times[i - 1]) <= 0.3:
+            current_group.append(detected_times[i])
+        else:
+            time_groups.append(current_group)
+            current_group = [detected_times[i]]
+    time_groups.append(current_group)
+
+    return [(g[0], g[-1] + UNIFORM_INTERVAL) for g in time_groups], probed_frames
+
+
+def _scan_adaptive(video_path, duration, probe, detector):
+    """
+    由粗到细的时间搜索：先以 COARSE_STRIDE 为步长覆盖整段视频，
+    再在相邻两次探测结果不同（标识出现/消失）的区间内二分，直到精度达到 TIME_PRECISION。
+
+    粗扫描用单个 ffmpeg 进程顺序解码抽帧（每帧只解码一次）；二分阶段的探测点稀疏，按时间点随机读取。
+
+    返回:
+        ([(开始时间, 结束时间), ...], 探测帧数)
+    """
+    with FrameReader(video_path) as reader:
+        cache = {}
+
+        def present(t):
+            t = round(t, 3)
+            if t not in cache:
+                with span("decode.frame"):
+                    image = reader.read_at(t)
+                cache[t] = image is not None and detector.check(image)
+            return cache[t]
+
+        points = []
+        with span("decode.frames"):
+            for t, image in iter_frames(video_path, COARSE_STRIDE, end=duration, probe=probe):
+                points.append(t)
+                cache[t] = detector.check(image)
+        # 最后一个探测点取在视频末尾之前，保证能读到帧
+        last = max(0.0, duration - TIME_PRECISION)
+        if not points or last - points[-1] > TIME_PRECISION / 2:
+            points.append(last)
+
+        states = [present(t) for t in points]
+        segments = []
+        start = 0.0 if states[0] else None
+
+        for (t0, s0), (t1, s1) in zip(zip(points, states), zip(points[1:], states[1:])):
+            if s0 == s1:
+                continue
+            lo, hi = t0, t1
+            while hi - lo > TIME_PRECISION:
+                mid = (lo + hi) / 2
+                if present(mid) == s0:
+                    lo = mid
+                else:
+                    hi = mid
+            if s1:
+                start = hi  # 标识出现：hi 为首个出现时刻
+            else:
+                segments.append((start, hi))  # 标识消失：hi 为首个消失时刻
+                start = None
+
+        if start is not None:
+            segments.append((start, duration))
+
+        return segments, len(cache)
+
+
 def DetectVideoExplicitLabel(OriginalVideoPath: str) -> str:
     try:
         if not os.path.exists(OriginalVideoPath):
@@ -140,104 +360,25 @@ def DetectVideoExplicitLabel(OriginalVideoPath: str) -> str:
 
         # 获取视频总时长`
         try:
-            probe = ffmpeg.probe(OriginalVideoPath)
+            with span("probe"):
+                probe = ffmpeg.probe(OriginalVideoPath)
             duration = float(probe["format"]["duration"])
         except Exception as e:
             return json.dumps({"status": -2, "result": f"获取视频信息失败: {str(e)}", "ExplicitLabel": []}, ensure_ascii=False)
 
-        reader = easyocr.Reader(['ch_sim', 'en'], gpu=False)
-        expected_keywords = ['AI合成', 'AI生成', '人工智能合成', '人工智能生成']
-
-        detected_times = []
-        detected_text = ""
-        detected_pos = None
-        detected_scale = None
+        detector = _LabelDetector()
+        if SAMPLE_MODE == "uniform":
+            segments, probed_frames = _scan_uniform(OriginalVideoPath, duration, probe, detector)
+        else:
+            segments, probed_frames = _scan_adaptive(OriginalVideoPath, duration, probe, detector)
 
-        sample_interval = 0.2  # 每0.2秒抽一帧
-        max_sample_sec = min(duration, 10)  # 最多采样前10秒
-
-        t = 0.0
-        while t < max_sample_sec:
-            temp_frame_path = f"temp_frame_{int(t*100):04d}.jpg"
-            try:
-                (
-                    ffmpeg
-                    .input(OriginalVideoPath, ss=t)
-                    .output(temp_frame_path, vframes=1)
-                    .overwrite_output()
-                    .run(capture_stdout=True, capture_stderr=True)
-                )
-            except ffmpeg.Error:
-                t += sample_interval
-                continue
-
-            if not os.path.exists(temp_frame_path):
-                t += sample_interval
-                continue
-
-            image = cv2.imread(temp_frame_path)
-            os.remove(temp_frame_path)
-            if image is None:
-                t += sample_interval
-                continue
-
-            height, width = image.shape[:2]
-            min_dim = min(height, width)
-
-            results = reader.readtext(image)
-            frame_text = ''
-            x_min, y_min, x_max, y_max = width, height, 0, 0
-            found = False
-
-            for (bbox, text, conf) in results:
-                if conf > 0.6 and text.strip():
-                    if any(kw in text for kw in expected_keywords):
-                        frame_text += text.strip()
-                        for (x, y) in bbox:
-                            x_min = min(x_min, x)
-                            y_min = min(y_min, y)
-                            x_max = max(x_max, x)
-                            y_max = max(y_max, y)
-                        found = True
-
-            if found:
-                detected_times.append(round(t, 1))  # 秒保留1位小数
-                if not detected_text:
-                    detected_text = frame_text
-                    center_x = (x_min + x_max) / 2
-                    center_y = (y_min + y_max) / 2
-                    x_pct = center_x / width
-                    y_pct = center_y / height
-                    margin = 0.1
-
-                    def near(val, target):
-                        return abs(val - target) <= margin
-
-                    pos_mode = 0
-                    if near(x_pct, 0.9) and near(y_pct, 0.9):
-                        pos_mode = 1
-                    elif near(x_pct, 0.1) and near(y_pct, 0.9):
-                        pos_mode = 2
-                    elif near(x_pct, 0.9) and near(y_pct, 0.1):
-                        pos_mode = 3
-                    elif near(x_pct, 0.1) and near(y_pct, 0.1):
-                        pos_mode = 4
-                    elif near(y_pct, 0.9) and near(x_pct, 0.5):
-                        pos_mode = -1
-                    elif near(y_pct, 0.1) and near(x_pct, 0.5):
-                        pos_mode = -2
-                    elif near(x_pct, 0.1) and near(y_pct, 0.5):
-                        pos_mode = -3
-                    elif near(x_pct, 0.9) and near(y_pct, 0.5):
-                        pos_mode = -4
-                    detected_pos = pos_mode
-                    detected_scale = (y_max - y_min) / min_dim
-
-            t += sample_interval
-
-        if not detected_times:
-            return json.dumps({"status": -1, "result": "未检测到明显水印文字", "ExplicitLabel": []}, ensure_ascii=False)
+        if not segments:
+            return json.dumps({"status": -1, "result": "未检测到明显水印文字", "ExplicitLabel": [],
+                               "ProbedFrames": probed_frames}, ensure_ascii=False)
 
+        detected_text = detector.text
+        detected_pos = detector.pos
+        detected_scale = detector.scale
         if detected_text is None:
             detected_text = ""
         if detected_pos is None:
@@ -245,25 +386,13 @@ def DetectVideoExplicitLabel(OriginalVideoPath: str) -> str:
         if detected_scale is None:
             detected_scale = 0.0
 
-        content_valid = any(kw in detected_text for kw in expected_keywords)
+        content_valid = any(kw in detected_text for kw in EXPECTED_KEYWORDS)
         position_valid = detected_pos in [1, 2, 3, 4, -1, -2, -3, -4]
         scale_valid = detected_scale >= 0.05
         text_scale = float(round(detected_scale, 4))
 
-        detected_times.sort()
-        time_groups = []
-        current_group = [detected_times[0]]
-
-        for i in range(1, len(detected_times)):
-            if abs(detected_times[i] - detected_times[i - 1]) <= 0.3:
-                current_group.append(detected_times[i])
-            else:
-                time_groups.append(current_group)
-                current_group = [detected_times[i]]
-        time_groups.append(current_group)
-
-        start_times = [round(g[0], 1) for g in time_groups]
-        max_duration = max([round(g[-1] - g[0] + sample_interval, 1) for g in time_groups])
+        start_times = [round(start, 1) for start, _ in segments]
+        max_duration = max([round(end - start, 1) for start, end in segments])
 
         result_json = {
             "status": 1,
@@ -274,11 +403,17 @@ def DetectVideoExplicitLabel(OriginalVideoPath: str) -> str:
                 ["TextScale", float(text_scale), bool(scale_valid)],
                 ["StartTime", [float(x) for x in start_times], True],
                 ["Duration", float(max_duration), max_duration >= 2.0]
-            ]
+            ],
+            "ProbedFrames": probed_frames
         }
 
         return json.dumps(result_json, ensure_ascii=False)
 
+    except ffmpeg.Error as e:
+        # 解码失败（文件损坏、格式不支持等）按执行错误返回，而不是“未检测到”；附上 ffmpeg 的最后一行错误输出
+        stderr = e.stderr.decode("utf-8", "replace").strip() if e.stderr else ""
+        detail = stderr.splitlines()[-1] if stderr else str(e)
+        return json.dumps({"status": -2, "result": f"视频解码失败: {detail}", "ExplicitLabel": []}, ensure_ascii=False)
     except Exception as e:
         return json.dumps({"status": -2, "result": f"执行错误: {str(e)}", "ExplicitLabel": []}, ensure_ascii=False)
 
@@ -286,25 +421,26 @@ def DetectVideoExplicitLabel(OriginalVideoPath: str) -> str:
 
 
 
-# 调用示例
-result = EmbedVideoExplicitLabel(
-    OriginalVideoPath='1.mp4',
-    ResultFilePath='output.mp4',
-    ExplicitLabel={
-        'LableContent': '人工智能合成',
-        'PositionMode': 1,
-        'TextDirection': 0,
-        'TextScale': 0.05,
-        'TextColor': [255, 255, 255],
-        'FontName': 3,  # 对应黑体
-        'Opacity': 0.7,
-        'StartTime': [0],
-        'Duration': 5
-    }
-)
-print(result)
+if __name__ == '__main__':
+    # 调用示例
+    result = EmbedVideoExplicitLabel(
+        OriginalVideoPath='1.mp4',
+        ResultFilePath='output.mp4',
+        ExplicitLabel={
+            'LableContent': '人工智能合成',
+            'PositionMode': 1,
+            'TextDirection': 0,
+            'TextScale': 0.05,
+            'TextColor': [255, 255, 255],
+            'FontName': 3,  # 对应黑体
+            'Opacity': 0.7,
+            'StartTime': [0],
+            'Duration': 5
+        }
+    )
+    print(result)
 
 
-result = DetectVideoExplicitLabel('output.mp4')
+    result = DetectVideoExplicitLabel('output.mp4')
 
-print(result)
\ No newline at end of file
+    print(result)
\ No newline at end of file
@@ -0,0 +1,438 @@
+import os
+import struct
+from typing import Iterator, List, Optional, Tuple
+
+# 可能出现在 MP4/MOV 文件顶层的 box 类型，用于判断文件是否为 ISO BMFF / QuickTime 容器
+TOP_LEVEL_TYPES = {
+    b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot', b'uuid',
+    b'meta', b'moof', b'mfra', b'styp', b'sidx', b'pdin',
+}
+
+AIGC_KEY = 'AIGC'
+
+
+class UnsupportedContainerError(ValueError):
+    """
+    文件不是本模块能解析的 MP4/MOV 容器。
+    """
+
+
+def iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[bytes, int, int, int]]:
+    """
+    遍历 data[start:end] 范围内的同级 box。
+
+    返回:
+        迭代器，每项为 (box 类型, box 起始偏移, box 总长度, 头部长度)
+    """
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack('>I4s', data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                break
+            size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            break
+        yield box_type, offset, size, header
+        offset += size
+
+
+def find_top_level_box(f, box_type: bytes) -> Optional[Tuple[int, int, int]]:
+    """
+    在文件顶层按 box 头部逐个 seek 查找指定类型的 box，不读取 mdat 等大块数据。
+
+    返回:
+        (box 起始偏移, box 总长度, 头部长度)；未找到时返回 None
+
+    异常:
+        UnsupportedContainerError: 文件开头不是 MP4/MOV 的 box 结构
+    """
+    f.seek(0, 2)
+    file_size = f.tell()
+    offset = 0
+    first = True
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = f.read(16)
+        size, current_type = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if first and current_type not in TOP_LEVEL_TYPES:
+            raise UnsupportedContainerError(f"未知的顶层 box: {current_type!r}")
+        first = False
+        if size == 1:
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+        if size < header_size:
+            raise UnsupportedContainerError(f"box 长度非法: {current_type!r}")
+        if current_type == box_type:
+            return offset, size, header_size
+        offset += size
+    if first:
+        raise UnsupportedContainerError("文件过小，不是 MP4/MOV 容器")
+    return None
+
+
+def _meta_children_start(data: bytes, offset: int, header: int) -> int:
+    """
+    ISO BMFF 中的 meta 是 FullBox（多 4 字节 version/flags），QuickTime 中则不是；
+    通过紧随其后是否为 hdlr box 来区分。
+    """
+    content = offset + header
+    if data[content + 4:content + 8] == b'hdlr':
+        return content
+    return content + 4
+
+
+def _child(data: bytes, offset: int, size: int, header: int, box_type: bytes) -> Optional[Tuple[int, int, int]]:
+    for current_type, child_offset, child_size, child_header in iter_boxes(data, offset + header, offset + size):
+        if current_type == box_type:
+            return child_offset, child_size, child_header
+    return None
+
+
+def _data_value(data: bytes, offset: int, size: int, header: int) -> Optional[str]:
+    """
+    读取 ilst 条目中 data box 的文本值（data box: 4 字节类型 + 4 字节 locale + 值）。
+    """
+    data_box = _child(data, offset, size, header, b'data')
+    if data_box is None:
+        return None
+    d_offset, d_size, d_header = data_box
+    value = data[d_offset + d_header + 8:d_offset + d_size]
+    return value.decode('utf-8', 'replace')
+
+
+def _read_keys(data: bytes, offset: int, size: int, header: int) -> List[str]:
+    """
+    解析 mdta keys box，返回按 1 开始编号的键名列表。
+    """
+    pos = offset + header + 4
+    count = struct.unpack('>I', data[pos:pos + 4])[0]
+    pos += 4
+    keys = []
+    for _ in range(count):
+        key_size, _namespace = struct.unpack('>I4s', data[pos:pos + 8])
+        keys.append(data[pos + 8:pos + key_size].decode('utf-8', 'replace'))
+        pos += key_size
+    return keys
+
+
+def _read_meta_tag(data: bytes, offset: int, size: int, header: int, key: str) -> Optional[str]:
+    """
+    在一个 meta box 中查找键为 key 的条目，支持 mdta keys 方式（ffmpeg -movflags use_metadata_tags）
+    和 iTunes '----' 自由格式条目。
+    """
+    start = _meta_children_start(data, offset, header)
+    keys: List[str] = []
+    ilst = None
+    for box_type, child_offset, child_size, child_header in iter_boxes(data, start, offset + size):
+        if box_type == b'keys':
+            keys = _read_keys(data, child_offset, child_size, child_header)
+        elif box_type == b'ilst':
+            ilst = (child_offset, child_size, child_header)
+    if ilst is None:
+        return None
+
+    ilst_offset, ilst_size, ilst_header = ilst
+    for box_type, item_offset, item_size, item_header in iter_boxes(data, ilst_offset + ilst_header, ilst_offset + ilst_size):
+        if box_type == b'----':
+            name_box = _child(data, item_offset, item_size, item_header, b'name')
+            if name_box is None:
+                continue
+            n_offset, n_size, n_header = name_box
+            name = data[n_offset + n_header + 4:n_offset + n_size].decode('utf-8', 'replace')
+            if name == key:
+                return _data_value(data, item_offset, item_size, item_header)
+        elif keys:
+            index = struct.unpack('>I', box_type)[0]
+            if 1 <= index <= len(keys) and keys[index - 1] == key:
+                return _data_value(data, item_offset, item_size, item_header)
+    return None
+
+
+def read_moov(f) -> Optional[bytes]:
+    """
+    读取整个 moov box 的字节（通常只有几 KB 到几百 KB），未找到 moov 时返回 None。
+    """
+    found = find_top_level_box(f, b'moov')
+    if found is None:
+        return None
+    offset, size, _ = found
+    f.seek(offset)
+    return f.read(size)
+
+
+def read_metadata_tag(path: str, key: str = AIGC_KEY) -> Optional[str]:
+    """
+    直接解析 MP4/MOV 的 box 结构读取元数据标签，只读取文件头部的 moov，不触及 mdat。
+    依次查找 moov/udta/meta 与 moov/meta。
+
+    返回:
+        标签值；文件中没有该标签时返回 None
+
+    异常:
+        UnsupportedContainerError: 文件不是 MP4/MOV 容器
+    """
+    with open(path, 'rb') as f:
+        moov = read_moov(f)
+    if moov is None:
+        raise UnsupportedContainerError("未找到 moov box")
+
+    _, _, moov_size, moov_header = next(iter_boxes(moov))
+    candidates = []
+    udta = _child(moov, 0, moov_size, moov_header, b'udta')
+    if udta is not None:
+        meta = _child(moov, *udta, b'meta')
+        if meta is not None:
+            candidates.append(meta)
+    meta = _child(moov, 0, moov_size, moov_header, b'meta')
+    if meta is not None:
+        candidates.append(meta)
+
+    for meta_offset, meta_size, meta_header in candidates:
+        value = _read_meta_tag(moov, meta_offset, meta_size, meta_header, key)
+        if value is not None:
+            return value
+    return None
+
+
+# --- 写入 ---
+
+# moov 无法原位放下、需要整体后移媒体数据时，额外预留的 free 填充大小，
+# 使之后再次嵌入时可以直接原位修改
+PADDING_SIZE = 1024
+
+# 只在这些容器 box 中查找 stco/co64
+_CHUNK_OFFSET_PATH = (b'trak', b'mdia', b'minf', b'stbl')
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    if len(payload) + 8 > 0xFFFFFFFF:
+        return struct.pack('>I4sQ', 1, box_type, len(payload) + 16) + payload
+    return struct.pack('>I4s', len(payload) + 8, box_type) + payload
+
+
+def _set_child(payload: bytes, start: int, box_type: bytes, new_box: bytes) -> bytes:
+    """
+    在 payload[start:] 的同级 box 中替换第一个类型为 box_type 的 box；不存在时追加到末尾。
+    """
+    for current_type, offset, size, _ in iter_boxes(payload, start):
+        if current_type == box_type:
+            return payload[:offset] + new_box + payload[offset + size:]
+    return payload + new_box
+
+
+def _child_payload(payload: bytes, start: int, box_type: bytes) -> Optional[bytes]:
+    for current_type, offset, size, header in iter_boxes(payload, start):
+        if current_type == box_type:
+            return payload[offset + header:offset + size]
+    return None
+
+
+def _data_box(value: str) -> bytes:
+    # 类型 1 表示 UTF-8 文本，locale 为 0
+    return _box(b'data', struct.pack('>II', 1, 0) + value.encode('utf-8'))
+
+
+def _make_mdta_meta(key: str, value: str) -> bytes:
+    """
+    生成与 ffmpeg -movflags use_metadata_tags 相同结构的 meta box（hdlr mdta + keys + ilst）。
+    """
+    hdlr = _box(b'hdlr', b'\x00' * 8 + b'mdta' + b'\x00' * 12 + b'\x00')
+    key_bytes = key.encode('utf-8')
+    keys = _box(b'keys', b'\x00' * 4 + struct.pack('>I', 1) + struct.pack('>I4s', len(key_bytes) + 8, b'mdta') + key_bytes)
+    ilst = _box(b'ilst', _box(struct.pack('>I', 1), _data_box(value)))
+    return _box(b'meta', b'\x00' * 4 + hdlr + keys + ilst)
+
+
+def _update_meta(meta_payload: bytes, key: str, value: str) -> bytes:
+    """
+    在已有 meta box 的内容中设置 key 的值。mdta 类型的 meta 修改 keys/ilst，
+    其他类型（如 iTunes mdir）在 ilst 中写入 '----' 自由格式条目。
+    """
+    start = 0 if meta_payload[4:8] == b'hdlr' else 4
+    hdlr = _child_payload(meta_payload, start, b'hdlr')
+    handler = hdlr[8:12] if hdlr is not None else b''
+    ilst = _child_payload(meta_payload, start, b'ilst') or b''
+
+    if handler == b'mdta':
+        keys_payload = _child_payload(meta_payload, start, b'keys')
+        keys = []
+        if keys_payload is not None:
+            keys = _read_keys(_box(b'keys', keys_payload), 0, len(keys_payload) + 8, 8)
+        if key in keys:
+            index = keys.index(key) + 1
+        else:
+            keys.append(key)
+            index = len(keys)
+        entries = b''.join(
+            struct.pack('>I4s', len(k.encode('utf-8')) + 8, b'mdta') + k.encode('utf-8') for k in keys
+        )
+        new_keys = _box(b'keys', b'\x00' * 4 + struct.pack('>I', len(keys)) + entries)
+        item = _box(struct.pack('>I', index), _data_box(value))
+        new_ilst = _box(b'ilst', _set_child(ilst, 0, struct.pack('>I', index), item))
+        meta_payload = _set_child(meta_payload, start, b'keys', new_keys)
+        return _set_child(meta_payload, start, b'ilst', new_ilst)
+
+    item = _box(b'----', _box(b'mean', b'\x00' * 4 + b'com.apple.iTunes')
+                + _box(b'name', b'\x00' * 4 + key.encode('utf-8')) + _data_box(value))
+    kept = b''
+    for box_type, offset, size, header in iter_boxes(ilst):
+        if box_type == b'----':
+            name = _child_payload(ilst[offset + header:offset + size], 0, b'name')
+            if name is not None and name[4:].decode('utf-8', 'replace') == key:
+                continue
+        kept += ilst[offset:offset + size]
+    return _set_child(meta_payload, start, b'ilst', _box(b'ilst', kept + item))
+
+
+def _build_moov(moov: bytes, key: str, value: str) -> bytes:
+    """
+    返回设置了 moov/udta/meta 中 key 条目的新 moov box。
+    """
+    _, _, _, header = next(iter_boxes(moov))
+    payload = moov[header:]
+    udta = _child_payload(payload, 0, b'udta') or b''
+    meta = _child_payload(udta, 0, b'meta')
+    if meta is None:
+        new_meta = _make_mdta_meta(key, value)
+    else:
+        new_meta = _box(b'meta', _update_meta(meta, key, value))
+    new_udta = _box(b'udta', _set_child(udta, 0, b'meta', new_meta))
+    return _box(b'moov', _set_child(payload, 0, b'udta', new_udta))
+
+
+def _shift_chunk_offsets(moov: bytes, delta: int, threshold: int) -> bytes:
+    """
+    把 stco/co64 中指向 threshold 及之后位置的数据块偏移加上 delta（媒体数据整体后移时使用）。
+
+    异常:
+        ValueError: 32 位 stco 偏移溢出
+    """
+    data = bytearray(moov)
+
+    def walk(start: int, end: int, depth: int):
+        for box_type, offset, size, header in iter_boxes(data, start, end):
+            if depth < len(_CHUNK_OFFSET_PATH) and box_type == _CHUNK_OFFSET_PATH[depth]:
+                walk(offset + header, offset + size, depth + 1)
+            elif depth == len(_CHUNK_OFFSET_PATH) and box_type in (b'stco', b'co64'):
+                fmt, width = ('>I', 4) if box_type == b'stco' else ('>Q', 8)
+                pos = offset + header + 4
+                count = struct.unpack('>I', data[pos:pos + 4])[0]
+                pos += 4
+                for _ in range(count):
+                    chunk_offset = struct.unpack(fmt, data[pos:pos + width])[0]
+                    if chunk_offset >= threshold:
+                        chunk_offset += delta
+                        if box_type == b'stco' and chunk_offset > 0xFFFFFFFF:
+                            raise ValueError("stco 偏移溢出")
+                        data[pos:pos + width] = struct.pack(fmt, chunk_offset)
+                    pos += width
+
+    _, _, size, header = next(iter_boxes(data))
+    walk(header, size, 0)
+    return bytes(data)
+
+
+def _copy_range(src, dst, offset: int, length: int) -> None:
+    """
+    把 src 中 [offset, offset + length) 的字节追加写入 dst，优先使用内核态复制。
+    """
+    dst.flush()
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    while length > 0 and copy_file_range is not None:
+        try:
+            copied = copy_file_range(src.fileno(), dst.fileno(), length, offset)
+        except OSError:
+            break
+        if copied == 0:
+            break
+        offset += copied
+        length -= copied
+    if length > 0:
+        dst.seek(0, os.SEEK_END)
+        src.seek(offset)
+        while length > 0:
+            block = src.read(min(length, 1 << 20))
+            if not block:
+                break
+            dst.write(block)
+            length -= len(block)
+    dst.seek(0, os.SEEK_END)
+
+
+def write_metadata_tag(src_path: str, dst_path: str, value: str, key: str = AIGC_KEY) -> None:
+    """
+    直接修改 MP4/MOV 的 moov/udta/meta 写入元数据标签，不重新封装媒体数据。
+
+    放置策略:
+        1. 新 moov 能放进原 moov 及其后紧邻的 free/skip 填充中时原位替换，所有数据块偏移不变；
+        2. 否则在原位置扩展 moov（额外预留 PADDING_SIZE 填充），只有位于 moov 之后的数据块
+           （即 moov 在 mdat 之前时）需要修正 stco/co64 偏移。
+    src_path 与 dst_path 相同时，第 1 种情况及 moov 位于文件末尾的情况直接原地修改文件，
+    其他情况写入同目录临时文件后替换。
+
+    异常:
+        UnsupportedContainerError: 文件不是 MP4/MOV 容器或没有 moov
+        ValueError: 偏移修正溢出
+    """
+    with open(src_path, 'rb') as src:
+        found = find_top_level_box(src, b'moov')
+        if found is None:
+            raise UnsupportedContainerError("未找到 moov box")
+        moov_offset, moov_size, _ = found
+        src.seek(0, os.SEEK_END)
+        file_size = src.tell()
+        src.seek(moov_offset)
+        moov = src.read(moov_size)
+
+        # moov 之后紧邻的 free/skip 填充可以一并被新 moov 占用
+        consumed = moov_offset + moov_size
+        src.seek(consumed)
+        next_header = src.read(8)
+        if len(next_header) == 8:
+            next_size, next_type = struct.unpack('>I4s', next_header)
+            if next_type in (b'free', b'skip') and next_size >= 8 and consumed + next_size <= file_size:
+                consumed += next_size
+
+        new_moov = _build_moov(moov, key, value)
+        slack = (consumed - moov_offset) - len(new_moov)
+        if slack == 0:
+            padding = b''
+        elif slack >= 8:
+            padding = _box(b'free', b'\x00' * (slack - 8))
+        else:
+            delta = len(new_moov) + PADDING_SIZE - (consumed - moov_offset)
+            new_moov = _shift_chunk_offsets(new_moov, delta, consumed)
+            padding = _box(b'free', b'\x00' * (PADDING_SIZE - 8))
+        header = new_moov + padding
+
+        same_file = os.path.exists(dst_path) and os.path.samefile(src_path, dst_path)
+        if same_file and (len(header) == consumed - moov_offset or consumed == file_size):
+            src.close()
+            with open(dst_path, 'r+b') as dst:
+                dst.seek(moov_offset)
+                dst.write(header)
+                if consumed == file_size:
+                    dst.truncate()
+            return
+
+        target = dst_path + '.tmp' if same_file else dst_path
+        try:
+            with open(target, 'wb') as dst:
+                _copy_range(src, dst, 0, moov_offset)
+                dst.write(header)
+                _copy_range(src, dst, consumed, file_size - consumed)
+        except Exception:
+            if same_file and os.path.exists(target):
+                os.remove(target)
+            raise
+    if same_file:
+        os.replace(target, dst_path)
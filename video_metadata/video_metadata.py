@@ -1,14 +1,19 @@
 import subprocess
 import json
 import os
-import re
+import struct
+from .mp4_atoms import read_metadata_tag, write_metadata_tag, UnsupportedContainerError
+from tracing import span
 
 class VideoMetadataHandler:
     """
     根据TC260标准实践指南，实现视频元数据隐式标识的嵌入与检测。
-    本实现通过调用外部 ffmpeg 程序来完成。
+    MP4/MOV 直接修改 moov box 完成嵌入与检测，其他容器调用外部 ffmpeg/ffprobe 程序。
     """
 
+    # ffmpeg 可用性只需在进程内检查一次
+    _ffmpeg_checked = False
+
     def __init__(self):
         """
         初始化处理器并检查ffmpeg是否可用。
@@ -19,6 +24,8 @@ class VideoMetadataHandler:
         """
         检查系统中是否安装了ffmpeg。
         """
+        if VideoMetadataHandler._ffmpeg_checked:
+            return
         try:
             subprocess.run(
                 ["ffmpeg", "-version"],
@@ -28,6 +35,7 @@ class VideoMetadataHandler:
             )
         except (subprocess.CalledProcessError, FileNotFoundError):
             raise RuntimeError("错误: ffmpeg 未安装或未在系统PATH中。请先安装ffmpeg。")
+        VideoMetadataHandler._ffmpeg_checked = True
     def DetectVideoImplicitLabel(self,video_path: str) -> str:
         """
         检测视频文件元数据中嵌入的隐式标识信息。
@@ -72,6 +80,24 @@ class VideoMetadataHandler:
                 "result": "嵌入失败: 'implicit_label' 不是一个有效的JSON字符串。"
             })
 
+        # MP4/MOV 直接改写 moov/udta/meta，不重新封装媒体数据；
+        # 容器结构无法识别时回退到 ffmpeg 重新封装
+        if original_video_path.lower().endswith(('.mp4', '.mov')):
+            try:
+                with span("moov.write"):
+                    write_metadata_tag(original_video_path, result_file_path, implicit_label)
+                return json.dumps({
+                    "status": 1,
+                    "result": f"嵌入成功，文件已保存至 '{result_file_path}'"
+                })
+            except (UnsupportedContainerError, ValueError, struct.error):
+                pass
+            except OSError as e:
+                return json.dumps({
+                    "status": -2,
+                    "result": f"执行错误: {str(e)}"
+                })
+
         # 构建ffmpeg命令
         # -map_metadata 0 用于从输入文件复制全局元数据
         # -metadata "AIGC=..." 用于设置新的元数据标签
@@ -93,12 +119,13 @@ class VideoMetadataHandler:
 
         try:
             # 运行命令，如果文件已存在则覆盖
-            subprocess.run(
-                command if os.path.exists(result_file_path) else command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True
-            )
+            with span("ffmpeg.remux"):
+                subprocess.run(
+                    command if os.path.exists(result_file_path) else command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    check=True
+                )
             return json.dumps({
                 "status": 1,
                 "result": f"嵌入成功，文件已保存至 '{result_file_path}'"
@@ -126,27 +153,21 @@ class VideoMetadataHandler:
             })
 
         try:
-            # ffmpeg将信息打印到stderr
-            result = subprocess.run(
-                ["ffmpeg", "-i", video_path],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding='utf-8'
-            )
-            
-            # 使用正则表达式从ffmpeg的输出中查找AIGC标签
-            # 匹配 "AIGC" 后面跟冒号，然后捕获花括号内的所有内容
-            match = re.search(r"AIGC\s*:\s*(\{.*\})", result.stderr)
-            
-            if not match:
+            try:
+                # MP4/MOV 直接解析 moov 中的元数据，只读取文件头部，无需启动 ffmpeg 进程
+                with span("moov.read"):
+                    aigc_json_str = read_metadata_tag(video_path, "AIGC")
+            except UnsupportedContainerError:
+                # 其他容器使用 ffprobe 读取格式级元数据
+                with span("probe"):
+                    aigc_json_str = self._probe_metadata_tag(video_path, "AIGC")
+
+            if not aigc_json_str:
                 return json.dumps({
                     "status": -1,
                     "result": "未检测到隐式标识 'AIGC'。",
                 })
             
-            aigc_json_str = match.group(1)
-            
             # 解析JSON并检查合规性
             try:
                 label_data = json.loads(aigc_json_str)
@@ -169,6 +190,22 @@ class VideoMetadataHandler:
                 "result": f"执行错误: {str(e)}"
             })
 
+    def _probe_metadata_tag(self, video_path: str, key: str):
+        """
+        使用 ffprobe 以 JSON 格式读取容器级元数据标签，键名不区分大小写。未找到时返回 None。
+        """
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format_tags", "-of", "json", video_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True
+        )
+        tags = json.loads(result.stdout.decode('utf-8', 'ignore')).get("format", {}).get("tags", {})
+        for tag_key, value in tags.items():
+            if tag_key.upper() == key.upper():
+                return value
+        return None
+
     def _check_compliance(self, label_data: dict) -> tuple[bool, list]:
         """
         辅助函数，检查检测到的数据是否符合规范。
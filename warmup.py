@@ -0,0 +1,144 @@
+import importlib
+import os
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Iterable, List, Optional
+
+# 启动时预加载的方法：all（默认）、none，或逗号分隔的方法名
+PRELOAD_METHODS = os.getenv("SEAL_PRELOAD_METHODS", "all")
+# 预加载后是否用合成数据跑一次推理，触发模型首次执行与 numba JIT 编译
+WARMUP_INFERENCE = os.getenv("SEAL_WARMUP_INFERENCE", "1") != "0"
+
+
+def _warm_ocr() -> None:
+    """
+    构建 EasyOCR 中英双语与英文 Reader，并在一张合成文字图片上各识别一次。
+    """
+    import cv2
+    import numpy as np
+    from image_detection.ocr_reader import get_reader, readtext
+
+    for lang_list in (('ch_sim', 'en'), ('en',)):
+        get_reader(lang_list)
+        if WARMUP_INFERENCE:
+            image = np.full((64, 256, 3), 255, np.uint8)
+            cv2.putText(image, "AI", (8, 48), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+            readtext(image, lang_list)
+
+
+def _warm_whisper() -> None:
+    """
+    把 Whisper 模型（及关键词预筛小模型）加载进常驻模型池，对一秒静音转录一次，
+    并编译（或从磁盘缓存加载）DTW 的 numba 函数。
+    """
+    import numpy as np
+    from audio_detection.whisper_transcriber import MODEL_SIZE, MODEL_DTYPE, SPEECH_GATE
+    from audio_detection.keyword_gate import GATE_MODEL
+    from audio_detection.whisper_model_pool import acquire_model, preload_model
+    import whisper.timing
+
+    preload_model(MODEL_SIZE, dtype=MODEL_DTYPE)
+    if SPEECH_GATE:
+        preload_model(GATE_MODEL, dtype=MODEL_DTYPE)
+    if WARMUP_INFERENCE:
+        if SPEECH_GATE:
+            with acquire_model(GATE_MODEL, dtype=MODEL_DTYPE) as model:
+                model.transcribe(np.zeros(16000, np.float32), language="zh", beam_size=None, best_of=None,
+                                 temperature=0.0, condition_on_previous_text=False)
+        with acquire_model(MODEL_SIZE, dtype=MODEL_DTYPE) as model:
+            model.transcribe(np.zeros(16000, np.float32), language="zh", beam_size=5, best_of=5,
+                             temperature=0.0, word_timestamps=True)
+        whisper.timing.dtw_cpu(np.random.rand(8, 8))
+
+
+# 方法 -> 预热函数；多个方法共用的模型只预热一次
+WARMUPS: Dict[str, Callable[[], None]] = {
+    "DetectImageExplicitLabel": _warm_ocr,
+    "DetectVideoExplicitLabel": _warm_ocr,
+    "DetectAudioExplicitLabel": _warm_whisper,
+}
+
+
+def selected_methods(method_map: Dict, spec: str = PRELOAD_METHODS) -> List[str]:
+    spec = spec.strip()
+    if spec.lower() == "none":
+        return []
+    if spec.lower() == "all" or not spec:
+        return list(method_map)
+    return [name.strip() for name in spec.split(",") if name.strip() in method_map]
+
+
+class WarmupState:
+    """
+    启动预热的进度。全部步骤成功后 ready 才为 True，就绪检查接口据此返回 200 或 503。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = "pending"
+        self.ready = False
+        self.steps: Dict[str, dict] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def _record(self, name: str, started: float, error: Optional[str]) -> None:
+        with self._lock:
+            self.steps[name] = {"seconds": round(time.time() - started, 3), "ok": error is None}
+            if error is not None:
+                self.steps[name]["error"] = error
+
+    def run(self, method_map: Dict, methods: Iterable[str]) -> None:
+        """
+        依次导入所选方法的模块，再执行对应的模型预热。
+        """
+        with self._lock:
+            self.state = "warming"
+            self.started_at = time.time()
+
+        modules = []
+        for method in methods:
+            module_name = method_map[method][0]
+            if module_name not in modules:
+                modules.append(module_name)
+        warmups = []
+        for method in methods:
+            warmup = WARMUPS.get(method)
+            if warmup is not None and warmup not in warmups:
+                warmups.append(warmup)
+
+        for module_name in modules:
+            started = time.time()
+            try:
+                importlib.import_module(module_name)
+                self._record(f"import:{module_name}", started, None)
+            except Exception:
+                self._record(f"import:{module_name}", started, traceback.format_exc(limit=3))
+        for warmup in warmups:
+            started = time.time()
+            name = f"warmup:{warmup.__name__.lstrip('_').replace('warm_', '')}"
+            try:
+                warmup()
+                self._record(name, started, None)
+            except Exception:
+                self._record(name, started, traceback.format_exc(limit=3))
+
+        with self._lock:
+            self.finished_at = time.time()
+            self.ready = all(step["ok"] for step in self.steps.values())
+            self.state = "ready" if self.ready else "failed"
+
+    def start(self, method_map: Dict, methods: Iterable[str]) -> threading.Thread:
+        """
+        在后台线程中预热，服务可以先开始监听，就绪检查在预热完成前返回 503。
+        """
+        thread = threading.Thread(target=self.run, args=(method_map, list(methods)), name="seal-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            info = {"state": self.state, "ready": self.ready, "steps": dict(self.steps)}
+            if self.started_at is not None:
+                info["elapsed"] = round((self.finished_at or time.time()) - self.started_at, 3)
+            return info